@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django import forms
+from proyectoapp import busqueda
 from proyectoapp.models import Usuario, Publicacion, UsuarioNormal, Organizacion, Municipalidad
 
 class UsuarioForm(forms.ModelForm):
@@ -67,6 +68,17 @@ class PublicacionAdmin(admin.ModelAdmin):
     list_filter = ['tipo_publicacion', 'fecha_publicacion']
     search_fields = ['titulo', 'descripcion', 'id_usuario__email']
     readonly_fields = ['fecha_publicacion']
+
+    def get_search_results(self, request, queryset, search_term):
+        # En PostgreSQL título/descripción/dirección usan el índice de texto
+        # completo en vez de recorrer la tabla con icontains. El email se busca
+        # solo si el término lo parece: unido con OR a la búsqueda de texto, el
+        # planificador deja de usar el índice GIN.
+        if not search_term or not busqueda.disponible(queryset.db):
+            return super().get_search_results(request, queryset, search_term)
+        if '@' in search_term:
+            return queryset.filter(id_usuario__email__icontains=search_term.strip()), False
+        return busqueda.filtrar(queryset, search_term), False
     
     def get_usuario_email(self, obj):
         return obj.id_usuario.email
@@ -0,0 +1,221 @@
+"""
+Caché en disco para el audio sintetizado de las publicaciones.
+
+Cada archivo se identifica por el hash de su contenido de origen (texto, voz
+``hl`` y codec ``c``), así que un texto que no cambia nunca vuelve a pedirse
+al proveedor de voz. El tamaño total está acotado y, cuando se supera, se
+eliminan primero las entradas usadas hace más tiempo (LRU).
+
+Para no recorrer el directorio en cada escritura, cada proceso lleva la suma
+de lo que escribe y solo lo recorre (y expulsa) cuando esa suma supera el
+límite o cada AUDIO_CACHE_REVISION segundos, que es cuando se entera de lo
+escrito o borrado por los demás procesos.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+
+CACHE_DIR = Path(getattr(
+    settings, 'AUDIO_CACHE_DIR',
+    Path(__file__).resolve().parent.parent / 'cache' / 'audio'
+))
+MAX_BYTES = int(getattr(settings, 'AUDIO_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+# Segundos máximos entre recorridos completos del directorio
+REVISION = float(getattr(settings, 'AUDIO_CACHE_REVISION', 60))
+
+_lock = threading.Lock()
+_contadores = {'hits': 0, 'misses': 0, 'escrituras': 0, 'expulsiones': 0}
+# Bytes ocupados según el último recorrido más lo escrito desde entonces
+_ocupados = None
+_revisado = 0.0
+
+
+def _hash_texto(texto):
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def _hash_variante(hl, codec):
+    return hashlib.sha256(f"{hl}\x00{codec}".encode('utf-8')).hexdigest()[:16]
+
+
+def _directorio_texto(texto):
+    hash_texto = _hash_texto(texto)
+    return CACHE_DIR / hash_texto[:2] / hash_texto
+
+
+def _ruta(texto, hl, codec):
+    return _directorio_texto(texto) / f"{_hash_variante(hl, codec)}.audio"
+
+
+def clave_audio(texto, hl, codec):
+    """
+    Calcula la clave de caché de un audio.
+
+    Args:
+        texto (str): Texto sintetizado
+        hl (str): Voz/idioma usado por el proveedor
+        codec (str): Formato de audio
+
+    Returns:
+        str: Hash hexadecimal que identifica el audio
+    """
+    return f"{_hash_texto(texto)}-{_hash_variante(hl, codec)}"
+
+
+def obtener_audio(texto, hl, codec):
+    """
+    Busca un audio en caché.
+
+    Args:
+        texto (str): Texto sintetizado
+        hl (str): Voz/idioma usado por el proveedor
+        codec (str): Formato de audio
+
+    Returns:
+        bytes: Contenido del audio, o None si no está en caché
+    """
+    ruta = _ruta(texto, hl, codec)
+    try:
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+        # Marcar como usado recientemente para la expulsión LRU
+        os.utime(ruta)
+    except OSError:
+        with _lock:
+            _contadores['misses'] += 1
+        return None
+
+    with _lock:
+        _contadores['hits'] += 1
+    return contenido
+
+
+def existe_audio(texto, hl, codec):
+    """Indica si un audio está en caché, sin leerlo ni contarlo en las estadísticas."""
+    return _ruta(texto, hl, codec).exists()
+
+
+def guardar_audio(texto, hl, codec, contenido):
+    """
+    Guarda un audio en caché y aplica el límite de tamaño.
+
+    Args:
+        texto (str): Texto sintetizado
+        hl (str): Voz/idioma usado por el proveedor
+        codec (str): Formato de audio
+        contenido (bytes): Audio a guardar
+
+    Returns:
+        bool: True si se guardó exitosamente, False en caso contrario
+    """
+    ruta = _ruta(texto, hl, codec)
+    try:
+        previo = ruta.stat().st_size
+    except OSError:
+        previo = 0
+    try:
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        # Escritura atómica: otro proceso nunca ve un archivo a medias
+        fd, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contenido)
+        os.replace(temporal, ruta)
+    except OSError as e:
+        print(f"Error al guardar audio en caché: {e}")
+        return False
+
+    with _lock:
+        _contadores['escrituras'] += 1
+    _sumar(len(contenido) - previo)
+    return True
+
+
+def invalidar_texto(texto):
+    """
+    Elimina de la caché todas las variantes (voz/codec) de un texto.
+
+    Args:
+        texto (str): Texto cuyo audio dejó de ser válido
+    """
+    shutil.rmtree(_directorio_texto(texto), ignore_errors=True)
+
+
+def _entradas():
+    """Lista (mtime, tamaño, ruta) de todos los audios en caché."""
+    entradas = []
+    if not CACHE_DIR.exists():
+        return entradas
+    for raiz, _dirs, archivos in os.walk(CACHE_DIR):
+        for nombre in archivos:
+            if not nombre.endswith('.audio'):
+                continue
+            ruta = Path(raiz) / nombre
+            try:
+                st = ruta.stat()
+            except OSError:
+                continue
+            entradas.append((st.st_mtime, st.st_size, ruta))
+    return entradas
+
+
+def _sumar(delta):
+    """Suma una escritura a la ocupación y aplica el límite si corresponde."""
+    global _ocupados
+    with _lock:
+        revisar = (
+            _ocupados is None or _ocupados + delta > MAX_BYTES
+            or time.monotonic() - _revisado > REVISION
+        )
+        if not revisar:
+            _ocupados += delta
+    if revisar:
+        _aplicar_limite()
+
+
+def _aplicar_limite():
+    """Expulsa las entradas menos usadas hasta quedar bajo MAX_BYTES."""
+    global _ocupados, _revisado
+    entradas = _entradas()
+    total = sum(tamano for _mtime, tamano, _ruta in entradas)
+    if total > MAX_BYTES:
+        entradas.sort(key=lambda e: e[0])
+        for _mtime, tamano, ruta in entradas:
+            if total <= MAX_BYTES:
+                break
+            try:
+                ruta.unlink()
+            except OSError:
+                continue
+            total -= tamano
+            with _lock:
+                _contadores['expulsiones'] += 1
+            # Eliminar el directorio del texto si quedó vacío
+            try:
+                ruta.parent.rmdir()
+            except OSError:
+                pass
+    with _lock:
+        _ocupados, _revisado = total, time.monotonic()
+
+
+def estadisticas():
+    """
+    Obtiene los contadores de uso de la caché de este proceso y su ocupación.
+
+    Returns:
+        dict: hits, misses, escrituras, expulsiones, entradas y bytes
+    """
+    entradas = _entradas()
+    with _lock:
+        datos = dict(_contadores)
+    datos['entradas'] = len(entradas)
+    datos['bytes'] = sum(tamano for _mtime, tamano, _ruta in entradas)
+    datos['max_bytes'] = MAX_BYTES
+    return datos
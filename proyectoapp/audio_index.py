@@ -0,0 +1,264 @@
+"""
+Índice secundario (SQLite) sobre el historial de lecturas de audio.
+
+Los segmentos JSON-lines de ``audio_logger`` siguen siendo la fuente de
+verdad; este índice guarda, por cada registro, su publicación, usuario,
+timestamp y la posición de la línea en su segmento. Antes de cada consulta se
+incorporan solo los bytes nuevos de los segmentos (si no los hay, la consulta
+no toma el bloqueo de escritura), así que las búsquedas por publicación,
+usuario o rango de fechas, los conteos y los N más recientes no recorren el
+historial completo.
+"""
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+
+from . import audio_logger
+
+
+INDEX_DB = Path(getattr(
+    settings, 'AUDIO_INDEX_DB', audio_logger.LOG_DIR / 'audio_readings_index.sqlite3'
+))
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS lecturas (
+    id INTEGER PRIMARY KEY,
+    segmento TEXT NOT NULL,
+    posicion INTEGER NOT NULL,
+    id_publicacion INTEGER,
+    id_usuario INTEGER,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lecturas_timestamp ON lecturas (timestamp, id);
+CREATE INDEX IF NOT EXISTS lecturas_publicacion ON lecturas (id_publicacion, timestamp, id);
+CREATE INDEX IF NOT EXISTS lecturas_usuario ON lecturas (id_usuario, timestamp, id);
+CREATE TABLE IF NOT EXISTS progreso (
+    segmento TEXT PRIMARY KEY,
+    posicion INTEGER NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def _conexion():
+    """Conexión SQLite propia de cada hilo."""
+    conexion = getattr(_local, 'conexion', None)
+    if conexion is None:
+        INDEX_DB.parent.mkdir(parents=True, exist_ok=True)
+        conexion = sqlite3.connect(INDEX_DB, timeout=30, isolation_level=None)
+        conexion.execute('PRAGMA journal_mode=WAL')
+        conexion.execute('PRAGMA synchronous=NORMAL')
+        conexion.executescript(_ESQUEMA)
+        _local.conexion = conexion
+    return conexion
+
+
+def _a_timestamp(valor):
+    if valor is None or isinstance(valor, (int, float)):
+        return valor
+    if isinstance(valor, datetime):
+        return valor.timestamp()
+    return float(valor)
+
+
+def _pendientes(conexion, segmentos):
+    """Segmentos con bytes sin indexar, con la posición desde la que seguir."""
+    progreso = dict(conexion.execute('SELECT segmento, posicion FROM progreso'))
+    # Los segmentos anteriores al último indexado ya están cerrados
+    ultimo = max(progreso) if progreso else ''
+    pendientes = []
+    for ruta in segmentos:
+        if ruta.name < ultimo:
+            continue
+        posicion = progreso.get(ruta.name, 0)
+        try:
+            if ruta.stat().st_size > posicion:
+                pendientes.append((ruta, posicion))
+        except OSError:
+            continue
+    return pendientes
+
+
+def sincronizar():
+    """
+    Incorpora al índice los registros escritos desde la última sincronización.
+
+    Returns:
+        int: Cantidad de registros nuevos indexados
+    """
+    audio_logger.escribir_pendientes()
+    conexion = _conexion()
+    segmentos = audio_logger._segmentos()
+    # Primero se comparan los tamaños con lo indexado sin tomar el bloqueo de
+    # escritura: en la mayoría de las consultas no hay nada nuevo
+    if not _pendientes(conexion, segmentos):
+        return 0
+
+    # BEGIN IMMEDIATE: un solo proceso indexa a la vez
+    conexion.execute('BEGIN IMMEDIATE')
+    try:
+        # Se vuelve a leer: otro proceso pudo indexarlos mientras tanto
+        nuevos = 0
+        for ruta, posicion in _pendientes(conexion, segmentos):
+            filas = []
+            with open(ruta, 'rb') as f:
+                f.seek(posicion)
+                for linea in f:
+                    # Una línea sin salto final es una escritura en curso
+                    if not linea.endswith(b'\n'):
+                        break
+                    try:
+                        registro = json.loads(linea)
+                        filas.append((
+                            ruta.name, posicion,
+                            registro.get('id_publicacion'),
+                            registro.get('id_usuario'),
+                            registro.get('timestamp') or 0,
+                        ))
+                    except (json.JSONDecodeError, AttributeError):
+                        pass
+                    posicion += len(linea)
+
+            conexion.executemany(
+                'INSERT INTO lecturas (segmento, posicion, id_publicacion, id_usuario, timestamp) '
+                'VALUES (?, ?, ?, ?, ?)', filas
+            )
+            conexion.execute(
+                'INSERT OR REPLACE INTO progreso (segmento, posicion) VALUES (?, ?)',
+                (ruta.name, posicion)
+            )
+            nuevos += len(filas)
+        conexion.execute('COMMIT')
+    except Exception:
+        conexion.execute('ROLLBACK')
+        raise
+    return nuevos
+
+
+def _leer_registros(filas):
+    """Lee desde los segmentos los registros apuntados por (id, segmento, posicion)."""
+    registros = {}
+    por_segmento = {}
+    for id_fila, segmento, posicion in filas:
+        por_segmento.setdefault(segmento, []).append((posicion, id_fila))
+
+    for segmento, punteros in por_segmento.items():
+        try:
+            with open(audio_logger.SEGMENT_DIR / segmento, 'rb') as f:
+                for posicion, id_fila in sorted(punteros):
+                    f.seek(posicion)
+                    registros[id_fila] = json.loads(f.readline())
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error al leer registros: {e}")
+
+    return [registros[id_fila] for id_fila, _s, _p in filas if id_fila in registros]
+
+
+class ConsultaLecturas:
+    """
+    Consulta perezosa sobre el índice, de la lectura más reciente a la más antigua.
+
+    Admite ``count()`` y rebanadas (``consulta[20:40]``), por lo que puede
+    pasarse directamente a ``django.core.paginator.Paginator``.
+    """
+
+    def __init__(self, id_publicacion=None, id_usuario=None, desde=None, hasta=None):
+        self.id_publicacion = id_publicacion
+        self.id_usuario = id_usuario
+        self.desde = _a_timestamp(desde)
+        self.hasta = _a_timestamp(hasta)
+        self._total = None
+        sincronizar()
+
+    def _where(self):
+        condiciones, parametros = [], []
+        if self.id_publicacion is not None:
+            condiciones.append('id_publicacion = ?')
+            parametros.append(self.id_publicacion)
+        if self.id_usuario is not None:
+            condiciones.append('id_usuario = ?')
+            parametros.append(self.id_usuario)
+        if self.desde is not None:
+            condiciones.append('timestamp >= ?')
+            parametros.append(self.desde)
+        if self.hasta is not None:
+            condiciones.append('timestamp < ?')
+            parametros.append(self.hasta)
+        where = ' WHERE ' + ' AND '.join(condiciones) if condiciones else ''
+        return where, parametros
+
+    def count(self):
+        if self._total is None:
+            where, parametros = self._where()
+            self._total = _conexion().execute(
+                'SELECT COUNT(*) FROM lecturas' + where, parametros
+            ).fetchone()[0]
+        return self._total
+
+    def __len__(self):
+        return self.count()
+
+    def recientes(self, limite, desplazamiento=0):
+        """
+        Obtiene registros de la consulta, los más recientes primero.
+
+        Args:
+            limite (int): Cantidad máxima de registros (-1 para todos)
+            desplazamiento (int): Registros a saltar
+
+        Returns:
+            list: Registros de lectura
+        """
+        where, parametros = self._where()
+        filas = _conexion().execute(
+            'SELECT id, segmento, posicion FROM lecturas' + where +
+            ' ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?',
+            parametros + [limite, desplazamiento]
+        ).fetchall()
+        return _leer_registros(filas)
+
+    def pagina(self, limite, antes=None):
+        """
+        Página por keyset: registros estrictamente anteriores al cursor.
+
+        Args:
+            limite (int): Tamaño de la página
+            antes (tuple, optional): Cursor (timestamp, id) de la página anterior
+
+        Returns:
+            tuple: (registros, cursor de la siguiente página o None)
+        """
+        where, parametros = self._where()
+        if antes is not None:
+            where += (' AND ' if where else ' WHERE ') + '(timestamp, id) < (?, ?)'
+            parametros = parametros + list(antes)
+        filas = _conexion().execute(
+            'SELECT id, segmento, posicion, timestamp FROM lecturas' + where +
+            ' ORDER BY timestamp DESC, id DESC LIMIT ?',
+            parametros + [limite + 1]
+        ).fetchall()
+
+        siguiente = None
+        if len(filas) > limite:
+            filas = filas[:limite]
+            siguiente = (filas[-1][3], filas[-1][0])
+        registros = _leer_registros([(id_fila, seg, pos) for id_fila, seg, pos, _ts in filas])
+        return registros, siguiente
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            inicio = item.start or 0
+            limite = -1 if item.stop is None else max(item.stop - inicio, 0)
+            return self.recientes(limite, inicio)
+        registros = self.recientes(1, item)
+        if not registros:
+            raise IndexError(item)
+        return registros[0]
+
+    def __iter__(self):
+        return iter(self.recientes(-1))
@@ -1,108 +1,256 @@
 """
 Módulo para registrar el historial de textos leídos por síntesis de voz.
-Guarda un JSON con información de cada lectura.
+
+Las lecturas se guardan en archivos JSON-lines de solo-anexado (segmentos),
+un registro por línea. Cada proceso acumula sus registros en memoria y los
+escribe en bloque bajo un bloqueo de archivo, así que registrar una lectura
+cuesta lo mismo sin importar el tamaño del historial y varios workers pueden
+escribir a la vez sin perder registros.
 """
+import atexit
 import json
 import os
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se serializa dentro del proceso
+    fcntl = None
+
 
 LOG_DIR = Path(__file__).resolve().parent.parent / 'logs'
+# Archivo JSON del formato anterior; se migra una vez a un segmento
 LOG_FILE = LOG_DIR / 'audio_readings.json'
+SEGMENT_DIR = LOG_DIR / 'audio_readings'
+LOCK_FILE = SEGMENT_DIR / '.lock'
+
+SEGMENT_MAX_BYTES = int(getattr(settings, 'AUDIO_LOG_SEGMENT_BYTES', 16 * 1024 * 1024))
+BUFFER_MAX = int(getattr(settings, 'AUDIO_LOG_BUFFER_MAX', 50))
+FLUSH_INTERVAL = float(getattr(settings, 'AUDIO_LOG_FLUSH_INTERVAL', 1.0))
+FSYNC_INTERVAL = float(getattr(settings, 'AUDIO_LOG_FSYNC_INTERVAL', 5.0))
+
+_lock = threading.Lock()
+_buffer = []
+_ultimo_fsync = 0.0
+_legado_revisado = False
+_hilo_escritor = None
+
+
+def _nombre_segmento(numero):
+    return f"lecturas-{numero:06d}.jsonl"
+
+
+def _segmentos():
+    """Lista los segmentos existentes, del más antiguo al más reciente."""
+    if not SEGMENT_DIR.exists():
+        return []
+    return sorted(SEGMENT_DIR.glob('lecturas-*.jsonl'))
+
+
+class _BloqueoArchivo:
+    """Bloqueo exclusivo entre procesos sobre LOCK_FILE."""
+
+    def __enter__(self):
+        SEGMENT_DIR.mkdir(parents=True, exist_ok=True)
+        self._f = open(LOCK_FILE, 'a')
+        if fcntl:
+            fcntl.flock(self._f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self._f, fcntl.LOCK_UN)
+        self._f.close()
+
+
+def _migrar_legado():
+    """
+    Pasa los registros del antiguo audio_readings.json a un segmento.
+    Debe llamarse con el bloqueo de archivo tomado.
+    """
+    global _legado_revisado
+    if _legado_revisado:
+        return
+    _legado_revisado = True
+
+    if not LOG_FILE.exists():
+        return
+    try:
+        with open(LOG_FILE, 'r', encoding='utf-8') as f:
+            registros = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return
+    if not registros:
+        return
+
+    # El segmento 0 queda antes de cualquier segmento nuevo
+    destino = SEGMENT_DIR / _nombre_segmento(0)
+    with open(destino, 'a', encoding='utf-8') as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    LOG_FILE.rename(LOG_FILE.with_suffix('.json.migrado'))
+
+
+def _segmento_actual():
+    """Devuelve el segmento donde escribir, rotando si superó el tamaño."""
+    segmentos = _segmentos()
+    if not segmentos:
+        return SEGMENT_DIR / _nombre_segmento(1)
+    ultimo = segmentos[-1]
+    numero = int(ultimo.stem.split('-')[1])
+    if numero == 0 or ultimo.stat().st_size >= SEGMENT_MAX_BYTES:
+        return SEGMENT_DIR / _nombre_segmento(numero + 1)
+    return ultimo
+
+
+def _escribir_buffer():
+    """Escribe en disco los registros pendientes de este proceso."""
+    global _buffer, _ultimo_fsync
+    with _lock:
+        if not _buffer:
+            return
+        pendientes, _buffer = _buffer, []
+
+        try:
+            with _BloqueoArchivo():
+                _migrar_legado()
+                with open(_segmento_actual(), 'a', encoding='utf-8') as f:
+                    f.write(''.join(pendientes))
+                    f.flush()
+                    ahora = time.monotonic()
+                    if ahora - _ultimo_fsync >= FSYNC_INTERVAL:
+                        os.fsync(f.fileno())
+                        _ultimo_fsync = ahora
+        except Exception as e:
+            print(f"Error al escribir lecturas: {e}")
+            # Reintentar en la siguiente escritura
+            _buffer = pendientes + _buffer
+
+
+def _escritor_periodico():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        _escribir_buffer()
+
+
+def _iniciar_escritor():
+    global _hilo_escritor
+    if _hilo_escritor is None:
+        _hilo_escritor = threading.Thread(
+            target=_escritor_periodico, name='audio-logger', daemon=True
+        )
+        _hilo_escritor.start()
+        atexit.register(_escribir_buffer)
 
 
 def registrar_lectura(id_publicacion, titulo, texto, id_usuario=None):
     """
-    Registra una lectura de texto por síntesis de voz en JSON.
-    
+    Registra una lectura de texto por síntesis de voz.
+
+    El registro queda en el buffer del proceso y se escribe al llenarse el
+    buffer o, como máximo, FLUSH_INTERVAL segundos después.
+
     Args:
         id_publicacion (int): ID de la publicación leída
         titulo (str): Título de la publicación
         texto (str): Texto que fue leído
         id_usuario (int, optional): ID del usuario que escuchó (si está logged in)
-    
+
     Returns:
-        bool: True si se guardó exitosamente, False en caso contrario
+        bool: True si se registró exitosamente, False en caso contrario
     """
     try:
-        # Asegurar que el directorio existe
-        LOG_DIR.mkdir(parents=True, exist_ok=True)
-        
-        # Crear registro
+        ahora = datetime.now()
         registro = {
             "id_publicacion": id_publicacion,
             "titulo": titulo,
             "texto": texto,
             "id_usuario": id_usuario,
-            "fecha_hora": datetime.now().isoformat(),
-            "timestamp": datetime.now().timestamp()
+            "fecha_hora": ahora.isoformat(),
+            "timestamp": ahora.timestamp()
         }
-        
-        # Leer registros existentes
-        registros = []
-        if LOG_FILE.exists():
-            try:
-                with open(LOG_FILE, 'r', encoding='utf-8') as f:
-                    registros = json.load(f)
-            except json.JSONDecodeError:
-                # Si el archivo está corrupto, comenzar de cero
-                registros = []
-        
-        # Añadir nuevo registro
-        registros.append(registro)
-        
-        # Guardar de vuelta
-        with open(LOG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(registros, f, ensure_ascii=False, indent=2)
-        
+        linea = json.dumps(registro, ensure_ascii=False) + '\n'
+
+        _iniciar_escritor()
+        with _lock:
+            _buffer.append(linea)
+            lleno = len(_buffer) >= BUFFER_MAX
+        if lleno:
+            _escribir_buffer()
+
         return True
-    
+
     except Exception as e:
         print(f"Error al registrar lectura: {e}")
         return False
 
 
+def escribir_pendientes():
+    """Escribe el buffer de este proceso y migra el archivo antiguo si existe."""
+    _escribir_buffer()
+    if not _legado_revisado and LOG_FILE.exists():
+        with _BloqueoArchivo():
+            _migrar_legado()
+
+
+def _leer_segmento(ruta):
+    """Recorre los registros completos de un segmento."""
+    with open(ruta, 'r', encoding='utf-8') as f:
+        for linea in f:
+            # Una línea sin salto final es una escritura en curso
+            if not linea.endswith('\n'):
+                break
+            try:
+                yield json.loads(linea)
+            except json.JSONDecodeError:
+                continue
+
+
 def obtener_todas_las_lecturas():
     """
-    Obtiene todos los registros de lecturas.
-    
+    Recorre todos los registros de lecturas, del más antiguo al más reciente.
+
     Returns:
-        list: Lista de registros o lista vacía si no hay registros
+        iterator: Registros leídos uno a uno desde los segmentos
     """
-    try:
-        if LOG_FILE.exists():
-            with open(LOG_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception as e:
-        print(f"Error al leer registros: {e}")
-    
-    return []
+    escribir_pendientes()
+    for ruta in _segmentos():
+        try:
+            yield from _leer_segmento(ruta)
+        except OSError as e:
+            print(f"Error al leer registros: {e}")
 
 
 def obtener_lecturas_por_publicacion(id_publicacion):
     """
-    Obtiene todos los registros de una publicación específica.
-    
+    Obtiene todos los registros de una publicación específica (usa el índice).
+
     Args:
         id_publicacion (int): ID de la publicación
-    
+
     Returns:
-        list: Lista de registros de esa publicación
+        list: Lista de registros de esa publicación, en orden cronológico
     """
-    todas = obtener_todas_las_lecturas()
-    return [r for r in todas if r['id_publicacion'] == id_publicacion]
+    from .audio_index import ConsultaLecturas
+    return ConsultaLecturas(id_publicacion=id_publicacion).recientes(-1)[::-1]
 
 
 def obtener_lecturas_por_usuario(id_usuario):
     """
-    Obtiene todos los registros de un usuario específico.
-    
+    Obtiene todos los registros de un usuario específico (usa el índice).
+
     Args:
         id_usuario (int): ID del usuario
-    
+
     Returns:
-        list: Lista de registros del usuario
+        list: Lista de registros del usuario, en orden cronológico
     """
-    todas = obtener_todas_las_lecturas()
-    return [r for r in todas if r['id_usuario'] == id_usuario]
+    from .audio_index import ConsultaLecturas
+    return ConsultaLecturas(id_usuario=id_usuario).recientes(-1)[::-1]
@@ -0,0 +1,126 @@
+"""
+Perfiles de codificación del audio servido a los navegadores.
+
+El MP3 de los motores de voz se transcodifica con ffmpeg a perfiles más
+livianos para voz (mono, bitrate bajo) y cada variante se guarda en la caché
+de audio junto al original. El perfil se elige según la cabecera Accept.
+"""
+import shutil
+import subprocess
+
+from django.conf import settings
+
+from . import audio_cache, tts
+
+
+# En orden de preferencia. Los perfiles "explicito" solo se usan si el cliente
+# nombra su tipo en Accept (Ogg/Opus no se reproduce en todos los navegadores).
+PERFILES = getattr(settings, 'AUDIO_PERFILES', {
+    'voz-opus': {
+        'content_type': 'audio/ogg',
+        'explicito': True,
+        'ffmpeg': ['-c:a', 'libopus', '-b:a', '24k', '-ac', '1', '-application', 'voip', '-f', 'ogg'],
+    },
+    'voz-mp3': {
+        'content_type': 'audio/mpeg',
+        'ffmpeg': ['-c:a', 'libmp3lame', '-b:a', '32k', '-ac', '1', '-ar', '22050', '-f', 'mp3'],
+    },
+})
+FFMPEG = getattr(settings, 'TTS_FFMPEG', 'ffmpeg')
+TIMEOUT = float(getattr(settings, 'AUDIO_TRANSCODIFICAR_TIMEOUT', 30))
+
+
+def _tipos_aceptados(accept):
+    """Convierte una cabecera Accept en {tipo: q}, sin parámetros como codecs."""
+    aceptados = {}
+    for elemento in (accept or '*/*').split(','):
+        tipo, *parametros = [parte.strip() for parte in elemento.split(';')]
+        calidad = 1.0
+        for parametro in parametros:
+            nombre, _, valor = parametro.partition('=')
+            if nombre.strip() == 'q':
+                try:
+                    calidad = float(valor)
+                except ValueError:
+                    calidad = 0.0
+        if tipo:
+            aceptados[tipo.lower()] = max(calidad, aceptados.get(tipo.lower(), 0.0))
+    return aceptados
+
+
+def elegir_perfil(accept):
+    """
+    Elige el perfil de audio para una cabecera Accept.
+
+    Args:
+        accept (str): Valor de la cabecera Accept (puede ser vacío)
+
+    Returns:
+        str: Nombre del perfil, o None para servir el MP3 original
+    """
+    aceptados = _tipos_aceptados(accept)
+    for nombre, perfil in PERFILES.items():
+        tipo = perfil['content_type']
+        calidad = aceptados.get(tipo)
+        if calidad is None and not perfil.get('explicito'):
+            calidad = aceptados.get(tipo.split('/')[0] + '/*', aceptados.get('*/*'))
+        if calidad:
+            return nombre
+    return None
+
+
+def content_type(perfil):
+    return PERFILES[perfil]['content_type'] if perfil else 'audio/mpeg'
+
+
+def _variante(perfil):
+    """(voz, codec) con que se guarda en caché la variante de un perfil."""
+    return tts.backends()[0].voz, perfil
+
+
+def obtener_cache(texto, perfil):
+    """Audio de un perfil ya transcodificado, o None."""
+    return audio_cache.obtener_audio(texto, *_variante(perfil))
+
+
+def transcodificar(audio, perfil):
+    """
+    Convierte un MP3 al perfil indicado con ffmpeg.
+
+    Returns:
+        bytes: Audio transcodificado, o None si ffmpeg no está o falla
+    """
+    if not shutil.which(FFMPEG):
+        return None
+    comando = [FFMPEG, '-loglevel', 'error', '-f', 'mp3', '-i', 'pipe:0', *PERFILES[perfil]['ffmpeg'], 'pipe:1']
+    try:
+        return subprocess.run(comando, input=audio, capture_output=True, timeout=TIMEOUT, check=True).stdout
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        print(f"Error transcodificando audio al perfil {perfil}: {e}")
+        return None
+
+
+def obtener(texto, audio, perfil):
+    """
+    Variante de un audio en un perfil, desde la caché o transcodificando el original.
+
+    Args:
+        texto (str): Texto sintetizado (clave de la caché)
+        audio (bytes): MP3 original completo del motor principal
+        perfil (str): Nombre del perfil
+
+    Returns:
+        bytes: Audio en el perfil, o None si no se pudo transcodificar
+    """
+    contenido = obtener_cache(texto, perfil)
+    if contenido is None:
+        contenido = transcodificar(audio, perfil)
+        if contenido is not None:
+            audio_cache.guardar_audio(texto, *_variante(perfil), contenido)
+    return contenido
+
+
+def generar_variantes(texto, audio):
+    """Transcodifica y guarda en caché el audio de un texto en todos los perfiles."""
+    for perfil in PERFILES:
+        obtener(texto, audio, perfil)
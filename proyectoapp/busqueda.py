@@ -0,0 +1,56 @@
+"""
+Búsqueda de texto completo en publicaciones.
+
+En PostgreSQL se consulta la columna ``busqueda`` (tsvector en español que
+mantiene un trigger) con su índice GIN y los resultados se ordenan por
+relevancia. En otras bases de datos (desarrollo con SQLite) se recurre a
+``icontains`` sobre los mismos campos, ordenando por fecha.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
+
+from .paginacion import ORDEN_PUBLICACIONES
+
+
+CONFIG = 'spanish'
+CAMPOS = ('titulo', 'descripcion', 'direccion')
+
+
+def disponible(alias='default'):
+    """True si la base de datos tiene búsqueda de texto completo."""
+    return connections[alias].vendor == 'postgresql'
+
+
+def consulta(texto):
+    # websearch: admite "frases", -exclusiones y OR como un buscador web
+    return SearchQuery(texto, config=CONFIG, search_type='websearch')
+
+
+def filtrar(queryset, texto):
+    """Publicaciones que coinciden con el texto, sin cambiar el orden."""
+    if disponible(queryset.db):
+        return queryset.filter(busqueda=consulta(texto))
+    filtro = Q()
+    for campo in CAMPOS:
+        filtro |= Q(**{f'{campo}__icontains': texto})
+    return queryset.filter(filtro)
+
+
+def buscar(queryset, texto):
+    """
+    Publicaciones que coinciden con el texto, las más relevantes primero.
+
+    Args:
+        queryset: Publicaciones donde buscar
+        texto (str): Lo que escribió el usuario
+
+    Returns:
+        QuerySet: Con la anotación ``rango`` en PostgreSQL
+    """
+    coincidencias = filtrar(queryset, texto)
+    if not disponible(queryset.db):
+        return coincidencias.order_by(*ORDEN_PUBLICACIONES)
+    return coincidencias.annotate(
+        rango=SearchRank(F('busqueda'), consulta(texto))
+    ).order_by('-rango', '-id_publicacion')
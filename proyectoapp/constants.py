@@ -17,3 +17,27 @@ REGIONES_CHILE = [
     ('XV Región de Arica y Parinacota', 'XV Región de Arica y Parinacota'),
     ('XVI Región de Ñuble', 'XVI Región de Ñuble'),
 ]
+
+REGIONES = {valor for valor, _ in REGIONES_CHILE}
+
+# Palabras que van en minúscula dentro del nombre de una comuna
+_CONECTORES_COMUNA = {'de', 'del', 'la', 'las', 'los', 'el', 'y'}
+
+
+def normalizar_comuna(nombre):
+    """
+    Forma canónica del nombre de una comuna, para filtrar y agrupar por igualdad.
+
+    Quita espacios sobrantes y usa mayúscula inicial salvo en los conectores
+    ("san pedro  DE LA paz" -> "San Pedro de la Paz").
+
+    Returns:
+        str: Nombre normalizado, o None si viene vacío
+    """
+    palabras = (nombre or '').split()
+    if not palabras:
+        return None
+    return ' '.join(
+        palabra.lower() if i and palabra.lower() in _CONECTORES_COMUNA else palabra[:1].upper() + palabra[1:].lower()
+        for i, palabra in enumerate(palabras)
+    )
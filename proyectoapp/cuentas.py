@@ -0,0 +1,111 @@
+"""
+Usuario con su perfil (persona, organización o municipalidad) en una sola
+consulta, y una caché corta de los datos del usuario de la sesión para las
+vistas que los necesitan en cada petición.
+
+En la caché se guardan solo datos para mostrar y autorizar (nunca el hash de
+la contraseña), y solo si es compartida entre procesos (DJANGO_CACHE_URL): con
+una caché local de cada worker, la invalidación de signals.py no llegaría a
+los demás y seguirían viendo el perfil anterior.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+
+from .models import Usuario
+
+
+PERFIL_TTL = 60  # segundos; los cambios de perfil invalidan la entrada (signals.py)
+# Relaciones inversas uno a uno de Usuario con cada tipo de perfil
+PERFILES = ('usuarionormal', 'organizacion', 'municipalidad')
+
+
+def _clave(id_usuario):
+    return f"usuario_perfil:{id_usuario}"
+
+
+def con_perfil():
+    """QuerySet de usuarios que trae su perfil en el mismo JOIN."""
+    return Usuario.objects.select_related(*PERFILES)
+
+
+def perfil(usuario, tipo):
+    """Perfil ya cargado de un usuario ('usuarionormal', 'organizacion'...), o None."""
+    try:
+        return getattr(usuario, tipo)
+    except ObjectDoesNotExist:
+        return None
+
+
+def nombre_para_mostrar(usuario):
+    """
+    Nombre para la barra de navegación, según el perfil del usuario.
+
+    Args:
+        usuario (Usuario): Usuario obtenido con ``con_perfil``
+
+    Returns:
+        str: Nombre y apellido, razón social o nombre de la municipalidad; el
+        email si no tiene perfil
+    """
+    normal = perfil(usuario, 'usuarionormal')
+    if normal:
+        return f"{normal.nombre} {normal.apellido}".strip() or usuario.email
+    organizacion = perfil(usuario, 'organizacion')
+    if organizacion:
+        return organizacion.razon_social or usuario.email
+    municipalidad = perfil(usuario, 'municipalidad')
+    if municipalidad:
+        return municipalidad.nombre_municipalidad or usuario.email
+    return usuario.email
+
+
+def _cache_compartida():
+    return getattr(settings, 'CACHE_COMPARTIDA', False)
+
+
+def datos(usuario):
+    """
+    Datos de un usuario ya cargado con su perfil que se pueden guardar en caché.
+
+    Returns:
+        dict: id_usuario, tipo_usuario, es_admin y nombre para mostrar
+    """
+    return {
+        'id_usuario': usuario.id_usuario,
+        'tipo_usuario': usuario.tipo_usuario,
+        'es_admin': usuario.es_admin,
+        'nombre': nombre_para_mostrar(usuario),
+    }
+
+
+def recordar(usuario):
+    """Guarda en la caché los datos de un usuario ya cargado con su perfil."""
+    if _cache_compartida():
+        cache.set(_clave(usuario.id_usuario), datos(usuario), PERFIL_TTL)
+
+
+def datos_sesion(request):
+    """
+    Datos del usuario de la sesión (ver ``datos``), desde la caché o con una consulta.
+
+    Returns:
+        dict: Los datos, o None si no hay sesión o el usuario ya no existe
+    """
+    id_usuario = request.session.get('id_usuario')
+    if not id_usuario:
+        return None
+    if _cache_compartida():
+        guardados = cache.get(_clave(id_usuario))
+        if guardados is not None:
+            return guardados
+    usuario = con_perfil().filter(id_usuario=id_usuario).first()
+    if usuario is None:
+        return None
+    recordar(usuario)
+    return datos(usuario)
+
+
+def invalidar(id_usuario):
+    if _cache_compartida():
+        cache.delete(_clave(id_usuario))
@@ -0,0 +1,40 @@
+"""
+Conteos por comuna para las insignias de los filtros de los listados.
+
+El GROUP BY se calcula una vez por versión de la tabla (VersionTabla) y se
+guarda en la caché, así que las páginas no recorren la tabla para mostrar
+cuántas filas hay en cada comuna.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import VersionTabla
+
+
+# La clave incluye la versión de la tabla: el TTL solo limita la memoria usada
+TTL = int(getattr(settings, 'FACETAS_CACHE_TTL', 24 * 3600))
+
+
+def conteo_comunas(modelo, version=None):
+    """
+    Cantidad de filas por comuna de un modelo con campo ``comuna``.
+
+    Args:
+        modelo: Publicacion o Beneficiario
+        version (int): Versión de la tabla si ya se conoce (ahorra una consulta)
+
+    Returns:
+        list: [(comuna, total), ...] ordenado por comuna
+    """
+    tabla = modelo._meta.db_table
+    if version is None:
+        version = VersionTabla.obtener(tabla)[0]
+    clave = f'facetas:comunas:{tabla}:{version}'
+    conteos = cache.get(clave)
+    if conteos is None:
+        conteos = list(
+            modelo.objects.exclude(comuna=None).values_list('comuna').annotate(total=Count('pk')).order_by('comuna')
+        )
+        cache.set(clave, conteos, TTL)
+    return conteos
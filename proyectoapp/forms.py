@@ -6,11 +6,18 @@ from .models import Usuario, UsuarioNormal, Organizacion, Publicacion, Beneficia
 class PublicacionForm(forms.ModelForm):
     class Meta:
         model = Publicacion
-        fields = ['titulo', 'descripcion', 'direccion']
+        fields = ['titulo', 'descripcion', 'direccion', 'region', 'comuna']
         widgets = {
             'titulo': forms.TextInput(attrs={'class': 'form-control'}),
             'descripcion': forms.Textarea(attrs={'class': 'form-control'}),
             'direccion': forms.TextInput(attrs={'class': 'form-control', 'required': 'required'}),
+            'region': forms.Select(attrs={'class': 'form-select'}),
+            'comuna': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Comuna'}),
+        }
+        error_messages = {
+            'titulo': {'required': 'El título es obligatorio.'},
+            'descripcion': {'required': 'La descripción es obligatoria.'},
+            'region': {'invalid_choice': 'La región no es una región de Chile válida.'},
         }
 
 # --- FORMULARIO DE ACCESO ---
@@ -52,7 +59,7 @@ class UsuarioForm(forms.ModelForm):
                 raise ValidationError("Por favor, ingresa un correo electrónico válido con un dominio válido.")
             # Evitar registros duplicados por email (sin distinguir mayúsculas)
             from .models import Usuario
-            qs = Usuario.objects.filter(email__iexact=email)
+            qs = Usuario.objects.filter(email__lower=email.lower())
             if self.instance and getattr(self.instance, 'pk', None):
                 qs = qs.exclude(pk=self.instance.pk)
             if qs.exists():
@@ -147,7 +154,7 @@ class OrganizacionForm(forms.ModelForm):
             raise ValidationError("La razón social no puede quedar vacía.")
         # Verificar duplicado de razón social
         from .models import Organizacion
-        qs = Organizacion.objects.filter(razon_social__iexact=razon_social.strip())
+        qs = Organizacion.objects.filter(razon_social__lower=razon_social.strip().lower())
         if self.instance and getattr(self.instance, 'pk', None):
             qs = qs.exclude(pk=self.instance.pk)
         if qs.exists():
@@ -162,7 +169,7 @@ class OrganizacionForm(forms.ModelForm):
             raise ValidationError("El RUT no puede contener letras, solo números y guiones.")
         # Verificar duplicado de RUT
         from .models import Organizacion
-        qs = Organizacion.objects.filter(rut__iexact=rut.strip())
+        qs = Organizacion.objects.filter(rut__lower=rut.strip().lower())
         if self.instance and getattr(self.instance, 'pk', None):
             qs = qs.exclude(pk=self.instance.pk)
         if qs.exists():
@@ -276,7 +283,7 @@ class MunicipalidadForm(forms.ModelForm):
             raise ValidationError("El nombre de la municipalidad no puede quedar vacío.")
         # Verificar duplicado por nombre de municipalidad
         from .models import Municipalidad
-        qs = Municipalidad.objects.filter(nombre_municipalidad__iexact=nombre.strip())
+        qs = Municipalidad.objects.filter(nombre_municipalidad__lower=nombre.strip().lower())
         if self.instance and getattr(self.instance, 'pk', None):
             qs = qs.exclude(pk=self.instance.pk)
         if qs.exists():
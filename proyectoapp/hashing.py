@@ -0,0 +1,153 @@
+"""
+Hash y verificación de contraseñas fuera del hilo de la petición.
+
+PBKDF2 y compañía ocupan la CPU durante decenas de milisegundos; ejecutarlos
+en el hilo que atiende la petición hace que una ráfaga de accesos o registros
+frene al resto del sitio. Con PASSWORD_HASH_WORKERS > 0 se ejecutan en un
+pool acotado de procesos y la cantidad de trabajos en espera también está
+acotada, así que una ráfaga espera su turno en vez de acumular trabajo sin
+límite. Cada proceso del servidor (worker de gunicorn) crea su propio pool,
+así que el total de procesos es workers × PASSWORD_HASH_WORKERS.
+
+Con 0 (por defecto) se hashea en el hilo de la petición; las variantes
+asíncronas lo hacen en un hilo aparte para no detener el loop de eventos.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+WORKERS = int(getattr(settings, 'PASSWORD_HASH_WORKERS', 0))
+# Trabajos que pueden esperar en el pool además de los que se ejecutan
+EN_ESPERA = int(getattr(settings, 'PASSWORD_HASH_EN_ESPERA', WORKERS * 4))
+# Segundos que una petición asíncrona espera un cupo antes de desistir
+ESPERA_CUPO = float(getattr(settings, 'PASSWORD_HASH_ESPERA_CUPO', 30))
+
+_lock = threading.Lock()
+_pool = None
+_cupos = threading.BoundedSemaphore(max(WORKERS + EN_ESPERA, 1))
+
+
+def _iniciar_worker():
+    import django
+    django.setup()
+
+
+def _obtener_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            # spawn: no se heredan hilos ni conexiones del proceso del servidor
+            _pool = ProcessPoolExecutor(
+                max_workers=WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_iniciar_worker,
+            )
+        return _pool
+
+
+def _ejecutar(funcion, *args):
+    if WORKERS <= 0:
+        return funcion(*args)
+    with _cupos:
+        return _obtener_pool().submit(funcion, *args).result()
+
+
+def _liberar_si_obtenido(cupo):
+    if not cupo.cancelled() and cupo.exception() is None and cupo.result():
+        _cupos.release()
+
+
+async def _aejecutar(funcion, *args):
+    if WORKERS <= 0:
+        return await sync_to_async(funcion, thread_sensitive=False)(*args)
+    # El cupo se espera en un hilo para no bloquear el loop. Si la petición se
+    # cancela mientras tanto, el hilo sigue esperando: el cupo que obtenga se
+    # devuelve al terminar en vez de perderse.
+    cupo = asyncio.get_running_loop().run_in_executor(None, _cupos.acquire, True, ESPERA_CUPO)
+    try:
+        obtenido = await asyncio.shield(cupo)
+    except asyncio.CancelledError:
+        cupo.add_done_callback(_liberar_si_obtenido)
+        raise
+    if not obtenido:
+        raise TimeoutError("No hay cupo para hashear contraseñas")
+    try:
+        futuro = _obtener_pool().submit(funcion, *args)
+    except BaseException:
+        _cupos.release()
+        raise
+    # Como en hacer_hashes, el cupo se devuelve cuando el trabajo termina (o se
+    # cancela antes de empezar), no cuando deja de esperarlo la petición
+    futuro.add_done_callback(lambda _: _cupos.release())
+    return await asyncio.wrap_future(futuro)
+
+
+def hacer_hash(contrasena):
+    """
+    Hash de una contraseña con el primer hasher de PASSWORD_HASHERS.
+
+    Args:
+        contrasena (str): Contraseña en texto plano
+
+    Returns:
+        str: Contraseña codificada (algoritmo$iteraciones$sal$hash)
+    """
+    return _ejecutar(hashers.make_password, contrasena)
+
+
+def hacer_hashes(contrasenas):
+    """
+    Hash de varias contraseñas repartidas entre los procesos del pool.
+
+    Args:
+        contrasenas (list): Contraseñas en texto plano
+
+    Returns:
+        list: Contraseñas codificadas, en el mismo orden
+    """
+    if WORKERS <= 0:
+        return [hashers.make_password(contrasena) for contrasena in contrasenas]
+    pool = _obtener_pool()
+    futuros = []
+    for contrasena in contrasenas:
+        # Cada trabajo ocupa un cupo hasta terminar, igual que en _ejecutar
+        _cupos.acquire()
+        futuro = pool.submit(hashers.make_password, contrasena)
+        futuro.add_done_callback(lambda _: _cupos.release())
+        futuros.append(futuro)
+    return [futuro.result() for futuro in futuros]
+
+
+async def ahacer_hash(contrasena):
+    """Variante asíncrona de ``hacer_hash``."""
+    return await _aejecutar(hashers.make_password, contrasena)
+
+
+def necesita_rehash(codificada):
+    """True si la contraseña no usa el hasher preferido o su costo actual."""
+    try:
+        hasher = hashers.identify_hasher(codificada)
+    except ValueError:
+        return True
+    return hasher.algorithm != hashers.get_hasher().algorithm or hasher.must_update(codificada)
+
+
+def verificar(contrasena, codificada):
+    """
+    Verifica una contraseña contra su versión codificada.
+
+    Returns:
+        bool: True si coincide
+    """
+    return _ejecutar(hashers.check_password, contrasena, codificada)
+
+
+async def averificar(contrasena, codificada):
+    """Variante asíncrona de ``verificar``."""
+    return await _aejecutar(hashers.check_password, contrasena, codificada)
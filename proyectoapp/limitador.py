@@ -0,0 +1,204 @@
+"""
+Control de admisión de las síntesis de voz (cubetas de fichas).
+
+Cada petición que no está en caché y va a llamar a los motores de voz gasta
+una ficha de la cubeta de su cliente (usuario o IP) y una de la cubeta
+global. Las cubetas se guardan en SQLite para que todos los workers del
+servidor compartan los mismos límites. Sin fichas, la petición se rechaza en
+el acto indicando cuándo reintentar: esperar ocuparía un worker (o, bajo
+ASGI, conexiones abiertas) justo cuando el servidor está más cargado.
+
+La IP del cliente se toma de X-Forwarded-For solo si la petición llega desde
+un proxy de confianza (PROXIES_CONFIABLES); si no, se usa REMOTE_ADDR, ya que
+esa cabecera la puede escribir cualquiera.
+"""
+import hashlib
+import ipaddress
+import math
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import audio_logger
+
+
+LIMITE_DB = Path(getattr(
+    settings, 'TTS_LIMITE_DB', audio_logger.LOG_DIR / 'tts_limite.sqlite3'
+))
+CLIENTE_POR_MINUTO = float(getattr(settings, 'TTS_LIMITE_CLIENTE_POR_MINUTO', 10))
+CLIENTE_RAFAGA = float(getattr(settings, 'TTS_LIMITE_CLIENTE_RAFAGA', 5))
+GLOBAL_POR_MINUTO = float(getattr(settings, 'TTS_LIMITE_GLOBAL_POR_MINUTO', 120))
+GLOBAL_RAFAGA = float(getattr(settings, 'TTS_LIMITE_GLOBAL_RAFAGA', 30))
+# Redes de los proxies inversos (balanceador, nginx) que agregan X-Forwarded-For
+PROXIES_CONFIABLES = [
+    ipaddress.ip_network(red, strict=False) for red in getattr(settings, 'PROXIES_CONFIABLES', [])
+]
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS cubetas (
+    clave TEXT PRIMARY KEY,
+    fichas REAL NOT NULL,
+    actualizado REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metricas (
+    nombre TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def _conexion():
+    """Conexión SQLite propia de cada hilo."""
+    if getattr(_local, 'ruta', None) != LIMITE_DB:
+        LIMITE_DB.parent.mkdir(parents=True, exist_ok=True)
+        conexion = sqlite3.connect(LIMITE_DB, timeout=30, isolation_level=None)
+        conexion.execute('PRAGMA journal_mode=WAL')
+        conexion.execute('PRAGMA synchronous=NORMAL')
+        conexion.executescript(_ESQUEMA)
+        _local.ruta, _local.conexion = LIMITE_DB, conexion
+    return _local.conexion
+
+
+def _confiable(ip):
+    try:
+        direccion = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(direccion in red for red in PROXIES_CONFIABLES)
+
+
+def ip_cliente(request):
+    """
+    IP del cliente detrás de los proxies de confianza.
+
+    Se recorre X-Forwarded-For de derecha a izquierda saltando los proxies de
+    confianza; el primer salto que no lo es es el cliente (lo que está más a la
+    izquierda lo escribió él y no sirve para identificarlo).
+
+    Returns:
+        str: La IP, o '' si no se conoce
+    """
+    ip = request.META.get('REMOTE_ADDR', '')
+    if not _confiable(ip):
+        return ip
+    saltos = [s.strip() for s in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if s.strip()]
+    for salto in reversed(saltos):
+        ip = salto
+        if not _confiable(salto):
+            break
+    return ip
+
+
+def _clave(request, id_usuario):
+    # La cookie de sesión sola no sirve: el cliente puede inventar una nueva en
+    # cada petición. Solo una sesión cargada con un usuario identifica a alguien.
+    origen = f"usuario:{id_usuario}" if id_usuario else f"ip:{ip_cliente(request)}"
+    return 'cliente:' + hashlib.sha256(origen.encode('utf-8')).hexdigest()[:32]
+
+
+def clave_cliente(request):
+    """Identifica al cliente por su usuario si inició sesión o, si no, por su IP."""
+    return _clave(request, request.session.get('id_usuario'))
+
+
+async def aclave_cliente(request):
+    """Variante asíncrona de ``clave_cliente``: la sesión se carga sin bloquear el loop."""
+    return _clave(request, await request.session.aget('id_usuario'))
+
+
+def _fichas(conexion, clave, capacidad, por_minuto, ahora):
+    fila = conexion.execute('SELECT fichas, actualizado FROM cubetas WHERE clave = ?', (clave,)).fetchone()
+    if fila is None:
+        return capacidad
+    fichas, actualizado = fila
+    return min(capacidad, fichas + (ahora - actualizado) * por_minuto / 60)
+
+
+def _espera(fichas, por_minuto):
+    """Segundos hasta que la cubeta tenga una ficha completa."""
+    if por_minuto <= 0:
+        return math.inf
+    return (1 - fichas) * 60 / por_minuto
+
+
+def _contar(conexion, nombre):
+    conexion.execute(
+        'INSERT INTO metricas (nombre, valor) VALUES (?, 1) '
+        'ON CONFLICT (nombre) DO UPDATE SET valor = valor + 1',
+        (nombre,),
+    )
+
+
+def admitir(clave):
+    """
+    Intenta gastar una ficha del cliente y una global.
+
+    Args:
+        clave (str): Clave del cliente (ver ``clave_cliente``)
+
+    Returns:
+        float: 0 si se admitió; si no, segundos hasta que haya fichas
+    """
+    conexion = _conexion()
+    ahora = time.time()
+    cubetas = [
+        (clave, CLIENTE_RAFAGA, CLIENTE_POR_MINUTO),
+        ('global', GLOBAL_RAFAGA, GLOBAL_POR_MINUTO),
+    ]
+    conexion.execute('BEGIN IMMEDIATE')
+    try:
+        fichas = [_fichas(conexion, c, capacidad, por_minuto, ahora) for c, capacidad, por_minuto in cubetas]
+        espera = max(
+            (_espera(f, por_minuto) for f, (_, _, por_minuto) in zip(fichas, cubetas) if f < 1),
+            default=0,
+        )
+        if espera == 0:
+            conexion.executemany(
+                'INSERT OR REPLACE INTO cubetas (clave, fichas, actualizado) VALUES (?, ?, ?)',
+                [(c, f - 1, ahora) for f, (c, _, _) in zip(fichas, cubetas)],
+            )
+            _contar(conexion, 'admitidas')
+        # De vez en cuando se olvidan los clientes inactivos
+        if random.random() < 0.01:
+            conexion.execute("DELETE FROM cubetas WHERE clave != 'global' AND actualizado < ?", (ahora - 3600,))
+        conexion.execute('COMMIT')
+    except Exception:
+        conexion.execute('ROLLBACK')
+        raise
+    return espera
+
+
+def _registrar(nombre):
+    _contar(_conexion(), nombre)
+
+
+def pedir_turno(clave):
+    """
+    Admite la petición o la rechaza sin esperar.
+
+    Returns:
+        int: None si se admitió; si no, segundos para la cabecera Retry-After
+    """
+    espera = admitir(clave)
+    if espera:
+        _registrar('rechazadas')
+        return math.ceil(min(espera, 3600))
+    return None
+
+
+async def apedir_turno(clave):
+    """Variante asíncrona de ``pedir_turno``: SQLite se consulta fuera del loop."""
+    return await sync_to_async(pedir_turno, thread_sensitive=False)(clave)
+
+
+def estadisticas():
+    """Peticiones admitidas y rechazadas (todos los workers)."""
+    valores = dict(_conexion().execute('SELECT nombre, valor FROM metricas').fetchall())
+    return {nombre: valores.get(nombre, 0) for nombre in ('admitidas', 'rechazadas')}
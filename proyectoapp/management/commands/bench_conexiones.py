@@ -0,0 +1,65 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el tiempo de conexión a la base de datos por petición, abriendo una "
+        "conexión nueva en cada una y reutilizando conexiones (CONN_MAX_AGE o pool)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=200)
+
+    def _medir(self, peticiones):
+        """Simula el ciclo de una petición y mide conexión + SELECT 1."""
+        tiempos = []
+        for _ in range(peticiones):
+            # Las mismas señales que emite el handler de Django al inicio/fin
+            request_started.send(sender=self.__class__)
+            inicio = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            request_finished.send(sender=self.__class__)
+        connection.close()
+        return tiempos
+
+    def _reportar(self, nombre, tiempos):
+        tiempos = sorted(tiempos)
+        p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+        self.stdout.write(
+            f"{nombre:<28} media {statistics.mean(tiempos):8.3f} ms   "
+            f"p50 {statistics.median(tiempos):8.3f} ms   p95 {p95:8.3f} ms"
+        )
+
+    def handle(self, *args, **options):
+        peticiones = options['peticiones']
+        ajustes = connection.settings_dict
+        original = (ajustes['CONN_MAX_AGE'], ajustes['CONN_HEALTH_CHECKS'])
+        usa_pool = bool(ajustes.get('OPTIONS', {}).get('pool'))
+
+        self.stdout.write(f"{peticiones} peticiones contra {connection.vendor} ({ajustes.get('HOST') or 'socket local'})")
+        try:
+            if not usa_pool:
+                # Antes: una conexión nueva por petición
+                connection.close()
+                ajustes['CONN_MAX_AGE'], ajustes['CONN_HEALTH_CHECKS'] = 0, False
+                self._reportar("sin persistencia", self._medir(peticiones))
+                ajustes['CONN_MAX_AGE'], ajustes['CONN_HEALTH_CHECKS'] = original
+
+            connection.close()
+            nombre = "pool psycopg" if usa_pool else (
+                f"CONN_MAX_AGE={ajustes['CONN_MAX_AGE']}"
+                f"{' + health checks' if ajustes['CONN_HEALTH_CHECKS'] else ''}"
+            )
+            if not usa_pool and not ajustes['CONN_MAX_AGE']:
+                self.stdout.write("CONN_MAX_AGE es 0: configure DATABASE_CONN_MAX_AGE o DATABASE_POOL para comparar.")
+                return
+            self._reportar(nombre, self._medir(peticiones))
+        finally:
+            ajustes['CONN_MAX_AGE'], ajustes['CONN_HEALTH_CHECKS'] = original
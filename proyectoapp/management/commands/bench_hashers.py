@@ -0,0 +1,55 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand
+
+from proyectoapp.hashing import _iniciar_worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuántos accesos por segundo (verificaciones de contraseña) soporta "
+        "cada hasher de PASSWORD_HASHERS, por núcleo y con un pool de procesos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificaciones', type=int, default=20,
+                            help="Verificaciones por proceso y hasher")
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        n = options['verificaciones']
+        procesos = options['procesos']
+        contrasena = 'Clave-de-prueba-123!'
+
+        self.stdout.write(f"{'hasher':<14} {'ms/verif.':>10} {'accesos/s/núcleo':>17} {f'accesos/s ({procesos} proc.)':>22}")
+        with ProcessPoolExecutor(
+            max_workers=procesos,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_iniciar_worker,
+        ) as pool:
+            for hasher in hashers.get_hashers():
+                try:
+                    codificada = hasher.encode(contrasena, hasher.salt())
+                except ValueError as e:  # falta la librería (argon2, bcrypt)
+                    self.stdout.write(f"{hasher.algorithm:<14} omitido: {e}")
+                    continue
+
+                inicio = time.perf_counter()
+                for _ in range(n):
+                    hashers.check_password(contrasena, codificada)
+                por_verificacion = (time.perf_counter() - inicio) / n
+
+                # Calentar los procesos antes de medir
+                list(pool.map(hashers.check_password, [contrasena] * procesos, [codificada] * procesos))
+                inicio = time.perf_counter()
+                list(pool.map(hashers.check_password, [contrasena] * n * procesos, [codificada] * n * procesos))
+                en_paralelo = n * procesos / (time.perf_counter() - inicio)
+
+                self.stdout.write(
+                    f"{hasher.algorithm:<14} {por_verificacion * 1000:>10.1f} "
+                    f"{1 / por_verificacion:>17.1f} {en_paralelo:>22.1f}"
+                )
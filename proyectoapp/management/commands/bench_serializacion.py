@@ -0,0 +1,76 @@
+import time
+from datetime import date, time as hora, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from proyectoapp.models import Publicacion
+from proyectoapp.renderers import JSONRapidoRenderer, orjson
+from proyectoapp.serializers import PublicacionSerializer, lectura_rapida
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara filas/s del listado de publicaciones de la API: PublicacionSerializer "
+        "+ JSONRenderer contra .values() + JSONRapidoRenderer, verificando que los "
+        "bytes sean idénticos. Las filas de prueba se crean en una transacción que "
+        "se deshace al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=2000)
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def _medir(self, funcion, repeticiones):
+        """Mejor tiempo de varias ejecuciones y el resultado de la última."""
+        mejor = None
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            transcurrido = time.perf_counter() - inicio
+            mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+        return mejor, resultado
+
+    def handle(self, *args, **options):
+        filas = options['filas']
+        repeticiones = options['repeticiones']
+        with transaction.atomic():
+            faltan = filas - Publicacion.objects.count()
+            if faltan > 0:
+                Publicacion.objects.bulk_create([
+                    Publicacion(
+                        titulo=f"Publicación de prueba {i} — ñandú",
+                        descripcion="Donación de alimentos y ropa " * 5,
+                        tipo_publicacion='donacion' if i % 2 else None,
+                        fecha_publicacion=date(2024, 1, 1) + timedelta(days=i % 365) if i % 7 else None,
+                        hora=hora(i % 24, i % 60) if i % 3 else None,
+                    )
+                    for i in range(faltan)
+                ], batch_size=500)
+
+            queryset = Publicacion.objects.order_by('-id_publicacion')[:filas]
+            lectura = lectura_rapida(PublicacionSerializer)
+
+            actual, esperado = self._medir(
+                lambda: JSONRenderer().render(PublicacionSerializer(queryset, many=True).data), repeticiones
+            )
+            valores, con_values = self._medir(
+                lambda: JSONRenderer().render(lectura.filas(lectura.consulta(queryset))), repeticiones
+            )
+            rapido, con_orjson = self._medir(
+                lambda: JSONRapidoRenderer().render(lectura.filas(lectura.consulta(queryset))), repeticiones
+            )
+            transaction.set_rollback(True)
+
+        for nombre, resultado in (('values()', con_values), ('values() + orjson', con_orjson)):
+            if resultado != esperado:
+                raise CommandError(f"La salida de {nombre} no coincide byte a byte con PublicacionSerializer")
+
+        self.stdout.write(f"{filas} filas, {len(esperado)} bytes, mejor de {repeticiones}; salidas idénticas")
+        for nombre, segundos in (
+            ('ModelSerializer + JSONRenderer', actual),
+            ('values() + JSONRenderer', valores),
+            ('values() + orjson' if orjson else 'values() (sin orjson)', rapido),
+        ):
+            self.stdout.write(f"{nombre:<32} {filas / segundos:>12.0f} filas/s   x{actual / segundos:.1f}")
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from proyectoapp.models import Usuario
+from proyectoapp.rehash import hashear_pendientes
+
+
+class Command(BaseCommand):
+    help = (
+        "Hashea por lotes y en paralelo las contraseñas que siguen en texto plano. "
+        "Las ya hasheadas se saltan, así que se puede interrumpir y volver a ejecutar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help="Usuarios por lote")
+        parser.add_argument('--procesos', type=int, default=None,
+                            help="Procesos para hashear (por defecto, los núcleos; 0 = sin pool)")
+        parser.add_argument('--desde', type=int, default=None,
+                            help="Continuar después de este id_usuario")
+
+    def handle(self, *args, **options):
+        def progreso(revisadas, hasheadas, segundos, ultima_pk):
+            self.stdout.write(
+                f"{revisadas} revisadas, {hasheadas} hasheadas, "
+                f"{hasheadas / segundos if segundos else 0:.1f} hashes/s (último id_usuario: {ultima_pk})"
+            )
+
+        revisadas, hasheadas = hashear_pendientes(
+            Usuario,
+            tamano_lote=options['lote'],
+            procesos=options['procesos'],
+            desde=options['desde'],
+            progreso=progreso,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Listo: {hasheadas} contraseñas hasheadas de {revisadas} revisadas."))
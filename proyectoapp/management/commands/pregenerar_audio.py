@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from proyectoapp import pregeneracion, tts
+from proyectoapp.models import Publicacion
+from proyectoapp.paginacion import ORDEN_PUBLICACIONES
+
+
+class Command(BaseCommand):
+    help = (
+        "Sintetiza hacia la caché el audio de las publicaciones existentes que aún "
+        "no lo tienen, empezando por las más recientes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=None,
+                            help="Máximo de publicaciones a revisar")
+
+    def handle(self, *args, **options):
+        principal = tts.backends()[0]
+        if not principal.disponible():
+            raise CommandError(f"El motor de voz principal ({principal.nombre}) no está configurado")
+
+        publicaciones = (
+            Publicacion.objects.order_by(*ORDEN_PUBLICACIONES)
+            .only('titulo', 'descripcion', 'direccion', 'comuna')
+        )
+        if options['limite']:
+            publicaciones = publicaciones[:options['limite']]
+
+        en_cache = encoladas = 0
+        for publicacion in publicaciones.iterator(chunk_size=500):
+            texto = tts.texto_publicacion(publicacion)
+            if not texto:
+                continue
+            if tts.en_cache(texto):
+                en_cache += 1
+            elif pregeneracion.encolar_texto(texto):
+                encoladas += 1
+
+        self.stdout.write(f"{en_cache} ya en caché, {encoladas} encoladas")
+        ultimo = None
+        while not pregeneracion.esperar(timeout=5):
+            restantes = pregeneracion.pendientes()
+            if restantes != ultimo:
+                self.stdout.write(f"  quedan {restantes}")
+                ultimo = restantes
+
+        stats = pregeneracion.estadisticas()
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['generados']} audios generados, {stats['fallidos']} fallidos "
+            f"({stats['reintentos']} reintentos)"
+        ))
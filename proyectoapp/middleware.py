@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+
+
+# Clave interna de la sesión con la última renovación de su expiración
+CLAVE_RENOVADA = '_renovada'
+
+
+class SesionDeslizanteMiddleware:
+    """
+    Renueva la expiración de la sesión de un usuario conectado solo cuando le
+    quedan menos de SESSION_RENOVAR_UMBRAL segundos, en vez de guardarla en
+    cada petición (SESSION_SAVE_EVERY_REQUEST).
+
+    Debe ir después de SessionMiddleware en MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        # Sin cookie de sesión no hay nada que renovar (ni que cargar)
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES and not request.session.modified:
+            return response
+
+        sesion = request.session
+        if not sesion.get('id_usuario'):
+            return response
+
+        ahora = time.time()
+        umbral = getattr(settings, 'SESSION_RENOVAR_UMBRAL', settings.SESSION_COOKIE_AGE // 2)
+        renovada = sesion.get(CLAVE_RENOVADA, 0)
+        # Si la vista ya modificó la sesión se guarda igual: se aprovecha para renovar
+        if sesion.modified or ahora - renovada > settings.SESSION_COOKIE_AGE - umbral:
+            sesion[CLAVE_RENOVADA] = ahora
+        return response
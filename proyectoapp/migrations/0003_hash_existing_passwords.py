@@ -1,16 +1,30 @@
 from django.db import migrations
-from django.contrib.auth.hashers import make_password
+from django.db.models import Q
+from django.contrib.auth.hashers import get_hashers, make_password
+
+# Filas leídas y escritas por lote
+TAMANO_LOTE = 500
+
 
 def hash_existing_passwords(apps, schema_editor):
     # Obtener el modelo histórico
     Usuario = apps.get_model('proyectoapp', 'Usuario')
-    # Hashear todas las contraseñas existentes
-    for usuario in Usuario.objects.all():
-        # Guardar la contraseña actual en texto plano
-        plain_password = usuario.contrasena
-        # Aplicar el hash
-        usuario.contrasena = make_password(plain_password)
-        usuario.save()
+    # Código congelado (no importa módulos de la app, que pueden cambiar): se
+    # hashea en este proceso, por lotes. Para tablas grandes, el comando
+    # hashear_contrasenas hace lo mismo en paralelo y se puede reanudar.
+    sin_hash = Q()
+    for hasher in get_hashers():
+        sin_hash &= ~Q(contrasena__startswith=f"{hasher.algorithm}$")
+    pendientes = Usuario.objects.filter(sin_hash).order_by('pk').only('pk', 'contrasena')
+    lote = []
+    for usuario in pendientes.iterator(chunk_size=TAMANO_LOTE):
+        usuario.contrasena = make_password(usuario.contrasena)
+        lote.append(usuario)
+        if len(lote) >= TAMANO_LOTE:
+            Usuario.objects.bulk_update(lote, ['contrasena'])
+            lote = []
+    if lote:
+        Usuario.objects.bulk_update(lote, ['contrasena'])
 
 def reverse_passwords(apps, schema_editor):
     # No podemos revertir el hash, así que no hacemos nada
@@ -24,4 +38,4 @@ class Migration(migrations.Migration):
 
     operations = [
         migrations.RunPython(hash_existing_passwords, reverse_passwords),
-    ]
\ No newline at end of file
+    ]
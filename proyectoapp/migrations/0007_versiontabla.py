@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectoapp', '0006_remove_donacion_id_publicacion_donacionmonetaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionTabla',
+            fields=[
+                ('tabla', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('modificado', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'version_tabla',
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:49
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectoapp', '0007_versiontabla'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='beneficiario',
+            index=models.Index(fields=['nombre'], name='beneficiario_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campana',
+            index=models.Index(fields=['id_usuario', '-fecha_inicio'], name='campana_usuario_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='municipalidad',
+            index=models.Index(django.db.models.functions.text.Lower('nombre_municipalidad'), name='municipalidad_nombre_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='organizacion',
+            index=models.Index(django.db.models.functions.text.Lower('rut'), name='organizacion_rut_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='organizacion',
+            index=models.Index(django.db.models.functions.text.Lower('razon_social'), name='organizacion_razon_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='publicacion',
+            index=models.Index(models.OrderBy(models.F('fecha_publicacion'), descending=True, nulls_last=True), models.OrderBy(models.F('id_publicacion'), descending=True), name='publicacion_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='publicacion',
+            index=models.Index(fields=['id_usuario', '-fecha_publicacion'], name='publicacion_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='publicacion',
+            index=models.Index(fields=['tipo_publicacion', '-fecha_publicacion'], name='publicacion_tipo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='usuario_email_lower_idx'),
+        ),
+    ]
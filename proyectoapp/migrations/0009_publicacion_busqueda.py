@@ -0,0 +1,71 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Mismos pesos que busqueda.py: título > descripción > dirección
+CREAR = """
+CREATE FUNCTION publicacion_busqueda_actualizar() RETURNS trigger AS $$
+BEGIN
+    NEW.busqueda :=
+        setweight(to_tsvector('pg_catalog.spanish', coalesce(NEW.titulo, '')), 'A') ||
+        setweight(to_tsvector('pg_catalog.spanish', coalesce(NEW.descripcion, '')), 'B') ||
+        setweight(to_tsvector('pg_catalog.spanish', coalesce(NEW.direccion, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER publicacion_busqueda_trg
+    BEFORE INSERT OR UPDATE OF titulo, descripcion, direccion ON publicacion
+    FOR EACH ROW EXECUTE FUNCTION publicacion_busqueda_actualizar();
+
+UPDATE publicacion SET busqueda =
+    setweight(to_tsvector('pg_catalog.spanish', coalesce(titulo, '')), 'A') ||
+    setweight(to_tsvector('pg_catalog.spanish', coalesce(descripcion, '')), 'B') ||
+    setweight(to_tsvector('pg_catalog.spanish', coalesce(direccion, '')), 'C');
+
+CREATE INDEX publicacion_busqueda_idx ON publicacion USING gin (busqueda);
+"""
+
+BORRAR = """
+DROP INDEX IF EXISTS publicacion_busqueda_idx;
+DROP TRIGGER IF EXISTS publicacion_busqueda_trg ON publicacion;
+DROP FUNCTION IF EXISTS publicacion_busqueda_actualizar();
+"""
+
+
+def crear_busqueda(apps, schema_editor):
+    # En otras bases de datos la búsqueda usa icontains (ver busqueda.py)
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREAR)
+
+
+def borrar_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(BORRAR)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectoapp', '0008_indices_filtros_y_orden'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publicacion',
+            name='busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='publicacion',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['busqueda'], name='publicacion_busqueda_idx'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(crear_busqueda, borrar_busqueda),
+            ],
+        ),
+    ]
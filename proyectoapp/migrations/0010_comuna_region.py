@@ -0,0 +1,63 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:17
+
+from django.db import migrations, models
+
+
+# Copia congelada de constants.normalizar_comuna: la migración no debe cambiar
+# si esa función cambia después
+_CONECTORES_COMUNA = {'de', 'del', 'la', 'las', 'los', 'el', 'y'}
+
+
+def normalizar_comuna(nombre):
+    palabras = (nombre or '').split()
+    if not palabras:
+        return None
+    return ' '.join(
+        palabra.lower() if i and palabra.lower() in _CONECTORES_COMUNA else palabra[:1].upper() + palabra[1:].lower()
+        for i, palabra in enumerate(palabras)
+    )
+
+
+def normalizar_comunas_beneficiarios(apps, schema_editor):
+    # Los filtros y conteos comparan por igualdad con la forma normalizada
+    Beneficiario = apps.get_model('proyectoapp', 'Beneficiario')
+    cambiados = []
+    for beneficiario in Beneficiario.objects.exclude(comuna=None).only('pk', 'comuna').iterator(chunk_size=1000):
+        normalizada = normalizar_comuna(beneficiario.comuna)
+        if normalizada != beneficiario.comuna:
+            beneficiario.comuna = normalizada
+            cambiados.append(beneficiario)
+    Beneficiario.objects.bulk_update(cambiados, ['comuna'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectoapp', '0009_publicacion_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publicacion',
+            name='comuna',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='publicacion',
+            name='region',
+            field=models.CharField(blank=True, choices=[('I Región de Tarapacá', 'I Región de Tarapacá'), ('II Región de Antofagasta', 'II Región de Antofagasta'), ('III Región de Atacama', 'III Región de Atacama'), ('IV Región de Coquimbo', 'IV Región de Coquimbo'), ('V Región de Valparaíso', 'V Región de Valparaíso'), ("VI Región de O'Higgins", "VI Región de O'Higgins"), ('VII Región del Maule', 'VII Región del Maule'), ('VIII Región de Bío Bío', 'VIII Región de Bío Bío'), ('IX Región de La Araucanía', 'IX Región de La Araucanía'), ('X Región de Los Lagos', 'X Región de Los Lagos'), ('XI Región de Aysén', 'XI Región de Aysén'), ('XII Región de Magallanes', 'XII Región de Magallanes'), ('Región Metropolitana de Santiago', 'Región Metropolitana de Santiago'), ('XIV Región de Los Ríos', 'XIV Región de Los Ríos'), ('XV Región de Arica y Parinacota', 'XV Región de Arica y Parinacota'), ('XVI Región de Ñuble', 'XVI Región de Ñuble')], max_length=50, null=True),
+        ),
+        migrations.RunPython(normalizar_comunas_beneficiarios, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='beneficiario',
+            index=models.Index(fields=['comuna', 'nombre'], name='beneficiario_comuna_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='publicacion',
+            index=models.Index(models.F('comuna'), models.OrderBy(models.F('fecha_publicacion'), descending=True, nulls_last=True), models.OrderBy(models.F('id_publicacion'), descending=True), name='publicacion_comuna_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='publicacion',
+            index=models.Index(models.F('region'), models.OrderBy(models.F('fecha_publicacion'), descending=True, nulls_last=True), models.OrderBy(models.F('id_publicacion'), descending=True), name='publicacion_region_fecha_idx'),
+        ),
+    ]
@@ -1,6 +1,16 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from django.contrib.auth.hashers import make_password
-from django.contrib.auth.hashers import check_password
+from django.db.models import F
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from . import hashing
+from .constants import REGIONES_CHILE, normalizar_comuna
+
+# Permite filtrar con campo__lower=valor.lower(), que usa los índices Lower(...)
+# (en PostgreSQL __iexact compila a UPPER(campo::text) y no los aprovecha)
+models.CharField.register_lookup(Lower)
 
 class ApoyoBeneficiario(models.Model):
     id_apoyo = models.AutoField(primary_key=True)
@@ -41,6 +51,15 @@ class Beneficiario(models.Model):
     class Meta:
             
         db_table = 'beneficiario'
+        indexes = [
+            models.Index(fields=['nombre'], name='beneficiario_nombre_idx'),
+            # Filtro por comuna del listado, ordenado por nombre
+            models.Index(fields=['comuna', 'nombre'], name='beneficiario_comuna_nombre_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.comuna = normalizar_comuna(self.comuna)
+        super().save(*args, **kwargs)
 
 
 class Campana(models.Model):
@@ -54,6 +73,9 @@ class Campana(models.Model):
     class Meta:
             
         db_table = 'campana'
+        indexes = [
+            models.Index(fields=['id_usuario', '-fecha_inicio'], name='campana_usuario_inicio_idx'),
+        ]
 
 
 class Dependiente(models.Model):
@@ -98,6 +120,9 @@ class Municipalidad(models.Model):
     class Meta:
             
         db_table = 'municipalidad'
+        indexes = [
+            models.Index(Lower('nombre_municipalidad'), name='municipalidad_nombre_lower_idx'),
+        ]
 
 
 class Notificacion(models.Model):
@@ -125,6 +150,17 @@ class Organizacion(models.Model):
     class Meta:
             
         db_table = 'organizacion'
+        indexes = [
+            models.Index(Lower('rut'), name='organizacion_rut_lower_idx'),
+            models.Index(Lower('razon_social'), name='organizacion_razon_lower_idx'),
+        ]
+
+
+class PublicacionManager(models.Manager):
+
+    def get_queryset(self):
+        # El tsvector solo se usa dentro de la base de datos: no se trae en cada consulta
+        return super().get_queryset().defer('busqueda')
 
 
 class Publicacion(models.Model):
@@ -139,10 +175,42 @@ class Publicacion(models.Model):
     # Campo "Hora" presente en el diagrama ER: opcional para compatibilidad
     hora = models.TimeField(blank=True, null=True)
     documento_respaldo = models.CharField(max_length=100, blank=True, null=True)
+    region = models.CharField(max_length=50, choices=REGIONES_CHILE, blank=True, null=True)
+    # Siempre en la forma de normalizar_comuna, para filtrar y contar por igualdad
+    comuna = models.CharField(max_length=50, blank=True, null=True)
+    # tsvector en español de título, descripción y dirección; lo mantiene un
+    # trigger de PostgreSQL (migración 0009), también en bulk_update y update()
+    busqueda = SearchVectorField(blank=True, null=True, editable=False)
+
+    objects = PublicacionManager()
 
     class Meta:
             
         db_table = 'publicacion'
+        indexes = [
+            # Listados públicos: ORDER BY fecha DESC NULLS LAST, id DESC (keyset)
+            models.Index(
+                F('fecha_publicacion').desc(nulls_last=True), F('id_publicacion').desc(),
+                name='publicacion_fecha_id_idx',
+            ),
+            models.Index(fields=['id_usuario', '-fecha_publicacion'], name='publicacion_usuario_fecha_idx'),
+            models.Index(fields=['tipo_publicacion', '-fecha_publicacion'], name='publicacion_tipo_fecha_idx'),
+            # Filtros por comuna y región del listado público, en su mismo orden
+            models.Index(
+                F('comuna'), F('fecha_publicacion').desc(nulls_last=True), F('id_publicacion').desc(),
+                name='publicacion_comuna_fecha_idx',
+            ),
+            models.Index(
+                F('region'), F('fecha_publicacion').desc(nulls_last=True), F('id_publicacion').desc(),
+                name='publicacion_region_fecha_idx',
+            ),
+            # Búsqueda de texto completo (?q=); solo se crea en PostgreSQL
+            GinIndex(fields=['busqueda'], name='publicacion_busqueda_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.comuna = normalizar_comuna(self.comuna)
+        super().save(*args, **kwargs)
 
 
 class Reserva(models.Model):
@@ -168,11 +236,25 @@ class Usuario(models.Model):
         if self._state.adding or (
             hasattr(self, '_password_changed') and self._password_changed
         ):
-            self.contrasena = make_password(self.contrasena)
+            self.contrasena = hashing.hacer_hash(self.contrasena)
+            self._password_changed = False
         super().save(*args, **kwargs)
 
     def check_password(self, raw_password):
-        return check_password(raw_password, self.contrasena)
+        valida = hashing.verificar(raw_password, self.contrasena)
+        if valida and hashing.necesita_rehash(self.contrasena):
+            # Cambió el hasher o su costo: se actualiza el hash al acceder
+            self.set_password(raw_password)
+            self.save(update_fields=['contrasena'])
+        return valida
+
+    async def acheck_password(self, raw_password):
+        """Variante asíncrona de check_password (para vistas bajo ASGI)."""
+        valida = await hashing.averificar(raw_password, self.contrasena)
+        if valida and hashing.necesita_rehash(self.contrasena):
+            self.contrasena = await hashing.ahacer_hash(raw_password)
+            await self.asave(update_fields=['contrasena'])
+        return valida
 
     def set_password(self, raw_password):
         self.contrasena = raw_password
@@ -180,6 +262,9 @@ class Usuario(models.Model):
 
     class Meta:
         db_table = 'usuario'
+        indexes = [
+            models.Index(Lower('email'), name='usuario_email_lower_idx'),
+        ]
 
 
 class UsuarioNormal(models.Model):
@@ -190,4 +275,27 @@ class UsuarioNormal(models.Model):
 
     class Meta:
             
-        db_table = 'usuario_normal'
\ No newline at end of file
+        db_table = 'usuario_normal'
+
+
+class VersionTabla(models.Model):
+    """Contador de cambios por tabla; sirve para invalidar cachés de listados."""
+    tabla = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    modificado = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'version_tabla'
+
+    @classmethod
+    def obtener(cls, tabla):
+        """Devuelve (version, modificado) de una tabla, o (0, None) si nunca cambió."""
+        fila = cls.objects.filter(tabla=tabla).values_list('version', 'modificado').first()
+        return fila or (0, None)
+
+    @classmethod
+    def incrementar(cls, tabla):
+        ahora = timezone.now()
+        actualizadas = cls.objects.filter(tabla=tabla).update(version=F('version') + 1, modificado=ahora)
+        if not actualizadas:
+            cls.objects.get_or_create(tabla=tabla, defaults={'version': 1, 'modificado': ahora})
@@ -0,0 +1,147 @@
+"""
+Paginación por keyset de publicaciones sobre (fecha_publicacion, id_publicacion).
+
+A diferencia de OFFSET, cada página filtra desde la última fila de la anterior,
+así que su costo no crece con el número de página.
+"""
+from datetime import date
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+ORDEN_PUBLICACIONES = (F('fecha_publicacion').desc(nulls_last=True), '-id_publicacion')
+
+
+def _leer_cursor(cursor):
+    """Convierte 'AAAA-MM-DD:id' (o ':id' sin fecha) en (fecha, id); None si no es válido."""
+    if not cursor:
+        return None
+    try:
+        fecha, id_publicacion = cursor.split(':')
+        return (date.fromisoformat(fecha) if fecha else None, int(id_publicacion))
+    except ValueError:
+        return None
+
+
+class PaginaPublicaciones:
+    """
+    Página de publicaciones, más recientes primero.
+
+    La consulta se ejecuta recién al acceder a ``publicaciones`` o a
+    ``siguiente``, de modo que una plantilla que sirve la página desde la
+    caché de fragmentos no toca la base de datos.
+    """
+
+    def __init__(self, queryset, cursor=None, tamano=12):
+        self.queryset = queryset
+        self.tamano = tamano
+        posicion = _leer_cursor(cursor)
+        # Cursor normalizado: sirve como clave de caché sin valores arbitrarios
+        self.cursor = f"{posicion[0] or ''}:{posicion[1]}" if posicion else ''
+        self._posicion = posicion
+
+    def _filtro(self):
+        fecha, id_publicacion = self._posicion
+        if fecha is None:
+            return Q(fecha_publicacion__isnull=True, id_publicacion__lt=id_publicacion)
+        return (
+            Q(fecha_publicacion__lt=fecha)
+            | Q(fecha_publicacion=fecha, id_publicacion__lt=id_publicacion)
+            | Q(fecha_publicacion__isnull=True)
+        )
+
+    @cached_property
+    def _resultado(self):
+        queryset = self.queryset.order_by(*ORDEN_PUBLICACIONES)
+        if self._posicion:
+            queryset = queryset.filter(self._filtro())
+        filas = list(queryset[:self.tamano + 1])
+
+        siguiente = None
+        if len(filas) > self.tamano:
+            filas = filas[:self.tamano]
+            ultima = filas[-1]
+            siguiente = f"{ultima.fecha_publicacion or ''}:{ultima.id_publicacion}"
+        return filas, siguiente
+
+    @property
+    def publicaciones(self):
+        return self._resultado[0]
+
+    @property
+    def siguiente(self):
+        return self._resultado[1]
+
+    @property
+    def es_primera(self):
+        return not self.cursor
+
+
+class PaginaBusqueda:
+    """
+    Página de resultados de una búsqueda, en el orden del queryset (relevancia).
+
+    La relevancia no sirve como keyset (se calcula en cada consulta), así que
+    el cursor es el desplazamiento. Ordenar por relevancia ya exige evaluar
+    todas las coincidencias, de modo que OFFSET no agrega un costo apreciable.
+    Tiene la misma interfaz que ``PaginaPublicaciones`` para las plantillas.
+    """
+
+    def __init__(self, queryset, cursor=None, tamano=12):
+        self.queryset = queryset
+        self.tamano = tamano
+        self._desde = int(cursor) if cursor and cursor.isdigit() else 0
+        self.cursor = str(self._desde) if self._desde else ''
+
+    @cached_property
+    def _resultado(self):
+        filas = list(self.queryset[self._desde:self._desde + self.tamano + 1])
+        siguiente = None
+        if len(filas) > self.tamano:
+            filas = filas[:self.tamano]
+            siguiente = str(self._desde + self.tamano)
+        return filas, siguiente
+
+    @property
+    def publicaciones(self):
+        return self._resultado[0]
+
+    @property
+    def siguiente(self):
+        return self._resultado[1]
+
+    @property
+    def es_primera(self):
+        return not self.cursor
+
+
+class CursorAPI(CursorPagination):
+    """
+    Paginación por cursor de la API REST (?cursor=...&tamano=N).
+
+    Ordena por la clave primaria, que es única y no nula, así que cada página
+    es un rango del índice de la tabla.
+    """
+    page_size = int(getattr(settings, 'API_PAGINA', 100))
+    page_size_query_param = 'tamano'
+    max_page_size = int(getattr(settings, 'API_PAGINA_MAX', 1000))
+
+
+class CursorUsuarios(CursorAPI):
+    ordering = 'id_usuario'
+
+
+class CursorPublicaciones(CursorAPI):
+    # Más recientes primero, como los listados del sitio
+    ordering = '-id_publicacion'
+
+
+class PaginasBusquedaAPI(PageNumberPagination):
+    """Resultados de ?q= en la API, por relevancia (?pagina=N&tamano=M)."""
+    page_size = CursorAPI.page_size
+    page_query_param = 'pagina'
+    page_size_query_param = 'tamano'
+    max_page_size = CursorAPI.max_page_size
@@ -0,0 +1,135 @@
+"""
+Pre-generación del audio de publicaciones en segundo plano.
+
+Al publicar o editar, el texto de la publicación se encola y un pequeño pool
+de hilos del propio proceso lo sintetiza hacia la caché de audio, junto con
+sus variantes en cada perfil de ``audio_perfiles``, así la primera
+reproducción ya es una lectura de disco. Solo se usa el motor principal
+(sin respaldo): si falla, el texto se vuelve a encolar con espera
+exponencial hasta agotar los reintentos.
+"""
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from . import audio_perfiles, tts
+
+
+ACTIVA = getattr(settings, 'TTS_PREGENERAR', True)
+WORKERS = int(getattr(settings, 'TTS_PREGENERAR_WORKERS', 2))
+REINTENTOS = int(getattr(settings, 'TTS_PREGENERAR_REINTENTOS', 4))
+ESPERA_BASE = float(getattr(settings, 'TTS_PREGENERAR_ESPERA', 2.0))
+# Sin una petición esperando, el principal puede tardar más que TTS_PRESUPUESTO
+TIMEOUT = float(getattr(settings, 'TTS_PREGENERAR_TIMEOUT', tts.VOICERSS_TIMEOUT))
+
+_cola = queue.Queue()
+_lock = threading.Lock()
+_pendientes = set()
+_hilos = []
+_contadores = {'generados': 0, 'reintentos': 0, 'fallidos': 0}
+
+
+def _espera(intento):
+    """Segundos antes del reintento ``intento`` (1, 2, 3...)."""
+    return ESPERA_BASE * 2 ** (intento - 1)
+
+
+def _trabajador():
+    while True:
+        texto, intento = _cola.get()
+        try:
+            audio = tts.sintetizar_completo(texto, TIMEOUT)
+            audio_perfiles.generar_variantes(texto, audio)
+            resultado = 'generados'
+        except tts.ErrorSintesis as e:
+            if intento < REINTENTOS:
+                with _lock:
+                    _contadores['reintentos'] += 1
+                temporizador = threading.Timer(_espera(intento + 1), _cola.put, [(texto, intento + 1)])
+                temporizador.daemon = True
+                temporizador.start()
+                continue
+            print(f"No se pudo pre-generar el audio tras {intento + 1} intentos: {e}")
+            resultado = 'fallidos'
+        except Exception as e:
+            print(f"Error pre-generando audio: {e}")
+            resultado = 'fallidos'
+        finally:
+            _cola.task_done()
+        with _lock:
+            _contadores[resultado] += 1
+            _pendientes.discard(texto)
+
+
+def _iniciar_trabajadores():
+    with _lock:
+        while len(_hilos) < WORKERS:
+            hilo = threading.Thread(target=_trabajador, name=f'pregeneracion-{len(_hilos)}', daemon=True)
+            hilo.start()
+            _hilos.append(hilo)
+
+
+def encolar_texto(texto):
+    """
+    Encola un texto para sintetizarlo en segundo plano.
+
+    Args:
+        texto (str): Texto a sintetizar
+
+    Returns:
+        bool: False si el texto ya estaba en cola
+    """
+    with _lock:
+        if texto in _pendientes:
+            return False
+        _pendientes.add(texto)
+    _iniciar_trabajadores()
+    _cola.put((texto, 0))
+    return True
+
+
+def encolar(publicacion):
+    """
+    Pre-genera el audio de una publicación una vez confirmada la transacción.
+
+    No hace nada si la pre-generación está desactivada o el motor principal
+    no está configurado.
+
+    Args:
+        publicacion (Publicacion): Publicación recién creada o editada
+    """
+    if not ACTIVA or not tts.principal_disponible():
+        return
+    texto = tts.texto_publicacion(publicacion)
+    if texto:
+        transaction.on_commit(lambda: encolar_texto(texto))
+
+
+def pendientes():
+    """Cantidad de textos en cola o esperando un reintento."""
+    with _lock:
+        return len(_pendientes)
+
+
+def esperar(timeout=None):
+    """
+    Espera a que se vacíe la cola, incluidos los reintentos programados.
+
+    Returns:
+        bool: True si se vació antes del timeout
+    """
+    limite = None if timeout is None else time.monotonic() + timeout
+    while pendientes():
+        if limite is not None and time.monotonic() >= limite:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def estadisticas():
+    """Contadores del proceso actual más el tamaño de la cola."""
+    with _lock:
+        return dict(_contadores, pendientes=len(_pendientes))
@@ -0,0 +1,96 @@
+"""
+Hash por lotes de las contraseñas guardadas en texto plano.
+
+Se usa desde el comando ``hashear_contrasenas`` (la migración 0003 tiene su
+propia copia congelada, en un solo proceso).
+Recorre la tabla por clave primaria en lotes, hashea cada lote en paralelo en
+un pool de procesos y lo escribe con un solo ``bulk_update``. Las filas ya
+hasheadas se saltan, así que se puede interrumpir y volver a ejecutar.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import hashers
+from django.db.models import Q
+
+from .hashing import _iniciar_worker
+
+
+def _ya_hasheada(contrasena):
+    try:
+        hashers.identify_hasher(contrasena)
+    except ValueError:
+        return False
+    return True
+
+
+def _sin_hash():
+    """Filtro de las filas cuya contraseña no empieza con 'algoritmo$' de un hasher conocido."""
+    filtro = Q()
+    for hasher in hashers.get_hashers():
+        filtro &= ~Q(contrasena__startswith=f"{hasher.algorithm}$")
+    return filtro
+
+
+def hashear_pendientes(modelo, tamano_lote=500, procesos=None, desde=None, progreso=None):
+    """
+    Hashea las contraseñas en texto plano de un modelo con campo ``contrasena``.
+
+    Args:
+        modelo: Modelo Usuario (el real o el histórico de una migración)
+        tamano_lote (int): Filas leídas y escritas por lote
+        procesos (int): Procesos para hashear (por defecto, los núcleos; 0 = sin pool)
+        desde: Clave primaria desde la que continuar (excluida)
+        progreso (callable): Se llama tras cada lote con (revisadas, hasheadas,
+            segundos, ultima_pk)
+
+    Returns:
+        tuple: (revisadas, hasheadas)
+    """
+    if procesos is None:
+        procesos = os.cpu_count() or 1
+    pendientes = modelo.objects.filter(_sin_hash()).order_by('pk').only('pk', 'contrasena')
+    if desde is not None:
+        pendientes = pendientes.filter(pk__gt=desde)
+
+    revisadas = hasheadas = 0
+    inicio = time.perf_counter()
+    pool = None
+    lote = []
+
+    def escribir(lote):
+        nonlocal pool, hasheadas
+        filas = [fila for fila in lote if not _ya_hasheada(fila.contrasena)]
+        planas = [fila.contrasena for fila in filas]
+        if procesos and len(filas) > 1:
+            if pool is None:
+                pool = ProcessPoolExecutor(
+                    max_workers=procesos,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_iniciar_worker,
+                )
+            nuevas = pool.map(hashers.make_password, planas, chunksize=max(len(planas) // (procesos * 4), 1))
+        else:
+            nuevas = map(hashers.make_password, planas)
+        for fila, nueva in zip(filas, nuevas):
+            fila.contrasena = nueva
+        modelo.objects.bulk_update(filas, ['contrasena'], batch_size=tamano_lote)
+        hasheadas += len(filas)
+        if progreso:
+            progreso(revisadas, hasheadas, time.perf_counter() - inicio, lote[-1].pk)
+
+    try:
+        for fila in pendientes.iterator(chunk_size=tamano_lote):
+            lote.append(fila)
+            revisadas += 1
+            if len(lote) >= tamano_lote:
+                escribir(lote)
+                lote = []
+        if lote:
+            escribir(lote)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return revisadas, hasheadas
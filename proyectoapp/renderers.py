@@ -0,0 +1,35 @@
+"""
+Renderer JSON de la API con orjson (codificador en C).
+
+Produce los mismos bytes que el JSONRenderer de DRF con su configuración por
+defecto (compacto, UTF-8 sin escapar, U+2028/U+2029 escapados). Si orjson no
+está instalado, si se pide sangría (?indent o la API navegable) o si los datos
+tienen algo que orjson no codifica, se usa el renderer de DRF.
+"""
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+
+# Fechas y horas pasan por el codificador de DRF (milisegundos, 'Z' en UTC)
+_OPCIONES = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+_codificador = encoders.JSONEncoder()
+
+
+class JSONRapidoRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_codificador.default, option=_OPCIONES)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
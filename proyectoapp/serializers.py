@@ -1,10 +1,153 @@
+from functools import lru_cache
+
+from django.conf import settings
+from proyectoapp import hashing
+from proyectoapp.constants import normalizar_comuna
 from proyectoapp.models import Usuario, UsuarioNormal, Organizacion, Publicacion
 from rest_framework import serializers
 
-class UsuarioSerializer(serializers.ModelSerializer):
+# Máximo de elementos por petición en los endpoints de lote
+LOTE_MAX = int(getattr(settings, 'API_LOTE_MAX', 1000))
+
+
+def campos_solicitados(request):
+    """Campos pedidos con ?fields=a,b (sparse fieldsets), o None para todos."""
+    campos = [c.strip() for c in request.query_params.get('fields', '').split(',') if c.strip()]
+    return campos or None
+
+
+class CamposDinamicosMixin:
+    """Permite pasar ``campos=[...]`` al serializer para devolver solo esos campos."""
+
+    def __init__(self, *args, campos=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if campos is not None:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
+
+
+class LecturaRapida:
+    """
+    Versión de solo lectura de un ModelSerializer que trabaja sobre ``.values()``.
+
+    Los campos se analizan una sola vez (ver ``lectura_rapida``); cada fila se
+    arma con un dict a partir de los valores de la consulta, sin instancias del
+    modelo ni la maquinaria de campos de DRF por objeto. El resultado es igual
+    al de ``serializer_class(queryset, many=True).data``.
+    """
+
+    # El valor de la base de datos ya es lo que devuelven estos campos
+    _DIRECTOS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+    def __init__(self, serializer_class, campos=None):
+        self.columnas, self._campos = [], []
+        for nombre, campo in serializer_class().fields.items():
+            if campo.write_only or (campos is not None and nombre not in campos):
+                continue
+            if campo.source == '*' or '.' in campo.source:
+                raise ValueError(f"LecturaRapida no admite el campo anidado o calculado '{nombre}'")
+            directo = isinstance(campo, self._DIRECTOS) or (
+                isinstance(campo, serializers.PrimaryKeyRelatedField) and campo.pk_field is None
+            )
+            self.columnas.append(campo.source)
+            self._campos.append((nombre, campo.source, None if directo else campo.to_representation))
+
+    def consulta(self, queryset, extra=()):
+        """
+        Args:
+            extra: Columnas que se leen pero no van en las filas (p. ej. el
+                campo de orden que necesita la paginación por cursor)
+        """
+        return queryset.values(*self.columnas, *[c for c in extra if c not in self.columnas])
+
+    def filas(self, valores):
+        """
+        Args:
+            valores: Diccionarios de ``consulta()`` (un queryset o una página)
+
+        Returns:
+            list: Filas listas para el renderer
+        """
+        campos = self._campos
+        filas = []
+        for valor in valores:
+            fila = {}
+            for nombre, columna, convertir in campos:
+                dato = valor[columna]
+                fila[nombre] = dato if convertir is None or dato is None else convertir(dato)
+            filas.append(fila)
+        return filas
+
+
+@lru_cache(maxsize=64)
+def lectura_rapida(serializer_class, campos=None):
+    """LecturaRapida de un serializer para una tupla de campos (o todos), compilada una vez."""
+    return LecturaRapida(serializer_class, campos)
+
+
+class LoteListSerializer(serializers.ListSerializer):
+    """
+    Alta y edición de muchos objetos con bulk_create / bulk_update.
+
+    Para editar, ``instance`` es un dict {str(pk): objeto} y cada elemento de los
+    datos trae su clave primaria. Las señales post_save no se disparan; quien
+    llama debe hacer lo que harían (invalidar cachés, etc.).
+    """
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            pk = self.child.Meta.model._meta.pk.name
+            self.child.instance = self.instance.get(str(data.get(pk))) if isinstance(data, dict) else None
+            if self.child.instance is None:
+                raise serializers.ValidationError({pk: "No existe o no se indicó."})
+            self.child.initial_data = data
+        return super().run_child_validation(data)
+
+    def preparar(self, validated_data):
+        """Permite ajustar los datos validados antes de escribirlos."""
+        return validated_data
+
+    def create(self, validated_data):
+        modelo = self.child.Meta.model
+        objetos = [modelo(**datos) for datos in self.preparar(validated_data)]
+        return modelo.objects.bulk_create(objetos, batch_size=500)
+
+    def update(self, instance, validated_data):
+        modelo = self.child.Meta.model
+        pk = modelo._meta.pk.name
+        objetos, campos = [], set()
+        for item, datos in zip(self.initial_data, self.preparar(validated_data)):
+            objeto = instance[str(item[pk])]
+            for nombre, valor in datos.items():
+                setattr(objeto, nombre, valor)
+            campos.update(datos)
+            objetos.append(objeto)
+        if campos:
+            modelo.objects.bulk_update(objetos, sorted(campos), batch_size=500)
+        return objetos
+
+
+class UsuarioListSerializer(LoteListSerializer):
+
+    def preparar(self, validated_data):
+        # bulk_create/bulk_update no pasan por Usuario.save: se hashea aquí, en paralelo
+        con_clave = [datos for datos in validated_data if 'contrasena' in datos]
+        for datos, codificada in zip(con_clave, hashing.hacer_hashes([d['contrasena'] for d in con_clave])):
+            datos['contrasena'] = codificada
+        return validated_data
+
+
+class UsuarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Usuario
         fields = '__all__'
+        extra_kwargs = {'contrasena': {'write_only': True}}
+        list_serializer_class = UsuarioListSerializer
+
+    def update(self, instance, validated_data):
+        if 'contrasena' in validated_data:
+            instance.set_password(validated_data.pop('contrasena'))
+        return super().update(instance, validated_data)
 
 class UsuarioNormalSerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,10 +159,16 @@ class OrganizacionSerializer(serializers.ModelSerializer):
         model = Organizacion
         fields = '__all__'
 
-class PublicacionSerializer(serializers.ModelSerializer):
+class PublicacionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Publicacion
-        fields = '__all__'
+        # busqueda es el tsvector interno de la búsqueda de texto completo
+        exclude = ['busqueda']
+        list_serializer_class = LoteListSerializer
+
+    def validate_comuna(self, comuna):
+        # bulk_create no pasa por Publicacion.save, que también la normaliza
+        return normalizar_comuna(comuna)
 
 class AudioReadingSerializer(serializers.Serializer):
     id_publicacion = serializers.IntegerField()
@@ -27,4 +176,4 @@ class AudioReadingSerializer(serializers.Serializer):
     texto = serializers.CharField()
     id_usuario = serializers.IntegerField(allow_null=True)
     fecha_hora = serializers.CharField()
-    timestamp = serializers.FloatField()
\ No newline at end of file
+    timestamp = serializers.FloatField()
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cuentas
+from .models import Beneficiario, Municipalidad, Organizacion, Publicacion, Usuario, UsuarioNormal, VersionTabla
+
+
+@receiver(post_save, sender=Publicacion)
+@receiver(post_delete, sender=Publicacion)
+def publicacion_modificada(sender, **kwargs):
+    # Cualquier alta, edición o baja invalida los listados cacheados
+    VersionTabla.incrementar(Publicacion._meta.db_table)
+
+
+@receiver(post_save, sender=Beneficiario)
+@receiver(post_delete, sender=Beneficiario)
+def beneficiario_modificado(sender, **kwargs):
+    # Invalida los conteos por comuna (facetas.py)
+    VersionTabla.incrementar(Beneficiario._meta.db_table)
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+@receiver(post_save, sender=UsuarioNormal)
+@receiver(post_delete, sender=UsuarioNormal)
+@receiver(post_save, sender=Organizacion)
+@receiver(post_delete, sender=Organizacion)
+@receiver(post_save, sender=Municipalidad)
+@receiver(post_delete, sender=Municipalidad)
+def perfil_modificado(sender, instance, **kwargs):
+    # El perfil cacheado del usuario de la sesión queda obsoleto
+    cuentas.invalidar(instance.pk if sender is Usuario else instance.id_usuario_id)
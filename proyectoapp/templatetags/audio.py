@@ -0,0 +1,11 @@
+from django import template
+
+from proyectoapp import tts
+
+register = template.Library()
+
+
+@register.filter
+def version_audio(publicacion):
+    """Valor de ?v= para la URL de audio de una publicación (ver tts.version_audio)."""
+    return tts.version_audio(tts.texto_publicacion(publicacion))
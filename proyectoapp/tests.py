@@ -1,3 +1,1098 @@
-from django.test import TestCase
+import asyncio
+import ipaddress
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.contrib.auth.hashers import get_hasher
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import audio_cache, audio_index, audio_logger, audio_perfiles, busqueda, cuentas, facetas, hashing, limitador, pregeneracion, rehash, tts, tts_async, tts_backends, views
+from .constants import normalizar_comuna
+from .forms import PublicacionForm
+from .middleware import CLAVE_RENOVADA, SesionDeslizanteMiddleware
+from .models import Beneficiario, Campana, Municipalidad, Organizacion, Publicacion, Usuario, VersionTabla
+from .paginacion import ORDEN_PUBLICACIONES, PaginaBusqueda
+
+
+@skipUnless(connection.vendor == 'postgresql', "Los planes de consulta se verifican en PostgreSQL")
+class IndicesPlanConsultaTests(TestCase):
+    """Las consultas frecuentes deben resolverse con los índices de la migración 0008."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(email='Muni@Ejemplo.cl', contrasena='Clave123!', tipo_usuario='municipalidad')
+        Municipalidad.objects.create(id_usuario=cls.usuario, nombre_municipalidad='Municipalidad de Ejemplo')
+        org = Usuario.objects.create(email='org@ejemplo.cl', contrasena='Clave123!', tipo_usuario='organizacion')
+        Organizacion.objects.create(id_usuario=org, razon_social='Olla Común', rut='76.123.456-7')
+        for i in range(20):
+            Publicacion.objects.create(
+                id_usuario=cls.usuario, titulo=f'Publicación {i}', descripcion='Texto',
+                tipo_publicacion='olla' if i % 2 else 'comedor', fecha_publicacion=date(2025, 1, 1 + i),
+            )
+            Campana.objects.create(id_usuario=cls.usuario, titulo=f'Campaña {i}', fecha_inicio=date(2025, 2, 1 + i))
+            Beneficiario.objects.create(id_usuario_registrador=org, nombre=f'Beneficiario {i}')
+
+    def plan(self, queryset):
+        # Con tablas pequeñas el planificador prefiere un seq scan; se desactiva
+        # para comprobar que existe un índice aplicable a la consulta.
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assertUsaIndice(self, queryset, indice):
+        plan = self.plan(queryset)
+        self.assertIn(indice, plan)
+        self.assertNotIn('Sort', plan.split(indice)[0])
+
+    def test_listado_publicaciones(self):
+        self.assertUsaIndice(Publicacion.objects.order_by(*ORDEN_PUBLICACIONES)[:12], 'publicacion_fecha_id_idx')
+
+    def test_publicaciones_por_usuario(self):
+        qs = Publicacion.objects.filter(id_usuario=self.usuario).order_by('-fecha_publicacion')[:10]
+        self.assertUsaIndice(qs, 'publicacion_usuario_fecha_idx')
+
+    def test_publicaciones_por_tipo(self):
+        qs = Publicacion.objects.filter(tipo_publicacion='olla').order_by('-fecha_publicacion')[:10]
+        self.assertUsaIndice(qs, 'publicacion_tipo_fecha_idx')
+
+    def test_campanas_por_usuario(self):
+        qs = Campana.objects.filter(id_usuario=self.usuario).order_by('-fecha_inicio')[:10]
+        self.assertUsaIndice(qs, 'campana_usuario_inicio_idx')
+
+    def test_beneficiarios_por_nombre(self):
+        self.assertUsaIndice(Beneficiario.objects.order_by('nombre')[:10], 'beneficiario_nombre_idx')
+
+    def test_busqueda_texto_completo(self):
+        plan = self.plan(busqueda.filtrar(Publicacion.objects.all(), 'publicación'))
+        self.assertIn('publicacion_busqueda_idx', plan)
+
+    def test_publicaciones_por_comuna(self):
+        qs = Publicacion.objects.filter(comuna='Maipú').order_by(*ORDEN_PUBLICACIONES)[:12]
+        self.assertUsaIndice(qs, 'publicacion_comuna_fecha_idx')
+
+    def test_busquedas_sin_mayusculas(self):
+        casos = [
+            (Usuario.objects.filter(email__lower='muni@ejemplo.cl'), 'usuario_email_lower_idx'),
+            (Organizacion.objects.filter(rut__lower='76.123.456-7'), 'organizacion_rut_lower_idx'),
+            (Organizacion.objects.filter(razon_social__lower='olla común'), 'organizacion_razon_lower_idx'),
+            (Municipalidad.objects.filter(nombre_municipalidad__lower='municipalidad de ejemplo'), 'municipalidad_nombre_lower_idx'),
+        ]
+        for queryset, indice in casos:
+            with self.subTest(indice=indice):
+                self.assertIn(indice, self.plan(queryset))
+
+
+class _StubTTS(BaseHTTPRequestHandler):
+    """Servidor TTS falso: responde un MP3 ficticio tras una pequeña demora."""
+    peticiones = 0
+    status = 200
+    goteo = 0   # segundos entre trozos del cuerpo, para simular un proveedor lento
+
+    def do_GET(self):
+        type(self).peticiones += 1
+        time.sleep(0.2)
+        self.send_response(type(self).status)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.end_headers()
+        if not type(self).goteo:
+            self.wfile.write(b'ID3-audio-falso')
+            return
+        for trozo in (b'ID3', b'-audio', b'-falso') * 4:
+            time.sleep(type(self).goteo)
+            self.wfile.write(trozo)
+            self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(VOICERSS_API_KEY='clave-de-prueba')
+class SintesisAsincronaTests(SimpleTestCase):
+    """Cliente asíncrono de VoiceRSS contra un servidor TTS local."""
+
+    def setUp(self):
+        _StubTTS.peticiones, _StubTTS.status, _StubTTS.goteo = 0, 200, 0
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), _StubTTS)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        for parche in (
+            mock.patch.object(tts, 'VOICERSS_URL', f'http://127.0.0.1:{self.servidor.server_port}/'),
+            mock.patch.object(tts, 'circuito', tts.CircuitoTTS(fallos_max=2, espera=60)),
+            mock.patch.object(tts, '_backends', [tts_backends.VoiceRSS()]),
+            mock.patch.object(audio_cache, 'CACHE_DIR', Path(directorio.name)),
+        ):
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def ejecutar(self, *corrutinas):
+        async def todas():
+            try:
+                return await asyncio.gather(*corrutinas, return_exceptions=True)
+            finally:
+                await tts_async.cerrar()
+        return asyncio.run(todas())
+
+    def test_textos_iguales_en_curso_comparten_una_llamada(self):
+        resultados = self.ejecutar(*(tts_async.asintetizar('Hola') for _ in range(5)))
+        self.assertEqual(resultados, [b'ID3-audio-falso'] * 5)
+        self.assertEqual(_StubTTS.peticiones, 1)
+
+    def test_la_segunda_lectura_sale_de_la_cache(self):
+        self.ejecutar(tts_async.asintetizar('Hola'))
+        self.ejecutar(tts_async.asintetizar('Hola'))
+        self.assertEqual(_StubTTS.peticiones, 1)
+
+    def test_el_circuito_se_abre_tras_fallos_seguidos(self):
+        _StubTTS.status = 503
+        resultados = self.ejecutar(*(tts_async.asintetizar(f'Texto {i}') for i in range(2)))
+        self.assertTrue(all(isinstance(r, tts.ErrorSintesis) for r in resultados))
+
+        resultado, = self.ejecutar(tts_async.asintetizar('Otro texto'))
+        self.assertEqual(resultado.status, 503)
+        self.assertEqual(_StubTTS.peticiones, 2)
+
+    def test_el_plazo_cubre_toda_la_respuesta(self):
+        # Cada trozo llega antes del timeout de lectura, pero el total lo excede
+        _StubTTS.goteo = 0.1
+        backend = tts_backends.VoiceRSS()
+        inicio = time.monotonic()
+        with self.assertRaises(tts.ErrorSintesis) as contexto:
+            backend.sintetizar('Hola', 0.5)
+        self.assertEqual(contexto.exception.status, 503)
+        self.assertLess(time.monotonic() - inicio, 1)
+
+        resultado, = self.ejecutar(backend.asintetizar('Hola', 0.5))
+        self.assertIsInstance(resultado, tts.ErrorSintesis)
+        self.assertEqual(resultado.status, 503)
+
+
+class _MotorFalso(tts_backends.BackendTTS):
+    def __init__(self, nombre, audio=None, demora=0):
+        self.nombre = self.voz = nombre
+        self.audio, self.demora = audio, demora
+        self.llamadas = 0
+
+    def sintetizar(self, texto, timeout):
+        self.llamadas += 1
+        if self.demora > timeout:
+            raise tts.ErrorSintesis(f"{self.nombre} excedió {timeout} s", status=503)
+        if self.audio is None:
+            raise tts.ErrorSintesis(f"{self.nombre} no disponible")
+        return self.audio
+
+
+class MotoresRespaldoTests(SimpleTestCase):
+    """Cadena de motores de voz con respaldo local."""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        parche = mock.patch.object(audio_cache, 'CACHE_DIR', Path(directorio.name))
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def usar(self, *motores):
+        parche = mock.patch.object(tts, '_backends', list(motores))
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_motor_lento_pasa_al_respaldo(self):
+        remoto = _MotorFalso('remoto', b'remoto', demora=tts.PRESUPUESTO + 1)
+        local = _MotorFalso('local', b'local')
+        self.usar(remoto, local)
+        self.assertEqual(tts.sintetizar('Hola'), b'local')
+        # El audio de respaldo queda en caché bajo su propia variante
+        self.assertTrue(audio_cache.existe_audio('Hola', 'local', 'MP3'))
+        self.assertFalse(tts.en_cache('Hola'))
+
+    def test_editar_no_borra_fragmentos_compartidos(self):
+        self.usar(_MotorFalso('remoto', b'remoto'))
+        compartido = 'Entrega de cajas de alimentos.'
+        anterior = f'{compartido} Hoy'
+        with mock.patch.object(tts, 'FRAGMENTO_MAX', len(compartido)):
+            for texto in [anterior] + tts.dividir_texto(anterior):
+                audio_cache.guardar_audio(texto, 'remoto', 'MP3', b'remoto')
+            # Otra publicación sigue leyendo el mismo fragmento
+            tts.invalidar_si_cambio(anterior, Publicacion(titulo='Retiro de cajas'))
+        self.assertFalse(audio_cache.existe_audio(anterior, 'remoto', 'MP3'))
+        self.assertTrue(audio_cache.existe_audio(compartido, 'remoto', 'MP3'))
+
+    def test_se_prefiere_el_principal_apenas_responde(self):
+        remoto = _MotorFalso('remoto', b'remoto')
+        local = _MotorFalso('local', b'local')
+        self.usar(remoto, local)
+        audio_cache.guardar_audio('Hola', 'local', 'MP3', b'local')
+        self.assertEqual(tts.sintetizar('Hola'), b'remoto')
+        self.assertEqual(local.llamadas, 0)
+        self.assertTrue(tts.en_cache('Hola'))
+
+    def test_si_todos_fallan_se_informa_el_error_del_principal(self):
+        self.usar(_MotorFalso('remoto'), _MotorFalso('local'))
+        with self.assertRaisesMessage(tts.ErrorSintesis, 'remoto no disponible'):
+            tts.sintetizar('Hola')
+
+    def test_motor_sin_sintetizar_no_se_puede_instanciar(self):
+        with self.assertRaises(TypeError):
+            type('Incompleto', (tts_backends.BackendTTS,), {})()
+
+    def test_espeak_reparte_un_solo_plazo_entre_sus_pasos(self):
+        plazos = []
+
+        def ejecutar(comando, input, capture_output, timeout, check):
+            plazos.append(timeout)
+            time.sleep(0.3)
+            return mock.Mock(stdout=b'audio')
+
+        motor = tts_backends.EspeakNG()
+        with mock.patch('shutil.which', return_value='/usr/bin/x'), mock.patch('subprocess.run', side_effect=ejecutar):
+            self.assertEqual(motor.sintetizar('Hola', 1), b'audio')
+            self.assertLessEqual(plazos[1], 1 - 0.3)
+            with self.assertRaisesMessage(tts.ErrorSintesis, 'Sin tiempo'):
+                motor.sintetizar('Hola', 0.25)
+
+
+class LimitadorTests(SimpleTestCase):
+    """Cubetas de fichas compartidas en SQLite."""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        for nombre, valor in (
+            ('LIMITE_DB', Path(directorio.name) / 'limite.sqlite3'),
+            ('CLIENTE_RAFAGA', 2), ('CLIENTE_POR_MINUTO', 60),
+            ('GLOBAL_RAFAGA', 3), ('GLOBAL_POR_MINUTO', 6),
+            ('PROXIES_CONFIABLES', []),
+        ):
+            parche = mock.patch.object(limitador, nombre, valor)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def test_rafaga_por_cliente_y_global(self):
+        self.assertIsNone(limitador.pedir_turno('cliente:a'))
+        self.assertIsNone(limitador.pedir_turno('cliente:a'))
+        # Sin fichas propias: una por segundo
+        self.assertEqual(limitador.pedir_turno('cliente:a'), 1)
+        self.assertIsNone(limitador.pedir_turno('cliente:b'))
+        # Sin fichas globales: una cada 10 segundos
+        self.assertEqual(limitador.pedir_turno('cliente:c'), 10)
+        self.assertEqual(limitador.estadisticas(), {'admitidas': 3, 'rechazadas': 2})
+
+    def test_sin_fichas_se_rechaza_sin_esperar(self):
+        limitador.CLIENTE_POR_MINUTO = 1200
+        for _ in range(2):
+            self.assertIsNone(limitador.pedir_turno('cliente:a'))
+        inicio = time.monotonic()
+        self.assertEqual(asyncio.run(limitador.apedir_turno('cliente:a')), 1)
+        self.assertLess(time.monotonic() - inicio, 0.5)
+
+    def test_ip_del_cliente_solo_desde_proxies_de_confianza(self):
+        def ip(remoto, reenviada=None):
+            request = RequestFactory().get('/', REMOTE_ADDR=remoto)
+            if reenviada is not None:
+                request.META['HTTP_X_FORWARDED_FOR'] = reenviada
+            return limitador.ip_cliente(request)
+
+        # Sin proxies configurados la cabecera se ignora
+        self.assertEqual(ip('203.0.113.5', '198.51.100.1'), '203.0.113.5')
+        limitador.PROXIES_CONFIABLES = [ipaddress.ip_network('10.0.0.0/8')]
+        # El cliente puede inventar saltos a la izquierda: vale el primero no confiable desde la derecha
+        self.assertEqual(ip('10.0.0.2', '1.2.3.4, 198.51.100.1, 10.0.0.1'), '198.51.100.1')
+        self.assertEqual(ip('203.0.113.5', '198.51.100.1'), '203.0.113.5')
+        self.assertEqual(ip('10.0.0.2'), '10.0.0.2')
+
+
+class ClaveClienteTests(TestCase):
+
+    def peticion(self, cookie=None, remoto='203.0.113.5'):
+        request = RequestFactory().get('/', REMOTE_ADDR=remoto)
+        if cookie:
+            request.COOKIES['sessionid'] = cookie
+        SessionMiddleware(lambda r: HttpResponse()).process_request(request)
+        return request
+
+    def test_cookies_inventadas_comparten_la_cubeta_de_la_ip(self):
+        claves = {limitador.clave_cliente(self.peticion(f'inventada{i:030d}')) for i in range(3)}
+        claves.add(limitador.clave_cliente(self.peticion()))
+        self.assertEqual(len(claves), 1)
+        self.assertNotEqual(claves, {limitador.clave_cliente(self.peticion(remoto='198.51.100.1'))})
+
+    def test_usuario_con_sesion_tiene_su_propia_cubeta(self):
+        request = self.peticion()
+        request.session['id_usuario'] = 7
+        request.session.save()
+        cargada = self.peticion(request.session.session_key)
+        self.assertEqual(limitador.clave_cliente(cargada), limitador.clave_cliente(request))
+        self.assertNotEqual(limitador.clave_cliente(cargada), limitador.clave_cliente(self.peticion()))
+        self.assertEqual(asyncio.run(limitador.aclave_cliente(cargada)), limitador.clave_cliente(cargada))
+
+
+class PregeneracionTests(SimpleTestCase):
+    """Cola de pre-generación de audio en segundo plano."""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.principal = _MotorFalso('remoto', b'remoto')
+        self.respaldo = _MotorFalso('local', b'local')
+        for parche in (
+            mock.patch.object(pregeneracion, 'ESPERA_BASE', 0.01),
+            mock.patch.object(audio_cache, 'CACHE_DIR', Path(directorio.name)),
+            mock.patch.object(tts, '_backends', [self.principal, self.respaldo]),
+            mock.patch.object(audio_perfiles, 'transcodificar', return_value=None),
+        ):
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def test_reintenta_tras_un_fallo(self):
+        antes = pregeneracion.estadisticas()
+        with mock.patch.object(self.principal, 'sintetizar',
+                               side_effect=[tts.ErrorSintesis('caído', 503), b'mp3']) as sintetizar:
+            self.assertTrue(pregeneracion.encolar_texto('Texto con reintento'))
+            self.assertTrue(pregeneracion.esperar(timeout=5))
+        self.assertEqual(sintetizar.call_count, 2)
+        despues = pregeneracion.estadisticas()
+        self.assertEqual(despues['generados'] - antes['generados'], 1)
+        self.assertEqual(despues['reintentos'] - antes['reintentos'], 1)
+        self.assertTrue(tts.en_cache('Texto con reintento'))
+
+    def test_no_usa_el_respaldo_si_falla_el_principal(self):
+        self.principal.audio = None
+        texto = 'Texto con el principal caído'
+        # La lectura en vivo sí cae al respaldo
+        self.assertEqual(tts.sintetizar(texto), b'local')
+        antes = pregeneracion.estadisticas()
+        self.assertTrue(pregeneracion.encolar_texto(texto))
+        self.assertTrue(pregeneracion.esperar(timeout=5))
+        despues = pregeneracion.estadisticas()
+        self.assertEqual(despues['generados'] - antes['generados'], 0)
+        self.assertEqual(despues['reintentos'] - antes['reintentos'], pregeneracion.REINTENTOS)
+        self.assertEqual(despues['fallidos'] - antes['fallidos'], 1)
+        self.assertEqual(self.principal.llamadas, 1 + pregeneracion.REINTENTOS + 1)
+        self.assertEqual(self.respaldo.llamadas, 1)
+        self.assertFalse(tts.en_cache(texto))
+
+    def test_no_encola_sin_motor_principal(self):
+        with mock.patch.object(self.principal, 'disponible', return_value=False), \
+                mock.patch.object(transaction, 'on_commit') as on_commit:
+            pregeneracion.encolar(Publicacion(titulo='Feria libre'))
+        on_commit.assert_not_called()
+
+    def test_no_duplica_textos_en_cola(self):
+        liberar = threading.Event()
+        with mock.patch.object(self.principal, 'sintetizar',
+                               side_effect=lambda texto, timeout: liberar.wait(5) and b'mp3') as sintetizar:
+            self.assertTrue(pregeneracion.encolar_texto('Texto repetido'))
+            self.assertFalse(pregeneracion.encolar_texto('Texto repetido'))
+            liberar.set()
+            self.assertTrue(pregeneracion.esperar(timeout=5))
+        self.assertEqual(sintetizar.call_count, 1)
+
+
+class PregenerarAudioComandoTests(TestCase):
+    """Comando pregenerar_audio sobre las publicaciones existentes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            Publicacion.objects.create(titulo=f'Operativo {i}', descripcion='Vacunación', comuna='Maipú')
+
+    def test_lee_las_publicaciones_en_una_consulta(self):
+        salida = StringIO()
+        with mock.patch.object(tts, '_backends', [_MotorFalso('remoto', b'remoto')]), \
+                mock.patch.object(tts, 'en_cache', return_value=True) as en_cache, \
+                self.assertNumQueries(1):
+            call_command('pregenerar_audio', stdout=salida)
+        self.assertIn('3 ya en caché, 0 encoladas', salida.getvalue())
+        self.assertIn('Comuna: Maipú', en_cache.call_args.args[0])
+
+
+class LecturaAudioHttpTests(TestCase):
+    """Cabeceras de caché, 304 y rangos en /leer-publicacion/."""
+
+    AUDIO = bytes(range(100))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.publicacion = Publicacion.objects.create(titulo='Olla común', descripcion='Almuerzo a las 13:00')
+
+    def setUp(self):
+        self.url = f'/leer-publicacion/{self.publicacion.id_publicacion}/'
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        for parche in (
+            mock.patch.object(tts, 'sintetizar', return_value=self.AUDIO),
+            mock.patch.object(tts, 'fragmentos_en_cache', return_value=True),
+            mock.patch.object(audio_perfiles, 'transcodificar', return_value=None),
+            mock.patch.object(audio_cache, 'CACHE_DIR', Path(directorio.name)),
+            mock.patch.object(limitador, 'LIMITE_DB', Path(directorio.name) / 'limite.sqlite3'),
+            mock.patch('proyectoapp.views.registrar_lectura'),
+        ):
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def test_audio_completo_con_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.AUDIO)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['ETag'].startswith('"'))
+
+    def test_inmutable_solo_con_la_version_del_texto(self):
+        version = tts.version_audio(tts.texto_publicacion(self.publicacion))
+        self.assertIn('immutable', self.client.get(f'{self.url}?v={version}')['Cache-Control'])
+        self.assertEqual(self.client.get(self.url + '?v=3')['Cache-Control'], 'public, no-cache')
+
+        # Los listados enlazan el audio con la versión del texto de cada publicación
+        self.assertContains(self.client.get('/publicaciones/list/'), f"'{version}'")
+
+    def test_304_sin_sintetizar(self):
+        etag = self.client.get(self.url)['ETag']
+        tts.sintetizar.reset_mock()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        tts.sintetizar.assert_not_called()
+
+    def test_rangos(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.AUDIO[10:20])
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=-5').content, self.AUDIO[-5:])
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=200-').status_code, 416)
+        # If-Range con otra versión: se envía el audio completo
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"otro"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_perfil_negociado_por_accept(self):
+        audio_perfiles.transcodificar.side_effect = lambda audio, perfil: f'{perfil}:'.encode() + audio[:4]
+        response = self.client.get(self.url, HTTP_ACCEPT='audio/ogg, audio/mpeg;q=0.9')
+        self.assertEqual(response['Content-Type'], 'audio/ogg')
+        self.assertEqual(response.content, b'voz-opus:' + self.AUDIO[:4])
+        self.assertIn('Accept', response['Vary'])
+
+        response = self.client.get(self.url, HTTP_ACCEPT='*/*')
+        self.assertEqual(response.content, b'voz-mp3:' + self.AUDIO[:4])
+
+        # La variante queda en caché: no se vuelve a transcodificar ni a sintetizar
+        tts.sintetizar.reset_mock()
+        audio_perfiles.transcodificar.reset_mock()
+        response = self.client.get(self.url, HTTP_ACCEPT='audio/ogg')
+        self.assertEqual(response.content, b'voz-opus:' + self.AUDIO[:4])
+        tts.sintetizar.assert_not_called()
+        audio_perfiles.transcodificar.assert_not_called()
+
+    def test_limitador_solo_para_lo_que_no_esta_en_cache(self):
+        with mock.patch.object(limitador, 'pedir_turno', return_value=7) as pedir_turno:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+            pedir_turno.assert_not_called()
+
+            tts.fragmentos_en_cache.return_value = False
+            tts.sintetizar.reset_mock()
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '7')
+        tts.sintetizar.assert_not_called()
+
+    def test_audio_de_respaldo_no_se_guarda_en_el_navegador(self):
+        tts.fragmentos_en_cache.return_value = False
+        response = self.client.get(self.url + '?v=3')
+        self.assertEqual(response.content, self.AUDIO)
+        self.assertEqual(response['Cache-Control'], 'no-store')
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_texto_largo_se_transmite_por_fragmentos(self):
+        publicacion = Publicacion.objects.create(
+            titulo='Comedor', descripcion='Primera oración. Segunda oración. Tercera oración.'
+        )
+        with mock.patch.object(tts, 'FRAGMENTO_MAX', 20), \
+                mock.patch.object(tts, 'sintetizar', side_effect=lambda texto: f'[{texto}]'.encode()), \
+                mock.patch.object(tts, 'fragmentos_en_cache', return_value=False):
+            response = self.client.get(f'/leer-publicacion/{publicacion.id_publicacion}/')
+            self.assertTrue(response.streaming)
+            self.assertEqual(
+                b''.join(response.streaming_content).decode(),
+                '[Comedor.][Primera oración.][Segunda oración.][Tercera oración.]',
+            )
+
+    def test_error_a_mitad_del_flujo_corta_la_transferencia(self):
+        publicacion = Publicacion.objects.create(
+            titulo='Comedor', descripcion='Primera oración. Segunda oración.'
+        )
+
+        def sintetizar(texto):
+            if texto.startswith('Segunda'):
+                raise tts.ErrorSintesis("Motor caído")
+            return f'[{texto}]'.encode()
+
+        with mock.patch.object(tts, 'FRAGMENTO_MAX', 20), \
+                mock.patch.object(tts, 'sintetizar', side_effect=sintetizar), \
+                mock.patch.object(tts, 'fragmentos_en_cache', return_value=False):
+            response = self.client.get(f'/leer-publicacion/{publicacion.id_publicacion}/')
+            contenido = iter(response.streaming_content)
+            self.assertEqual(next(contenido), '[Comedor.]'.encode())
+            with self.assertRaises(tts.ErrorSintesis):
+                list(contenido)
+
+
+class LimiteCacheAudioTests(SimpleTestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        for nombre, valor in (
+            ('CACHE_DIR', Path(directorio.name)), ('MAX_BYTES', 25),
+            ('REVISION', 3600), ('_ocupados', None),
+        ):
+            parche = mock.patch.object(audio_cache, nombre, valor)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def test_recorre_el_directorio_solo_al_superar_el_limite(self):
+        with mock.patch.object(audio_cache, '_entradas', wraps=audio_cache._entradas) as entradas:
+            audio_cache.guardar_audio('uno', 'es', 'MP3', b'x' * 10)
+            audio_cache.guardar_audio('dos', 'es', 'MP3', b'x' * 10)
+            audio_cache.guardar_audio('dos', 'es', 'MP3', b'y' * 10)
+            # Solo el recorrido inicial: la suma lleva la cuenta
+            self.assertEqual(entradas.call_count, 1)
+            os.utime(audio_cache._ruta('uno', 'es', 'MP3'), (0, 0))
+            audio_cache.guardar_audio('tres', 'es', 'MP3', b'x' * 10)
+            self.assertEqual(entradas.call_count, 2)
+        # Se expulsó el usado hace más tiempo
+        self.assertFalse(audio_cache.existe_audio('uno', 'es', 'MP3'))
+        self.assertTrue(audio_cache.existe_audio('tres', 'es', 'MP3'))
+        self.assertEqual(audio_cache._ocupados, 20)
+
+
+class IndiceLecturasTests(SimpleTestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.segmento = Path(directorio.name) / 'lecturas-000001.jsonl'
+        for objeto, nombre, valor in (
+            (audio_logger, 'SEGMENT_DIR', Path(directorio.name)),
+            (audio_logger, 'escribir_pendientes', mock.Mock()),
+            (audio_index, 'INDEX_DB', Path(directorio.name) / 'indice.sqlite3'),
+            (audio_index, '_local', threading.local()),
+        ):
+            parche = mock.patch.object(objeto, nombre, valor)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def escribir(self, *ids):
+        with open(self.segmento, 'a') as f:
+            for id_publicacion in ids:
+                f.write(json.dumps({
+                    'id_publicacion': id_publicacion, 'titulo': 't', 'texto': 't', 'id_usuario': None,
+                    'fecha_hora': '', 'timestamp': id_publicacion,
+                }) + '\n')
+
+    def test_sin_datos_nuevos_no_toma_el_bloqueo_de_escritura(self):
+        self.escribir(1, 2)
+        self.assertEqual(audio_index.sincronizar(), 2)
+
+        sentencias = []
+        audio_index._conexion().set_trace_callback(sentencias.append)
+        self.assertEqual(audio_index.ConsultaLecturas().count(), 2)
+        self.assertNotIn('BEGIN IMMEDIATE', sentencias)
+
+        self.escribir(3)
+        self.assertEqual(audio_index.ConsultaLecturas(id_publicacion=3).count(), 1)
+        self.assertIn('BEGIN IMMEDIATE', sentencias)
+
+    def test_ndjson_con_los_mismos_filtros_y_orden_que_las_paginas(self):
+        self.escribir(1, 2, 3, 4)
+        with mock.patch.object(views, 'AUDIO_MAX_PAGE_SIZE', 2):
+            respuesta = self.client.get('/audio/?formato=ndjson&desde=2&hasta=5')
+            lineas = [json.loads(linea) for linea in b''.join(respuesta.streaming_content).splitlines()]
+        self.assertEqual([l['id_publicacion'] for l in lineas], [4, 3, 2])
+        paginas = self.client.get('/audio/?desde=2&hasta=5').json()['results']
+        self.assertEqual([l['id_publicacion'] for l in paginas], [4, 3, 2])
+
+
+class ElegirPerfilTests(SimpleTestCase):
+
+    def test_opus_solo_si_se_pide_explicitamente(self):
+        self.assertEqual(audio_perfiles.elegir_perfil('audio/ogg; codecs=opus, audio/mpeg;q=0.9'), 'voz-opus')
+        self.assertEqual(audio_perfiles.elegir_perfil('*/*'), 'voz-mp3')
+        self.assertEqual(audio_perfiles.elegir_perfil(''), 'voz-mp3')
+        self.assertEqual(audio_perfiles.elegir_perfil('audio/*'), 'voz-mp3')
+
+    def test_sin_tipos_aceptables_se_sirve_el_original(self):
+        self.assertIsNone(audio_perfiles.elegir_perfil('audio/ogg;q=0, audio/mpeg;q=0'))
+        self.assertIsNone(audio_perfiles.elegir_perfil('text/html'))
+
+
+class DividirTextoTests(SimpleTestCase):
+
+    def test_agrupa_oraciones_hasta_el_maximo(self):
+        self.assertEqual(tts.dividir_texto('Uno. Dos. Tres cuatro cinco.', maximo=12), ['Uno. Dos.', 'Tres cuatro', 'cinco.'])
+
+    def test_oracion_larga_se_corta_en_comas(self):
+        fragmentos = tts.dividir_texto('arroz, porotos, lentejas, fideos y aceite', maximo=20)
+        self.assertEqual(fragmentos, ['arroz, porotos,', 'lentejas,', 'fideos y aceite'])
+        self.assertTrue(all(len(f) <= 20 for f in fragmentos))
+
+
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies',
+    SESSION_COOKIE_AGE=600, SESSION_RENOVAR_UMBRAL=300,
+)
+class SesionDeslizanteTests(SimpleTestCase):
+    """La sesión solo se vuelve a guardar cuando está por expirar."""
+
+    def peticion(self, **datos):
+        middleware = SessionMiddleware(SesionDeslizanteMiddleware(lambda request: HttpResponse()))
+        request = RequestFactory().get('/')
+        if datos:
+            sesion = middleware.SessionStore()
+            sesion.update(datos)
+            sesion.save()
+            request.COOKIES['sessionid'] = sesion.session_key
+        return middleware(request)
+
+    def test_anonimo_sin_escrituras(self):
+        self.assertNotIn('sessionid', self.peticion().cookies)
+
+    def test_sesion_reciente_no_se_guarda(self):
+        response = self.peticion(id_usuario=1, **{CLAVE_RENOVADA: time.time() - 60})
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_sesion_por_expirar_se_renueva(self):
+        response = self.peticion(id_usuario=1, **{CLAVE_RENOVADA: time.time() - 400})
+        self.assertIn('sessionid', response.cookies)
+
+
+class PerfilUsuarioTests(TestCase):
+    """Usuario y perfil en una consulta, y su caché para la sesión."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(email='muni@ejemplo.cl', contrasena='Clave123!', tipo_usuario='municipalidad')
+        Municipalidad.objects.create(id_usuario=cls.usuario, nombre_municipalidad='Municipalidad de Ejemplo')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_acceso_con_una_consulta_de_usuario(self):
+        with self.assertNumQueries(1):
+            usuario = cuentas.con_perfil().get(email='muni@ejemplo.cl')
+            self.assertEqual(cuentas.nombre_para_mostrar(usuario), 'Municipalidad de Ejemplo')
+
+        self.client.post('/acceso/', {'email': 'muni@ejemplo.cl', 'contrasena': 'Clave123!'})
+        self.assertEqual(self.client.session['display_name'], 'Municipalidad de Ejemplo')
+
+    @override_settings(CACHE_COMPARTIDA=True)
+    def test_perfil_de_la_sesion_se_reutiliza_hasta_que_cambia(self):
+        request = RequestFactory().get('/')
+        request.session = {'id_usuario': self.usuario.id_usuario}
+        with self.assertNumQueries(1):
+            cuentas.datos_sesion(request)
+            cuentas.datos_sesion(request)
+
+        self.usuario.municipalidad.nombre_municipalidad = 'Otra'
+        self.usuario.municipalidad.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(cuentas.datos_sesion(request)['nombre'], 'Otra')
+
+    @override_settings(CACHE_COMPARTIDA=True)
+    def test_la_cache_no_guarda_el_hash_de_la_contrasena(self):
+        cuentas.recordar(cuentas.con_perfil().get(pk=self.usuario.pk))
+        self.assertEqual(
+            cache.get(cuentas._clave(self.usuario.pk)),
+            {'id_usuario': self.usuario.pk, 'tipo_usuario': 'municipalidad',
+             'es_admin': False, 'nombre': 'Municipalidad de Ejemplo'},
+        )
+
+    def test_sin_cache_compartida_se_consulta_siempre(self):
+        request = RequestFactory().get('/')
+        request.session = {'id_usuario': self.usuario.id_usuario}
+        with self.assertNumQueries(2):
+            cuentas.datos_sesion(request)
+            cuentas.datos_sesion(request)
+        self.assertIsNone(cache.get(cuentas._clave(self.usuario.pk)))
+
+
+class RehashAlAccederTests(TestCase):
+
+    def test_hash_con_otro_algoritmo_se_actualiza(self):
+        usuario = Usuario.objects.create(email='persona@ejemplo.cl', contrasena='Clave123!', tipo_usuario='usuario')
+        antiguo = get_hasher('pbkdf2_sha1').encode('Clave123!', 'sal-antigua')
+        Usuario.objects.filter(pk=usuario.pk).update(contrasena=antiguo)
+
+        usuario.refresh_from_db()
+        self.assertFalse(usuario.check_password('otra'))
+        self.assertEqual(usuario.contrasena, antiguo)
+        self.assertTrue(usuario.check_password('Clave123!'))
+        usuario.refresh_from_db()
+        self.assertTrue(usuario.contrasena.startswith('pbkdf2_sha256$'))
+        self.assertTrue(asyncio.run(usuario.acheck_password('Clave123!')))
+
+
+class HashingAsincronoTests(SimpleTestCase):
+
+    def test_cupo_obtenido_tras_cancelar_se_devuelve(self):
+        cupos = threading.BoundedSemaphore(1)
+
+        async def escenario():
+            cupos.acquire()
+            tarea = asyncio.ensure_future(hashing._aejecutar(len, 'x'))
+            await asyncio.sleep(0.05)
+            tarea.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await tarea
+            # El hilo que esperaba obtiene el cupo ahora y lo devuelve enseguida
+            cupos.release()
+            await asyncio.sleep(0.2)
+
+        with mock.patch.object(hashing, 'WORKERS', 1), mock.patch.object(hashing, '_cupos', cupos):
+            asyncio.run(escenario())
+        self.assertTrue(cupos.acquire(blocking=False))
+
+    def test_sin_pool_se_hashea_fuera_del_loop(self):
+        hilos = []
+
+        def funcion():
+            hilos.append(threading.get_ident())
+            return 'ok'
+
+        async def escenario():
+            return threading.get_ident(), await hashing._aejecutar(funcion)
+
+        with mock.patch.object(hashing, 'WORKERS', 0):
+            hilo_loop, resultado = asyncio.run(escenario())
+        self.assertEqual(resultado, 'ok')
+        self.assertNotEqual(hilos, [hilo_loop])
+
+
+class HashearPendientesTests(TestCase):
+
+    def test_hashea_solo_las_planas_y_se_puede_reanudar(self):
+        usuarios = [
+            Usuario.objects.create(email=f'u{i}@ejemplo.cl', contrasena='x', tipo_usuario='usuario')
+            for i in range(5)
+        ]
+        hasheada = usuarios[0].contrasena
+        for i, usuario in enumerate(usuarios[1:], 1):
+            Usuario.objects.filter(pk=usuario.pk).update(contrasena=f'plana{i}')
+
+        avances = []
+        revisadas, hasheadas = rehash.hashear_pendientes(
+            Usuario, tamano_lote=2, procesos=0, desde=usuarios[1].pk,
+            progreso=lambda *avance: avances.append(avance),
+        )
+        self.assertEqual((revisadas, hasheadas), (3, 3))
+        self.assertEqual([a[3] for a in avances], [usuarios[3].pk, usuarios[4].pk])
+        self.assertEqual(Usuario.objects.get(pk=usuarios[1].pk).contrasena, 'plana1')
+
+        self.assertEqual(rehash.hashear_pendientes(Usuario, procesos=0), (1, 1))
+        self.assertEqual(rehash.hashear_pendientes(Usuario, procesos=0), (0, 0))
+        self.assertEqual(Usuario.objects.get(pk=usuarios[0].pk).contrasena, hasheada)
+        self.assertTrue(Usuario.objects.get(pk=usuarios[4].pk).check_password('plana4'))
+
+    def test_migracion_0003_hashea_por_lotes_sin_el_codigo_de_la_app(self):
+        migracion = import_module('proyectoapp.migrations.0003_hash_existing_passwords')
+        usuarios = [
+            Usuario.objects.create(email=f'm{i}@ejemplo.cl', contrasena='x', tipo_usuario='usuario')
+            for i in range(3)
+        ]
+        Usuario.objects.filter(pk__in=[u.pk for u in usuarios[1:]]).update(contrasena='plana')
+
+        with mock.patch.object(migracion, 'TAMANO_LOTE', 1):
+            migracion.hash_existing_passwords(apps, None)
+        self.assertEqual(Usuario.objects.get(pk=usuarios[0].pk).contrasena, usuarios[0].contrasena)
+        self.assertTrue(all(u.check_password('plana') for u in Usuario.objects.filter(pk__in=[u.pk for u in usuarios[1:]])))
+
+
+class ApiLoteTests(TestCase):
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(user=mock.Mock(is_authenticated=True))
+
+    def test_listado_paginado_con_campos(self):
+        for i in range(5):
+            Publicacion.objects.create(titulo=f'P{i}', descripcion='d')
+
+        respuesta = self.api.get('/publicaciones/?tamano=2&fields=id_publicacion,titulo')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([p['titulo'] for p in respuesta.data['results']], ['P4', 'P3'])
+        self.assertEqual(set(respuesta.data['results'][0]), {'id_publicacion', 'titulo'})
+
+        siguiente = self.api.get(respuesta.data['next'])
+        self.assertEqual([p['titulo'] for p in siguiente.data['results']], ['P2', 'P1'])
+
+    @mock.patch('proyectoapp.views.API_JSON_RAPIDO', True)
+    def test_listado_paginado_desde_values(self):
+        self.test_listado_paginado_con_campos()
+
+    @mock.patch('proyectoapp.views.API_JSON_RAPIDO', True)
+    def test_listado_desde_values_sin_la_clave_primaria(self):
+        for i in range(3):
+            Publicacion.objects.create(titulo=f'P{i}', descripcion='d')
+
+        respuesta = self.api.get('/publicaciones/?tamano=2&fields=titulo')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['results'], [{'titulo': 'P2'}, {'titulo': 'P1'}])
+        siguiente = self.api.get(respuesta.data['next'])
+        self.assertEqual(siguiente.data['results'], [{'titulo': 'P0'}])
+
+    def test_usuarios_no_exponen_la_contrasena(self):
+        Usuario.objects.create(email='a@ejemplo.cl', contrasena='Clave123!', tipo_usuario='usuario')
+        respuesta = self.api.get('/usuarios/')
+        self.assertNotIn('contrasena', respuesta.data['results'][0])
+
+    @mock.patch('proyectoapp.views.pregeneracion.encolar')
+    def test_alta_y_edicion_en_lote(self, encolar):
+        version = VersionTabla.obtener('publicacion')[0]
+        respuesta = self.api.post(
+            '/publicaciones/lote/', [{'titulo': f'L{i}', 'descripcion': 'd'} for i in range(3)], format='json'
+        )
+        self.assertEqual(respuesta.status_code, 201)
+        ids = [p['id_publicacion'] for p in respuesta.data]
+        self.assertEqual(Publicacion.objects.filter(pk__in=ids).count(), 3)
+        self.assertEqual(encolar.call_count, 3)
+
+        respuesta = self.api.patch(
+            '/publicaciones/lote/', [{'id_publicacion': pk, 'titulo': 'Editada'} for pk in ids], format='json'
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(Publicacion.objects.filter(titulo='Editada').count(), 3)
+        self.assertEqual(VersionTabla.obtener('publicacion')[0], version + 2)
+
+    def test_lote_invalido_no_escribe_nada(self):
+        respuesta = self.api.post(
+            '/usuarios/lote/',
+            [{'email': 'b@ejemplo.cl', 'contrasena': 'Clave123!'}, {'contrasena': 'sin-email'}],
+            format='json',
+        )
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(Usuario.objects.exists())
+
+        respuesta = self.api.post('/usuarios/lote/', [{'email': 'b@ejemplo.cl', 'contrasena': 'Clave123!'}], format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertTrue(Usuario.objects.get(email='b@ejemplo.cl').check_password('Clave123!'))
+
+
+class JsonRapidoTests(TestCase):
+
+    def test_mismos_bytes_que_el_serializer_de_drf(self):
+        from datetime import datetime, time as hora, timezone as tz
+        from .renderers import JSONRapidoRenderer
+        from .serializers import PublicacionSerializer, lectura_rapida
+
+        Publicacion.objects.create(
+            titulo='Ñandú \u2028 línea', descripcion='d', fecha_publicacion=date(2025, 3, 1), hora=hora(9, 30)
+        )
+        Publicacion.objects.create(titulo='Sin fecha', descripcion='d')
+        queryset = Publicacion.objects.order_by('pk')
+        esperado = JSONRenderer().render(PublicacionSerializer(queryset, many=True).data)
+
+        lectura = lectura_rapida(PublicacionSerializer)
+        filas = lectura.filas(lectura.consulta(queryset))
+        self.assertEqual(JSONRenderer().render(filas), esperado)
+        self.assertEqual(JSONRapidoRenderer().render(filas), esperado)
+
+        otros = {'cuando': datetime(2025, 3, 1, 9, 30, 0, 123456, tzinfo=tz.utc), 1: None}
+        self.assertEqual(JSONRapidoRenderer().render(otros), JSONRenderer().render(otros))
+
+    def test_campos_solicitados(self):
+        from .serializers import PublicacionSerializer, UsuarioSerializer, lectura_rapida
+
+        self.assertEqual(lectura_rapida(PublicacionSerializer, ('titulo',)).columnas, ['titulo'])
+        self.assertNotIn('contrasena', lectura_rapida(UsuarioSerializer).columnas)
+
+
+class ListadosCondicionalesTests(TestCase):
+
+    def test_inicio_responde_304_mientras_no_cambien_las_publicaciones(self):
+        Publicacion.objects.create(titulo='Primera', descripcion='d')
+        respuesta = self.client.get('/')
+        self.assertEqual(respuesta.status_code, 200)
+        etag = respuesta['ETag']
+        self.assertIn('Last-Modified', respuesta)
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Otros parámetros, otra página
+        self.assertEqual(self.client.get('/?cursor=x', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        Publicacion.objects.create(titulo='Segunda', descripcion='d')
+        self.assertEqual(self.client.get('/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_la_sesion_cambia_el_etag(self):
+        etag = self.client.get('/publicaciones/list/')['ETag']
+        sesion = self.client.session
+        sesion['id_usuario'] = 1
+        sesion['display_name'] = 'Ana'
+        sesion.save()
+        self.assertEqual(self.client.get('/publicaciones/list/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_sin_validadores_con_mensajes_pendientes(self):
+        from django.contrib.messages import constants
+        from django.contrib.messages.storage import default_storage
+
+        peticion = RequestFactory().get('/')
+        SessionMiddleware(lambda r: HttpResponse()).process_request(peticion)
+        peticion._messages = default_storage(peticion)
+        peticion._messages.add(constants.SUCCESS, 'Publicación creada')
+        self.assertIsNone(views._etag_publicaciones(peticion))
+        self.assertEqual(len(peticion._messages), 1)
+
+    def test_api_detalle(self):
+        publicacion = Publicacion.objects.create(titulo='Api', descripcion='d')
+        api = APIClient()
+        api.force_authenticate(user=mock.Mock(is_authenticated=True))
+        etag = api.get(f'/publicaciones/{publicacion.pk}')['ETag']
+        self.assertEqual(api.get(f'/publicaciones/{publicacion.pk}', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class BusquedaPublicacionesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Publicacion.objects.create(titulo='Olla común', descripcion='Almuerzo para vecinos', direccion='Calle Los Alimentos 12')
+        Publicacion.objects.create(titulo='Donación de alimentos', descripcion='Cajas de mercadería')
+        Publicacion.objects.create(titulo='Ropa de invierno', descripcion='Chaquetas y frazadas')
+
+    def test_pagina_publica_filtra_por_q(self):
+        respuesta = self.client.get('/publicaciones/list/?q=alimentos')
+        titulos = [p.titulo for p in respuesta.context['pagina'].publicaciones]
+        self.assertEqual(set(titulos), {'Olla común', 'Donación de alimentos'})
+        if busqueda.disponible():
+            # El título pesa más que la dirección
+            self.assertEqual(titulos[0], 'Donación de alimentos')
+
+    def test_api_con_q(self):
+        api = APIClient()
+        api.force_authenticate(user=mock.Mock(is_authenticated=True))
+        respuesta = api.get('/publicaciones/?q=frazadas')
+        self.assertEqual([p['titulo'] for p in respuesta.data['results']], ['Ropa de invierno'])
+        self.assertNotIn('busqueda', respuesta.data['results'][0])
+
+    def test_paginas_de_resultados(self):
+        pagina = PaginaBusqueda(busqueda.buscar(Publicacion.objects.all(), 'de'), None, 1)
+        self.assertEqual(len(pagina.publicaciones), 1)
+        self.assertEqual(pagina.siguiente, '1')
+        self.assertEqual(PaginaBusqueda(Publicacion.objects.all(), 'x', 1).cursor, '')
+
+    @skipUnless(connection.vendor == 'postgresql', "El tsvector lo mantiene un trigger de PostgreSQL")
+    def test_trigger_y_derivaciones_en_espanol(self):
+        # "alimento" encuentra "alimentos" y el vector se actualiza con update()
+        self.assertEqual(busqueda.filtrar(Publicacion.objects.all(), 'alimento').count(), 2)
+        Publicacion.objects.filter(titulo='Ropa de invierno').update(descripcion='Abrigos')
+        self.assertFalse(busqueda.filtrar(Publicacion.objects.all(), 'frazadas').exists())
+
+    @skipUnless(connection.vendor == 'postgresql', "Solo en PostgreSQL el admin usa la búsqueda de texto completo")
+    def test_admin_busca_email_solo_si_el_termino_lo_parece(self):
+        usuario = Usuario.objects.create(email='ropa@ejemplo.cl', contrasena='Clave123!', tipo_usuario='organizacion')
+        Publicacion.objects.filter(titulo='Olla común').update(id_usuario=usuario)
+        modelo_admin = admin.site._registry[Publicacion]
+
+        def titulos(termino):
+            resultado, _ = modelo_admin.get_search_results(None, Publicacion.objects.all(), termino)
+            return {p.titulo for p in resultado}
+
+        self.assertEqual(titulos('ropa'), {'Ropa de invierno'})
+        self.assertEqual(titulos('ropa@ejemplo'), {'Olla común'})
+
+
+class FiltrosComunaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.org = Usuario.objects.create(email='org@ejemplo.cl', contrasena='Clave123!', tipo_usuario='organizacion')
+        Organizacion.objects.create(id_usuario=cls.org, razon_social='Olla Común', rut='76.123.456-7')
+        for titulo, comuna, region in [
+            ('Uno', 'maipú', 'Región Metropolitana de Santiago'),
+            ('Dos', ' Maipú ', 'Región Metropolitana de Santiago'),
+            ('Tres', 'san pedro DE LA paz', 'VIII Región de Bío Bío'),
+            ('Cuatro', None, None),
+        ]:
+            Publicacion.objects.create(titulo=titulo, descripcion='d', comuna=comuna, region=region)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_normalizar_comuna(self):
+        self.assertEqual(normalizar_comuna('  san pedro  DE LA paz '), 'San Pedro de la Paz')
+        self.assertEqual(normalizar_comuna('los ángeles'), 'Los Ángeles')
+        self.assertIsNone(normalizar_comuna('   '))
+
+    def test_filtro_de_varias_comunas_y_regiones(self):
+        respuesta = self.client.get('/publicaciones/list/?comuna=maipu&comuna=MAIPÚ&comuna=San Pedro de la Paz')
+        self.assertEqual({p.titulo for p in respuesta.context['pagina'].publicaciones}, {'Uno', 'Dos', 'Tres'})
+        self.assertEqual(respuesta.context['comunas_seleccionadas'], ['Maipu', 'Maipú', 'San Pedro de la Paz'])
+
+        respuesta = self.client.get('/publicaciones/list/?region=VIII Región de Bío Bío&region=Inventada')
+        self.assertEqual([p.titulo for p in respuesta.context['pagina'].publicaciones], ['Tres'])
+        self.assertEqual(respuesta.context['regiones_seleccionadas'], ['VIII Región de Bío Bío'])
+
+    def test_conteos_por_comuna_se_calculan_una_vez_por_version(self):
+        self.assertEqual(facetas.conteo_comunas(Publicacion), [('Maipú', 2), ('San Pedro de la Paz', 1)])
+        with self.assertNumQueries(1):  # solo la versión de la tabla
+            facetas.conteo_comunas(Publicacion)
+        Publicacion.objects.create(titulo='Cinco', descripcion='d', comuna='Maipú')
+        self.assertEqual(facetas.conteo_comunas(Publicacion)[0], ('Maipú', 3))
+
+    def test_region_validada_contra_regiones_chile(self):
+        datos = {'titulo': 't', 'descripcion': 'd', 'direccion': 'x', 'comuna': 'Maipú'}
+        self.assertFalse(PublicacionForm(dict(datos, region='Región Inventada')).is_valid())
+        self.assertTrue(PublicacionForm(dict(datos, region='XVI Región de Ñuble')).is_valid())
+
+    def test_editar_con_region_invalida_no_guarda(self):
+        publicacion = Publicacion.objects.create(
+            id_usuario=self.org, titulo='Seis', descripcion='d', region='XVI Región de Ñuble'
+        )
+        sesion = self.client.session
+        sesion['id_usuario'] = self.org.pk
+        sesion.save()
+        url = f'/editar_publicacion/{publicacion.pk}/'
+        datos = {'titulo': 'Seis editada', 'descripcion': 'd', 'direccion': 'x', 'comuna': 'chillán'}
+
+        with mock.patch.object(pregeneracion, 'encolar') as encolar:
+            respuesta = self.client.post(url, dict(datos, region='Región Inventada'), follow=True)
+            publicacion.refresh_from_db()
+            self.assertEqual((publicacion.titulo, publicacion.region), ('Seis', 'XVI Región de Ñuble'))
+            self.assertContains(respuesta, 'La región no es una región de Chile válida.')
+            encolar.assert_not_called()
+
+            self.client.post(url, dict(datos, region='XVI Región de Ñuble'))
+            publicacion.refresh_from_db()
+            self.assertEqual((publicacion.titulo, publicacion.comuna), ('Seis editada', 'Chillán'))
+
+    def test_beneficiarios_por_comuna(self):
+        Beneficiario.objects.create(id_usuario_registrador=self.org, nombre='Ana', comuna='ñuñoa')
+        Beneficiario.objects.create(id_usuario_registrador=self.org, nombre='Luis', comuna='Maipú')
+        sesion = self.client.session
+        sesion['id_usuario'] = self.org.pk
+        sesion.save()
+
+        respuesta = self.client.get('/beneficiarios/?comuna=Ñuñoa')
+        self.assertEqual([b.nombre for b in respuesta.context['beneficiarios']], ['Ana'])
+        self.assertEqual(respuesta.context['comunas'], [('Maipú', 1), ('Ñuñoa', 1)])
@@ -0,0 +1,376 @@
+"""
+Síntesis de voz de publicaciones, con caché en disco.
+
+Los motores se configuran en ``settings.TTS_BACKENDS`` (ver ``tts_backends``)
+en orden de preferencia: si el principal falla o excede TTS_PRESUPUESTO
+segundos, el fragmento se sintetiza con el siguiente. Por defecto se usa
+VoiceRSS y, de respaldo, espeak-ng local.
+
+Los textos largos se dividen en fragmentos por oraciones; cada fragmento se
+sintetiza y se guarda en caché por separado, en paralelo, y el MP3 completo es
+la concatenación de los fragmentos en orden.
+
+Las llamadas reutilizan conexiones HTTP (keep-alive) y pasan por un
+cortacircuitos: tras varios fallos seguidos de VoiceRSS se deja de llamar al
+proveedor durante un tiempo en vez de bloquear workers hasta el timeout.
+La variante asíncrona está en ``tts_async``.
+"""
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import audio_cache
+
+
+VOICERSS_URL = getattr(settings, 'VOICERSS_URL', "https://api.voicerss.org/")
+VOICERSS_TIMEOUT = float(getattr(settings, 'VOICERSS_TIMEOUT', 10))
+MAX_CONCURRENCIA = int(getattr(settings, 'TTS_MAX_CONCURRENCIA', 10))
+# Largo máximo de cada fragmento enviado al proveedor
+FRAGMENTO_MAX = int(getattr(settings, 'TTS_FRAGMENTO_MAX', 400))
+# Segundos que se espera a un motor antes de pasar al siguiente
+PRESUPUESTO = float(getattr(settings, 'TTS_PRESUPUESTO', 3))
+BACKENDS = getattr(settings, 'TTS_BACKENDS', [
+    'proyectoapp.tts_backends.VoiceRSS',
+    'proyectoapp.tts_backends.EspeakNG',
+])
+VOZ = "es-mx"       # voz en español (México soportado por VoiceRSS)
+CODEC = "MP3"       # Formato de audio
+
+
+class ErrorSintesis(Exception):
+    """Error al obtener el audio desde el proveedor de voz."""
+
+    def __init__(self, mensaje, status=500):
+        super().__init__(mensaje)
+        self.status = status
+
+
+class CircuitoTTS:
+    """
+    Cortacircuitos para el proveedor de voz.
+
+    Tras ``fallos_max`` fallos seguidos queda abierto ``espera`` segundos;
+    luego deja pasar una única llamada de prueba y se cierra si esta funciona.
+    """
+
+    def __init__(self, fallos_max, espera):
+        self.fallos_max = fallos_max
+        self.espera = espera
+        self._lock = threading.Lock()
+        self._fallos = 0
+        self._abierto_hasta = 0.0
+        self._probando = False
+
+    def permitir(self):
+        with self._lock:
+            if self._fallos < self.fallos_max:
+                return True
+            if time.monotonic() < self._abierto_hasta or self._probando:
+                return False
+            self._probando = True
+            return True
+
+    def exito(self):
+        with self._lock:
+            self._fallos = 0
+            self._probando = False
+
+    def fallo(self):
+        with self._lock:
+            self._fallos += 1
+            self._probando = False
+            if self._fallos >= self.fallos_max:
+                self._abierto_hasta = time.monotonic() + self.espera
+
+    @property
+    def estado(self):
+        with self._lock:
+            if self._fallos < self.fallos_max:
+                return 'cerrado'
+            return 'abierto' if time.monotonic() < self._abierto_hasta else 'semiabierto'
+
+
+circuito = CircuitoTTS(
+    int(getattr(settings, 'TTS_CIRCUITO_FALLOS', 5)),
+    float(getattr(settings, 'TTS_CIRCUITO_ESPERA', 30)),
+)
+
+# Sesión compartida: reutiliza las conexiones TLS con VoiceRSS
+_sesion = requests.Session()
+_sesion.mount('https://', HTTPAdapter(pool_maxsize=MAX_CONCURRENCIA))
+_sesion.mount('http://', HTTPAdapter(pool_maxsize=MAX_CONCURRENCIA))
+
+# Hilos para sintetizar en paralelo los fragmentos de un texto largo
+_ejecutor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCIA, thread_name_prefix='tts')
+
+_FIN_ORACION = re.compile(r'(?<=[.!?…;:])\s+')
+
+
+def texto_publicacion(publicacion):
+    """
+    Arma el texto a leer de una publicación.
+
+    Args:
+        publicacion (Publicacion): Publicación a leer
+
+    Returns:
+        str: título + descripción + dirección (si existe)
+    """
+    partes = []
+    if getattr(publicacion, 'titulo', None):
+        partes.append(str(publicacion.titulo).strip())
+    if getattr(publicacion, 'descripcion', None):
+        partes.append(str(publicacion.descripcion).strip())
+    # Agregar dirección con etiqueta para mejorar claridad en la lectura
+    if getattr(publicacion, 'direccion', None):
+        direccion = str(publicacion.direccion).strip()
+        if direccion:
+            partes.append(f"Dirección: {direccion}")
+    # Agregar comuna si está disponible
+    if getattr(publicacion, 'comuna', None):
+        comuna = str(publicacion.comuna).strip()
+        if comuna:
+            partes.append(f"Comuna: {comuna}")
+
+    return ". ".join(partes)
+
+
+def _partir_oracion(oracion, maximo):
+    """Corta una oración más larga que ``maximo`` en comas o, si no hay, en espacios."""
+    while len(oracion) > maximo:
+        corte = oracion.rfind(', ', 0, maximo)
+        if corte <= 0:
+            corte = oracion.rfind(' ', 0, maximo)
+        if corte <= 0:
+            corte = maximo - 1
+        yield oracion[:corte + 1].strip()
+        oracion = oracion[corte + 1:].strip()
+    if oracion:
+        yield oracion
+
+
+def dividir_texto(texto, maximo=None):
+    """
+    Divide un texto en fragmentos de oraciones completas.
+
+    Args:
+        texto (str): Texto a leer
+        maximo (int): Largo máximo de cada fragmento (por defecto FRAGMENTO_MAX)
+
+    Returns:
+        list: Fragmentos en orden; agrupa oraciones cortas hasta el máximo
+    """
+    maximo = maximo or FRAGMENTO_MAX
+    fragmentos = []
+    actual = ''
+    for oracion in _FIN_ORACION.split(texto.strip()):
+        for parte in _partir_oracion(oracion, maximo):
+            if actual and len(actual) + 1 + len(parte) > maximo:
+                fragmentos.append(actual)
+                actual = parte
+            else:
+                actual = f"{actual} {parte}" if actual else parte
+    if actual:
+        fragmentos.append(actual)
+    return fragmentos
+
+
+def parametros_voicerss(texto):
+    """
+    Parámetros de la petición a VoiceRSS para un texto.
+
+    Raises:
+        ErrorSintesis: Si VoiceRSS no está configurado o el circuito está abierto
+    """
+    # Validar que la API key de VoiceRSS esté configurada
+    voicerss_key = getattr(settings, 'VOICERSS_API_KEY', None)
+    if not voicerss_key:
+        raise ErrorSintesis("VoiceRSS no está configurado")
+    if not circuito.permitir():
+        raise ErrorSintesis("VoiceRSS no disponible temporalmente", status=503)
+
+    return {
+        "key": voicerss_key,
+        "hl": VOZ,
+        "src": texto,       # texto a hablar
+        "c": CODEC,
+    }
+
+
+def validar_respuesta(status_code, contenido):
+    """
+    Revisa la respuesta de VoiceRSS y actualiza el circuito.
+
+    Raises:
+        ErrorSintesis: Si VoiceRSS respondió con un error
+    """
+    if status_code >= 500:
+        circuito.fallo()
+        raise ErrorSintesis(f"Error en VoiceRSS: HTTP {status_code}")
+    circuito.exito()
+
+    # VoiceRSS devuelve texto cuando hay error ("ERROR something...")
+    if contenido.startswith(b"ERROR"):
+        error_msg = contenido.decode('utf-8', errors='ignore')
+        raise ErrorSintesis(f"Error en VoiceRSS: {error_msg}")
+
+
+_backends = None
+
+
+def backends():
+    """Instancias de los motores configurados, en orden de preferencia."""
+    global _backends
+    if _backends is None:
+        _backends = [import_string(ruta)() for ruta in BACKENDS]
+    return _backends
+
+
+def version_audio(texto, perfil=None):
+    """
+    Clave del audio de un texto con el motor principal (el ETag, sin comillas).
+
+    Cambia si cambia el texto o el motor principal; sirve como ?v= en las URLs
+    de audio de los listados.
+    """
+    principal = backends()[0]
+    return audio_cache.clave_audio(texto, principal.voz, perfil or principal.codec)
+
+
+def plazo(posicion):
+    """Timeout del motor en ``posicion``: el último espera lo que haga falta."""
+    if posicion < len(backends()) - 1:
+        return min(PRESUPUESTO, VOICERSS_TIMEOUT)
+    return VOICERSS_TIMEOUT
+
+
+def sintetizar(texto):
+    """
+    Obtiene el MP3 de un texto, desde la caché o desde el primer motor que responda.
+
+    Args:
+        texto (str): Texto a sintetizar
+
+    Returns:
+        bytes: Audio MP3
+
+    Raises:
+        ErrorSintesis: Si ningún motor pudo sintetizar el texto (el error del principal)
+    """
+    errores = []
+    for posicion, backend in enumerate(backends()):
+        contenido = audio_cache.obtener_audio(texto, backend.voz, backend.codec)
+        if contenido is not None:
+            return contenido
+        try:
+            contenido = backend.sintetizar(texto, plazo(posicion))
+        except ErrorSintesis as e:
+            errores.append(e)
+            continue
+        audio_cache.guardar_audio(texto, backend.voz, backend.codec, contenido)
+        return contenido
+    raise errores[0]
+
+
+def audio_por_fragmentos(fragmentos):
+    """
+    Sintetiza fragmentos en paralelo y entrega su audio en orden.
+
+    El primer fragmento queda disponible apenas termina, sin esperar al resto.
+
+    Args:
+        fragmentos (list): Fragmentos de ``dividir_texto``
+
+    Yields:
+        bytes: Audio MP3 de cada fragmento
+
+    Raises:
+        ErrorSintesis: Si falla la síntesis de algún fragmento
+    """
+    futuros = [_ejecutor.submit(sintetizar, fragmento) for fragmento in fragmentos]
+    for futuro in futuros:
+        yield futuro.result()
+
+
+def principal_disponible():
+    """Indica si el motor principal está configurado."""
+    return backends()[0].disponible()
+
+
+def sintetizar_principal(texto, timeout):
+    """
+    Obtiene el MP3 de un texto solo con el motor principal, sin respaldo.
+
+    Args:
+        texto (str): Texto a sintetizar
+        timeout (float): Segundos máximos para el motor principal
+
+    Returns:
+        bytes: Audio MP3
+
+    Raises:
+        ErrorSintesis: Si el motor principal falló
+    """
+    principal = backends()[0]
+    contenido = audio_cache.obtener_audio(texto, principal.voz, principal.codec)
+    if contenido is not None:
+        return contenido
+    contenido = principal.sintetizar(texto, timeout)
+    audio_cache.guardar_audio(texto, principal.voz, principal.codec, contenido)
+    return contenido
+
+
+def sintetizar_completo(texto, timeout):
+    """
+    Obtiene el MP3 completo de un texto con el motor principal, fragmento por fragmento.
+
+    Es para pre-generar: a diferencia de ``sintetizar``, no pasa a los motores
+    de respaldo, así un fallo del principal llega al llamador y su caché no
+    queda vacía tras un audio de respaldo.
+
+    Args:
+        texto (str): Texto a sintetizar
+        timeout (float): Segundos máximos por fragmento
+
+    Returns:
+        bytes: Audio MP3 de todos los fragmentos concatenados
+
+    Raises:
+        ErrorSintesis: Si el motor principal falló en algún fragmento
+    """
+    futuros = [_ejecutor.submit(sintetizar_principal, fragmento, timeout)
+               for fragmento in dividir_texto(texto)]
+    return b''.join(futuro.result() for futuro in futuros)
+
+
+def fragmentos_en_cache(fragmentos):
+    """Indica si todos los fragmentos están en caché con el motor principal."""
+    principal = backends()[0]
+    return all(audio_cache.existe_audio(f, principal.voz, principal.codec) for f in fragmentos)
+
+
+def en_cache(texto):
+    """Indica si el audio de un texto está completo en caché con el motor principal."""
+    return fragmentos_en_cache(dividir_texto(texto))
+
+
+def invalidar_si_cambio(texto_anterior, publicacion):
+    """
+    Descarta el audio en caché de una publicación si su texto cambió.
+
+    Solo se borran las variantes del texto completo. Los fragmentos se
+    guardan por contenido y pueden compartirlos otras publicaciones, así que
+    los que ya no se usan quedan para la expulsión LRU.
+
+    Args:
+        texto_anterior (str): Texto de la publicación antes de editarla
+        publicacion (Publicacion): Publicación ya actualizada
+    """
+    if texto_publicacion(publicacion) != texto_anterior:
+        audio_cache.invalidar_texto(texto_anterior)
@@ -0,0 +1,124 @@
+"""
+Variante asíncrona de la síntesis de voz, para servir bajo ASGI.
+
+Cada event loop mantiene un único cliente HTTP con conexiones keep-alive
+(lo usa ``tts_backends.VoiceRSS``), un semáforo que acota las llamadas
+simultáneas a VoiceRSS y un registro de textos en curso: si llegan varias
+peticiones por el mismo texto mientras se sintetiza, todas esperan la misma
+llamada a los motores. Los textos largos se sintetizan por fragmentos, igual
+que en ``tts``.
+"""
+import asyncio
+import weakref
+
+import httpx
+from asgiref.sync import sync_to_async
+
+from . import audio_cache, tts
+
+
+class _EstadoLoop:
+    def __init__(self):
+        self.cliente = httpx.AsyncClient(
+            timeout=tts.VOICERSS_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=tts.MAX_CONCURRENCIA,
+                max_keepalive_connections=tts.MAX_CONCURRENCIA,
+            ),
+        )
+        self.semaforo = asyncio.Semaphore(tts.MAX_CONCURRENCIA)
+        self.en_curso = {}
+
+
+_estados = weakref.WeakKeyDictionary()
+
+
+def _estado():
+    loop = asyncio.get_running_loop()
+    estado = _estados.get(loop)
+    if estado is None:
+        estado = _estados[loop] = _EstadoLoop()
+    return estado
+
+
+async def _sintetizar_con_respaldo(texto):
+    # Mismo orden que tts.sintetizar; la caché del principal ya se revisó
+    errores = []
+    for posicion, backend in enumerate(tts.backends()):
+        if posicion > 0:
+            contenido = await sync_to_async(audio_cache.obtener_audio, thread_sensitive=False)(
+                texto, backend.voz, backend.codec
+            )
+            if contenido is not None:
+                return contenido
+        try:
+            contenido = await backend.asintetizar(texto, tts.plazo(posicion))
+        except tts.ErrorSintesis as e:
+            errores.append(e)
+            continue
+        await sync_to_async(audio_cache.guardar_audio, thread_sensitive=False)(
+            texto, backend.voz, backend.codec, contenido
+        )
+        return contenido
+    raise errores[0]
+
+
+async def asintetizar(texto):
+    """
+    Obtiene el MP3 de un texto, desde la caché o desde el primer motor que
+    responda, sin bloquear el loop.
+
+    Args:
+        texto (str): Texto a sintetizar
+
+    Returns:
+        bytes: Audio MP3
+
+    Raises:
+        ErrorSintesis: Si ningún motor pudo sintetizar el texto
+    """
+    principal = tts.backends()[0]
+    contenido = await sync_to_async(audio_cache.obtener_audio, thread_sensitive=False)(
+        texto, principal.voz, principal.codec
+    )
+    if contenido is not None:
+        return contenido
+
+    estado = _estado()
+    tarea = estado.en_curso.get(texto)
+    if tarea is None:
+        tarea = asyncio.ensure_future(_sintetizar_con_respaldo(texto))
+        estado.en_curso[texto] = tarea
+        tarea.add_done_callback(lambda _tarea: estado.en_curso.pop(texto, None))
+    # shield: si un cliente se desconecta no se cancela la descarga de los demás
+    return await asyncio.shield(tarea)
+
+
+async def cerrar():
+    """Cierra el cliente HTTP del loop actual (al apagar el servidor o en tests)."""
+    estado = _estados.pop(asyncio.get_running_loop(), None)
+    if estado is not None:
+        await estado.cliente.aclose()
+
+
+async def afragmentos(fragmentos):
+    """
+    Sintetiza fragmentos en paralelo y entrega su audio en orden.
+
+    Yields:
+        bytes: Audio MP3 de cada fragmento
+    """
+    tareas = [asyncio.ensure_future(asintetizar(fragmento)) for fragmento in fragmentos]
+    try:
+        for tarea in tareas:
+            yield await tarea
+    finally:
+        # Si el cliente se desconecta se dejan de esperar los fragmentos
+        # restantes; las descargas en curso terminan y quedan en caché.
+        for tarea in tareas:
+            tarea.cancel()
+
+
+async def asintetizar_completo(texto):
+    """Obtiene el MP3 completo de un texto, fragmento por fragmento."""
+    return b''.join([audio async for audio in afragmentos(tts.dividir_texto(texto))])
@@ -0,0 +1,165 @@
+"""
+Motores de síntesis de voz intercambiables.
+
+``settings.TTS_BACKENDS`` lista las clases en orden de preferencia; ``tts``
+prueba cada una hasta obtener audio. Cada motor guarda su audio en la caché
+bajo su propia variante (``voz``), así el audio de un motor de respaldo no se
+confunde con el del principal.
+"""
+import abc
+import asyncio
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+import httpx
+import requests
+import urllib3
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import tts, tts_async
+
+
+class BackendTTS(abc.ABC):
+    """
+    Interfaz de un motor de voz.
+
+    Attributes:
+        nombre (str): Identificador legible del motor
+        voz (str): Variante para la clave de caché (voz, idioma, motor)
+        codec (str): Formato del audio producido
+    """
+    nombre = ''
+    voz = ''
+    codec = 'MP3'
+
+    @abc.abstractmethod
+    def sintetizar(self, texto, timeout):
+        """
+        Sintetiza un fragmento de texto.
+
+        Args:
+            texto (str): Texto a sintetizar
+            timeout (float): Segundos máximos para todo el trabajo (si el motor
+                tiene varios pasos, se reparten este plazo, no lo reciben cada uno)
+
+        Returns:
+            bytes: Audio en ``codec``
+
+        Raises:
+            ErrorSintesis: Si el motor no está disponible o falla
+        """
+
+    async def asintetizar(self, texto, timeout):
+        """Variante asíncrona; por defecto ejecuta ``sintetizar`` en un hilo."""
+        return await sync_to_async(self.sintetizar, thread_sensitive=False)(texto, timeout)
+
+    def disponible(self):
+        """Indica si el motor está configurado para usarse (sin llamarlo)."""
+        return True
+
+
+class VoiceRSS(BackendTTS):
+    """API remota de VoiceRSS (requiere VOICERSS_API_KEY)."""
+    nombre = 'voicerss'
+
+    def __init__(self):
+        self.voz = tts.VOZ
+        self.codec = tts.CODEC
+
+    def disponible(self):
+        return bool(getattr(settings, 'VOICERSS_API_KEY', None))
+
+    def sintetizar(self, texto, timeout):
+        params = tts.parametros_voicerss(texto)
+        # El timeout de requests vale por conexión y por lectura; el plazo
+        # total se revisa mientras llega el audio
+        limite = time.monotonic() + timeout
+        partes = []
+        try:
+            with tts._sesion.get(tts.VOICERSS_URL, params=params, timeout=timeout, stream=True) as response:
+                # read1 entrega lo que ya llegó, sin esperar a juntar el trozo completo
+                while parte := response.raw.read1(8192, decode_content=True):
+                    if time.monotonic() > limite:
+                        raise tts.ErrorSintesis("VoiceRSS excedió el plazo", status=503)
+                    partes.append(parte)
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+            tts.circuito.fallo()
+            raise tts.ErrorSintesis(f"Error conectando con VoiceRSS: {str(e)}")
+        except tts.ErrorSintesis:
+            tts.circuito.fallo()
+            raise
+
+        contenido = b''.join(partes)
+        tts.validar_respuesta(response.status_code, contenido)
+        return contenido
+
+    async def asintetizar(self, texto, timeout):
+        params = tts.parametros_voicerss(texto)
+        estado = tts_async._estado()
+        async with estado.semaforo:
+            try:
+                # wait_for acota la llamada completa, no cada lectura
+                response = await asyncio.wait_for(
+                    estado.cliente.get(tts.VOICERSS_URL, params=params, timeout=timeout), timeout
+                )
+            except asyncio.TimeoutError:
+                tts.circuito.fallo()
+                raise tts.ErrorSintesis("VoiceRSS excedió el plazo", status=503)
+            except httpx.HTTPError as e:
+                tts.circuito.fallo()
+                raise tts.ErrorSintesis(f"Error conectando con VoiceRSS: {str(e)}")
+
+        tts.validar_respuesta(response.status_code, response.content)
+        return response.content
+
+
+class EspeakNG(BackendTTS):
+    """
+    Motor local espeak-ng, sin red. El WAV que produce se codifica a MP3 con
+    ffmpeg; los procesos simultáneos se limitan a TTS_ESPEAK_PROCESOS.
+    """
+    nombre = 'espeak-ng'
+
+    def __init__(self):
+        self.comando = getattr(settings, 'TTS_ESPEAK_COMANDO', 'espeak-ng')
+        self.voz_espeak = getattr(settings, 'TTS_ESPEAK_VOZ', 'es-419')
+        self.ffmpeg = getattr(settings, 'TTS_FFMPEG', 'ffmpeg')
+        self.voz = f'espeak-ng:{self.voz_espeak}'
+        procesos = int(getattr(settings, 'TTS_ESPEAK_PROCESOS', 0)) or os.cpu_count() or 2
+        self._procesos = threading.BoundedSemaphore(procesos)
+
+    def _ejecutar(self, comando, entrada, limite):
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            raise tts.ErrorSintesis(f"Sin tiempo para ejecutar {comando[0]}", status=503)
+        try:
+            resultado = subprocess.run(comando, input=entrada, capture_output=True, timeout=restante, check=True)
+        except subprocess.TimeoutExpired:
+            raise tts.ErrorSintesis(f"{comando[0]} excedió el plazo", status=503)
+        except subprocess.CalledProcessError as e:
+            raise tts.ErrorSintesis(f"Error en {comando[0]}: {e.stderr.decode('utf-8', errors='ignore').strip()}")
+        return resultado.stdout
+
+    def disponible(self):
+        return bool(shutil.which(self.comando) and shutil.which(self.ffmpeg))
+
+    def sintetizar(self, texto, timeout):
+        if not self.disponible():
+            raise tts.ErrorSintesis("espeak-ng o ffmpeg no están instalados")
+
+        # Un solo plazo para la espera de cupo, espeak-ng y ffmpeg
+        limite = time.monotonic() + timeout
+        if not self._procesos.acquire(timeout=timeout):
+            raise tts.ErrorSintesis("No hay procesos de espeak-ng libres", status=503)
+        try:
+            # El texto va por stdin: sin límites de largo ni riesgo de leerse como opción
+            wav = self._ejecutar([self.comando, '-v', self.voz_espeak, '-b', '1', '--stdin', '--stdout'],
+                                 texto.encode('utf-8'), limite)
+            return self._ejecutar([self.ffmpeg, '-loglevel', 'error', '-f', 'wav', '-i', 'pipe:0',
+                                   '-ac', '1', '-ar', '22050', '-f', 'mp3', 'pipe:1'], wav, limite)
+        finally:
+            self._procesos.release()
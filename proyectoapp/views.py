@@ -1,22 +1,38 @@
 from django.urls import reverse
 from django.conf import settings
-import requests
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth import authenticate, login
-from django.http import HttpResponse
+from django.http import HttpResponse, QueryDict, StreamingHttpResponse
 from functools import wraps
+from asgiref.sync import sync_to_async
+import copy
+import hashlib
+import json
 import traceback
-from .models import Usuario, UsuarioNormal, Organizacion, Publicacion, Beneficiario, Donacion, DonacionMonetaria, Campana
+from .models import Usuario, UsuarioNormal, Organizacion, Publicacion, Beneficiario, Donacion, DonacionMonetaria, Campana, VersionTabla
 from .forms import UsuarioForm, UsuarioNormalForm, OrganizacionForm, AccesoForm, PublicacionForm, BeneficiarioForm, DonacionForm, DonacionMonetariaForm, MunicipalidadForm, CampanaForm
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim
+from django.utils.dateparse import parse_date
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+from django.utils.http import parse_etags, quote_etag
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from .serializers import UsuarioSerializer, UsuarioNormalSerializer, OrganizacionSerializer, PublicacionSerializer, AudioReadingSerializer
-from .audio_logger import registrar_lectura, obtener_todas_las_lecturas, obtener_lecturas_por_publicacion
+from .serializers import UsuarioSerializer, UsuarioNormalSerializer, OrganizacionSerializer, PublicacionSerializer, AudioReadingSerializer, LOTE_MAX, campos_solicitados, lectura_rapida
+from .audio_logger import registrar_lectura, obtener_lecturas_por_publicacion
+from .audio_index import ConsultaLecturas
+from .paginacion import CursorPublicaciones, CursorUsuarios, PaginaBusqueda, PaginaPublicaciones, PaginasBusquedaAPI
+from .constants import REGIONES, REGIONES_CHILE, normalizar_comuna
+from . import audio_cache, audio_perfiles, busqueda, cuentas, facetas, limitador, pregeneracion, tts, tts_async
 
 def admin_required(view_func):
     @wraps(view_func)
@@ -30,50 +46,105 @@ def admin_required(view_func):
         return view_func(request, *args, **kwargs)
     return _wrapped_view
 
+ADMIN_PAGE_SIZE = 25
+
+
 @admin_required
 def admin_gestion(request):
-    # Obtener todas las publicaciones ordenadas por fecha
-    publicaciones = Publicacion.objects.all().order_by('-fecha_publicacion')
-    # Obtener información adicional de los usuarios
-    usuarios = {u.id_usuario: u for u in Usuario.objects.all()}
-    usuarios_normales = {un.id_usuario_id: un for un in UsuarioNormal.objects.all()}
-    organizaciones = {org.id_usuario_id: org for org in Organizacion.objects.all()}
-    
-    # Enriquecer los datos de las publicaciones
-    for pub in publicaciones:
-        pub.autor = usuarios.get(pub.id_usuario_id)
-        if pub.autor.tipo_usuario == 'usuario':
-            pub.autor_detalle = usuarios_normales.get(pub.autor.id_usuario)
-        elif pub.autor.tipo_usuario == 'organizacion':
-            pub.autor_detalle = organizaciones.get(pub.autor.id_usuario)
-    
+    publicaciones = Publicacion.objects.select_related('id_usuario').annotate(
+        # Nombre del autor en la misma consulta: razón social, nombre + apellido o email
+        autor_nombre=Coalesce(
+            'id_usuario__organizacion__razon_social',
+            NullIf(
+                Trim(Concat(
+                    'id_usuario__usuarionormal__nombre', Value(' '), 'id_usuario__usuarionormal__apellido'
+                )),
+                Value(''),
+            ),
+            'id_usuario__email',
+        )
+    ).order_by('-fecha_publicacion', '-id_publicacion')
+
+    # Filtros por tipo de publicación y rango de fechas
+    tipo = request.GET.get('tipo') or ''
+    desde = parse_date(request.GET.get('desde') or '')
+    hasta = parse_date(request.GET.get('hasta') or '')
+    if tipo:
+        publicaciones = publicaciones.filter(tipo_publicacion=tipo)
+    if desde:
+        publicaciones = publicaciones.filter(fecha_publicacion__gte=desde)
+    if hasta:
+        publicaciones = publicaciones.filter(fecha_publicacion__lte=hasta)
+
+    paginator = Paginator(publicaciones, ADMIN_PAGE_SIZE)
+    pagina = paginator.get_page(request.GET.get('page'))
+
+    filtros = request.GET.copy()
+    filtros.pop('page', None)
+    tipos = (
+        Publicacion.objects.exclude(tipo_publicacion__isnull=True).exclude(tipo_publicacion='')
+        .order_by('tipo_publicacion').values_list('tipo_publicacion', flat=True).distinct()
+    )
+
     return render(request, 'templatesApp/AdminGestion.html', {
-        'publicaciones': publicaciones
+        'publicaciones': pagina.object_list,
+        'page_obj': pagina,
+        'tipos': tipos,
+        'filtros': {'tipo': tipo, 'desde': desde, 'hasta': hasta},
+        'filtros_qs': filtros.urlencode(),
     })
 
+HISTORIAL_PAGE_SIZE = 50
+USUARIO_RESUMEN_TTL = 60  # segundos
+
+
+def _resumen_usuarios(ids):
+    """
+    Obtiene (email, tipo_usuario) de varios usuarios con una sola consulta.
+    Los resultados quedan en la caché en memoria por USUARIO_RESUMEN_TTL
+    segundos; un usuario eliminado se guarda como None.
+    """
+    claves = {f"usuario_resumen:{id_usuario}": id_usuario for id_usuario in ids}
+    resumen = {claves[clave]: valor for clave, valor in cache.get_many(claves).items()}
+
+    faltantes = [id_usuario for id_usuario in ids if id_usuario not in resumen]
+    if faltantes:
+        usuarios = Usuario.objects.only('email', 'tipo_usuario').in_bulk(faltantes)
+        nuevos = {}
+        for id_usuario in faltantes:
+            usuario = usuarios.get(id_usuario)
+            resumen[id_usuario] = (usuario.email, usuario.tipo_usuario) if usuario else None
+            nuevos[f"usuario_resumen:{id_usuario}"] = resumen[id_usuario]
+        cache.set_many(nuevos, USUARIO_RESUMEN_TTL)
+    return resumen
+
+
 @admin_required
 def historial_lecturas(request):
     """
     Vista para que administradores vean el historial de lecturas de texto a voz.
     """
-    lecturas = obtener_todas_las_lecturas()
-    
-    # Enriquecer con información de usuarios si está disponible
+    # El índice entrega las lecturas ya ordenadas (más recientes primero)
+    consulta = ConsultaLecturas()
+    paginator = Paginator(consulta, HISTORIAL_PAGE_SIZE)
+    pagina = paginator.get_page(request.GET.get('page'))
+    lecturas = pagina.object_list
+
+    # Enriquecer con información de usuarios (una consulta para toda la página)
+    ids = {lectura['id_usuario'] for lectura in lecturas if lectura.get('id_usuario')}
+    usuarios = _resumen_usuarios(ids)
     for lectura in lecturas:
         if lectura.get('id_usuario'):
-            try:
-                usuario = Usuario.objects.get(id_usuario=lectura['id_usuario'])
-                lectura['usuario_email'] = usuario.email
-                lectura['tipo_usuario'] = usuario.tipo_usuario
-            except Usuario.DoesNotExist:
+            datos = usuarios.get(lectura['id_usuario'])
+            if datos:
+                lectura['usuario_email'], lectura['tipo_usuario'] = datos
+            else:
                 lectura['usuario_email'] = 'Usuario eliminado'
-    
-    # Ordenar por timestamp descendente (más recientes primero)
-    lecturas.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
-    
+
     return render(request, 'templatesApp/HistorialLecturas.html', {
         'lecturas': lecturas,
-        'total_lecturas': len(lecturas)
+        'page_obj': pagina,
+        'total_lecturas': paginator.count
     })
 
 def eliminar_publicacion(request, id_publicacion):
@@ -109,11 +180,21 @@ def editar_publicacion(request, id_publicacion):
         publicacion = get_object_or_404(Publicacion, id_publicacion=id_publicacion, id_usuario=request.session['id_usuario'])
     
     if request.method == 'POST':
-        publicacion.titulo = request.POST.get('titulo')
-        publicacion.descripcion = request.POST.get('descripcion')
-        publicacion.direccion = request.POST.get('direccion')
-        publicacion.save()
-        messages.success(request, '¡Publicación actualizada!')
+        texto_anterior = tts.texto_publicacion(publicacion)
+        # Comuna y región se conservan si el formulario no las trae (AdminGestion)
+        datos = request.POST.copy()
+        for campo in ('comuna', 'region'):
+            if campo not in datos:
+                datos[campo] = getattr(publicacion, campo) or ''
+        form = PublicacionForm(datos, instance=publicacion)
+        if form.is_valid():
+            form.save()
+            tts.invalidar_si_cambio(texto_anterior, publicacion)
+            pregeneracion.encolar(publicacion)
+            messages.success(request, '¡Publicación actualizada!')
+        else:
+            errores = ' '.join(error for lista in form.errors.values() for error in lista)
+            messages.error(request, f'No se pudo actualizar la publicación. {errores}')
         
         # Redirigir a admin_gestion si es admin, sino a gestion normal
         if request.session.get('es_admin'):
@@ -125,31 +206,23 @@ def gestion(request):
         return redirect('acceso')
     publicaciones = Publicacion.objects.filter(id_usuario=request.session['id_usuario']).order_by('-fecha_publicacion')
     return render(request, 'templatesApp/Gestion.html', {
-        'publicaciones': publicaciones
+        'publicaciones': publicaciones,
+        'regiones': REGIONES_CHILE,
     })
 
 # Vista para mostrar datos del usuario y opción de cerrar sesión
 def usuario(request):
     if not request.session.get('id_usuario'):
         return redirect('acceso')
-    usuario = None
+    # Usuario y perfil en una consulta; la página muestra datos que no van a la caché
+    usuario = cuentas.con_perfil().filter(id_usuario=request.session['id_usuario']).first()
     usuario_normal = None
     organizacion = None
-    try:
-        usuario = Usuario.objects.get(id_usuario=request.session['id_usuario'])
-        # Cargar datos según tipo de usuario
-        if usuario.tipo_usuario == 'usuario':
-            try:
-                usuario_normal = UsuarioNormal.objects.get(id_usuario=usuario)
-            except UsuarioNormal.DoesNotExist:
-                usuario_normal = None
-        elif usuario.tipo_usuario == 'organizacion':
-            try:
-                organizacion = Organizacion.objects.get(id_usuario=usuario)
-            except Organizacion.DoesNotExist:
-                organizacion = None
-    except Usuario.DoesNotExist:
-        usuario = None
+    # Datos según tipo de usuario (ya cargados junto al usuario)
+    if usuario and usuario.tipo_usuario == 'usuario':
+        usuario_normal = cuentas.perfil(usuario, 'usuarionormal')
+    elif usuario and usuario.tipo_usuario == 'organizacion':
+        organizacion = cuentas.perfil(usuario, 'organizacion')
 
     return render(request, 'templatesApp/Usuario.html', {
         'usuario': usuario,
@@ -164,22 +237,132 @@ def cerrar_sesion(request):
 
 
 
+INICIO_PAGE_SIZE = 12
+PUBLICACIONES_PAGE_SIZE = 24
+
+
+def _estado_publicaciones(request):
+    """
+    (versión, modificado) de la tabla de publicaciones, leído una vez por petición.
+
+    La versión es la clave de la caché de fragmentos y de los validadores HTTP.
+    """
+    if not hasattr(request, '_estado_publicaciones'):
+        request._estado_publicaciones = VersionTabla.obtener(Publicacion._meta.db_table)
+    return request._estado_publicaciones
+
+
+def _validable(request):
+    # Con mensajes pendientes la página debe mostrarlos (y consumirlos)
+    return request.method in ('GET', 'HEAD') and not len(messages.get_messages(request))
+
+
+def _etag_publicaciones(request, *args, **kwargs):
+    """
+    ETag de una página o respuesta de la API basada en publicaciones.
+
+    Cambia con la versión de la tabla y con todo lo demás que altera el cuerpo:
+    la URL con sus parámetros, los datos de sesión que usan las plantillas y el
+    formato pedido (JSON o API navegable).
+    """
+    if not _validable(request):
+        return None
+    sesion = request.session
+    partes = (
+        _estado_publicaciones(request)[0],
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+        sesion.get('id_usuario'),
+        sesion.get('tipo_usuario'),
+        sesion.get('es_admin'),
+        sesion.get('display_name'),
+    )
+    return hashlib.sha256(repr(partes).encode('utf-8')).hexdigest()[:32]
+
+
+def _modificacion_publicaciones(request, *args, **kwargs):
+    # Solo se considera si el cliente no envía If-None-Match (RFC 9110)
+    return _estado_publicaciones(request)[1] if _validable(request) else None
+
+
+def condicional_publicaciones(vista):
+    """
+    Responde 304 sin ejecutar la vista si las publicaciones no cambiaron.
+
+    Usa ETag y Last-Modified derivados de VersionTabla; el cliente debe
+    revalidar siempre (no-cache) y los proxies no comparten la respuesta,
+    que depende de la sesión.
+    """
+    condicional = condition(etag_func=_etag_publicaciones, last_modified_func=_modificacion_publicaciones)(vista)
+
+    @wraps(vista)
+    def envuelta(request, *args, **kwargs):
+        respuesta = condicional(request, *args, **kwargs)
+        if respuesta.has_header('ETag'):
+            patch_cache_control(respuesta, private=True, no_cache=True)
+        return respuesta
+    return envuelta
+
+
+@condicional_publicaciones
 def inicio(request):
-    usuarios = UsuarioNormal.objects.select_related('id_usuario').all()
-    publicaciones = Publicacion.objects.all().order_by('-fecha_publicacion')
+    pagina = PaginaPublicaciones(
+        Publicacion.objects.all(), request.GET.get('cursor'), INICIO_PAGE_SIZE
+    )
     return render(request, 'templatesApp/Inicio.html', {
-        'usuarios': usuarios,
-        'publicaciones': publicaciones
+        'pagina': pagina,
+        'version_publicaciones': _estado_publicaciones(request)[0],
+        'cache_ttl': settings.PUBLICACIONES_CACHE_TTL,
     })
 
 
+def _comunas_solicitadas(request):
+    """Comunas de ?comuna=A&comuna=B, en su forma normalizada y sin repetir."""
+    return sorted({c for c in map(normalizar_comuna, request.GET.getlist('comuna')) if c})
+
+
+@condicional_publicaciones
 def publicaciones_view(request):
-    """Página pública para listar publicaciones (sin filtros por comuna)."""
-    # Recuperar todas las publicaciones sin aplicar filtros
-    publicaciones = Publicacion.objects.all().order_by('-fecha_publicacion')
+    """Página pública para listar publicaciones.
+
+    Se pueden filtrar por varias comunas (?comuna=) y regiones (?region=) a la
+    vez; los filtros usan los índices (comuna|region, fecha, id). Con ?q= se
+    muestran los resultados de la búsqueda de texto completo, los más
+    relevantes primero. El selector de comunas muestra cuántas publicaciones
+    hay en cada una (facetas.conteo_comunas).
+    """
+    texto = request.GET.get('q', '').strip()
+    comunas = _comunas_solicitadas(request)
+    regiones = sorted(set(request.GET.getlist('region')) & REGIONES)
+    version = _estado_publicaciones(request)[0]
+
+    publicaciones = Publicacion.objects.all()
+    if comunas:
+        publicaciones = publicaciones.filter(comuna__in=comunas)
+    if regiones:
+        publicaciones = publicaciones.filter(region__in=regiones)
+    if texto:
+        pagina = PaginaBusqueda(busqueda.buscar(publicaciones, texto), request.GET.get('cursor'), PUBLICACIONES_PAGE_SIZE)
+    else:
+        pagina = PaginaPublicaciones(publicaciones, request.GET.get('cursor'), PUBLICACIONES_PAGE_SIZE)
 
+    # Filtros normalizados: se conservan en los enlaces de paginación y
+    # forman parte de la clave de la caché de fragmentos
+    filtros = QueryDict(mutable=True)
+    if texto:
+        filtros['q'] = texto
+    filtros.setlist('comuna', comunas)
+    filtros.setlist('region', regiones)
     return render(request, 'templatesApp/Publicaciones.html', {
-        'publicaciones': publicaciones,
+        'pagina': pagina,
+        'busqueda': texto,
+        'comunas': facetas.conteo_comunas(Publicacion, version),
+        'comunas_seleccionadas': comunas,
+        'regiones': REGIONES_CHILE,
+        'regiones_seleccionadas': regiones,
+        'filtros_qs': filtros.urlencode(),
+        'version_publicaciones': version,
+        'cache_ttl': settings.PUBLICACIONES_CACHE_TTL,
     })
 
 
@@ -191,20 +374,23 @@ def beneficiarios_view(request):
         messages.error(request, "Debes iniciar sesión para acceder a esta página.")
         return redirect('acceso')
     
-    usuario = Usuario.objects.get(id_usuario=request.session['id_usuario'])
+    usuario = cuentas.datos_sesion(request)
     
     # Verificar que el usuario sea una organización
-    if usuario.tipo_usuario != 'organizacion':
+    if usuario is None or usuario['tipo_usuario'] != 'organizacion':
         messages.error(request, "Solo las organizaciones pueden acceder a esta página.")
         return redirect('inicio')
     
-    # Obtener todos los beneficiarios
+    # Beneficiarios de las comuna(s) elegidas (índice comuna, nombre) o todos
+    comunas = _comunas_solicitadas(request)
     beneficiarios = Beneficiario.objects.all().order_by('nombre')
+    if comunas:
+        beneficiarios = beneficiarios.filter(comuna__in=comunas)
     
     form = BeneficiarioForm(request.POST or None)
     if request.method == 'POST' and form.is_valid():
         beneficiario = form.save(commit=False)
-        beneficiario.id_usuario_registrador = usuario
+        beneficiario.id_usuario_registrador_id = usuario['id_usuario']
         beneficiario.save()
         messages.success(request, '¡Beneficiario añadido correctamente!')
         return redirect('beneficiarios')
@@ -212,6 +398,8 @@ def beneficiarios_view(request):
     return render(request, 'templatesApp/Beneficiarios.html', {
         'beneficiarios': beneficiarios,
         'form': form,
+        'comunas': facetas.conteo_comunas(Beneficiario),
+        'comunas_seleccionadas': comunas,
     })
 
 
@@ -230,6 +418,7 @@ def publicar(request):
             publicacion.tipo_publicacion = tipo_publicacion
             publicacion.fecha_publicacion = timezone.now().date()
             publicacion.save()
+            pregeneracion.encolar(publicacion)
             messages.success(request, '¡Publicación realizada con éxito!')
             return redirect('inicio')
         else:
@@ -324,7 +513,8 @@ def acceso(request):
             email = form.cleaned_data["email"]
             contrasena = form.cleaned_data["contrasena"]
             try:
-                usuario = Usuario.objects.get(email=email)
+                # Usuario y perfil (persona, organización o municipalidad) en una consulta
+                usuario = cuentas.con_perfil().get(email=email)
                 if usuario.check_password(contrasena):
                     # Almacenar información básica del usuario en la sesión
                     request.session['id_usuario'] = usuario.id_usuario
@@ -332,26 +522,9 @@ def acceso(request):
                     request.session['es_admin'] = usuario.es_admin
                     request.session['tipo_usuario'] = usuario.tipo_usuario
                     # Preparar un nombre para mostrar en la navbar
-                    display_name = usuario.email
-                    try:
-                        if usuario.tipo_usuario == 'usuario':
-                            un = UsuarioNormal.objects.get(id_usuario=usuario)
-                            display_name = f"{un.nombre} {un.apellido}".strip()
-                        elif usuario.tipo_usuario == 'organizacion':
-                            org = Organizacion.objects.get(id_usuario=usuario)
-                            display_name = org.razon_social or usuario.email
-                        elif usuario.es_admin:
-                            # intentar mostrar nombre si existe en UsuarioNormal
-                            try:
-                                un = UsuarioNormal.objects.get(id_usuario=usuario)
-                                display_name = f"{un.nombre} {un.apellido}".strip()
-                            except UsuarioNormal.DoesNotExist:
-                                display_name = usuario.email
-                    except Exception:
-                        # En caso de cualquier error, fallback al email
-                        display_name = usuario.email
-                    request.session['display_name'] = display_name
-                    
+                    request.session['display_name'] = cuentas.nombre_para_mostrar(usuario)
+                    cuentas.recordar(usuario)
+
                     # Mensaje personalizado según el tipo de usuario
                     if usuario.es_admin:
                         messages.success(request, "Bienvenido Administrador.")
@@ -416,12 +589,78 @@ def donacion(request):
         'error_debug': error_debug,
     })
 
+# Ruta rápida de los listados de la API (ver serializers.LecturaRapida y renderers)
+API_JSON_RAPIDO = getattr(settings, 'API_JSON_RAPIDO', False)
+
+
+def _listar_api(request, queryset, serializer_class, paginacion):
+    """
+    Página de un listado de la API con los campos pedidos en ?fields=.
+
+    Solo se leen de la base de datos las columnas de los campos pedidos.
+    """
+    campos = campos_solicitados(request)
+    paginador = paginacion()
+    if API_JSON_RAPIDO:
+        # Filas armadas desde .values(), sin instancias ni campos de DRF por objeto
+        lectura = lectura_rapida(serializer_class, tuple(campos) if campos else None)
+        # El cursor se arma con el campo de orden aunque no se haya pedido en ?fields=
+        orden = getattr(paginador, 'ordering', None) or ()
+        orden = [orden] if isinstance(orden, str) else orden
+        consulta = lectura.consulta(queryset, extra=[o.lstrip('-') for o in orden])
+        pagina = paginador.paginate_queryset(consulta, request)
+        return paginador.get_paginated_response(lectura.filas(pagina))
+    if campos:
+        columnas = [f.name for f in queryset.model._meta.concrete_fields if f.name in campos]
+        if columnas:
+            queryset = queryset.only(*columnas)
+    pagina = paginador.paginate_queryset(queryset, request)
+    serializer = serializer_class(pagina, many=True, campos=campos)
+    return paginador.get_paginated_response(serializer.data)
+
+
+def _guardar_lote(request, serializer_class, despues):
+    """
+    Crea (POST) o edita (PUT/PATCH) una lista de objetos en una transacción.
+
+    Todo el lote se valida antes de escribir y se escribe con bulk_create o
+    bulk_update. Para editar, cada elemento trae su clave primaria.
+
+    Args:
+        serializer_class: Serializer del modelo (con LoteListSerializer)
+        despues (callable): Recibe (objetos guardados, {str(pk): copia previa})
+            dentro de la transacción; hace lo que harían las señales post_save
+    """
+    modelo = serializer_class.Meta.model
+    anteriores = {}
+    if request.method == 'POST':
+        serializer = serializer_class(data=request.data, many=True, max_length=LOTE_MAX)
+    else:
+        pk = modelo._meta.pk.name
+        ids = [str(item.get(pk)) for item in request.data if isinstance(item, dict)] if isinstance(request.data, list) else []
+        instancias = {str(k): v for k, v in modelo.objects.in_bulk([i for i in ids if i.isdigit()]).items()}
+        anteriores = {k: copy.copy(v) for k, v in instancias.items()}
+        serializer = serializer_class(
+            instancias, data=request.data, many=True, partial=request.method == 'PATCH', max_length=LOTE_MAX
+        )
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        with transaction.atomic():
+            objetos = serializer.save()
+            despues(objetos, anteriores)
+    except IntegrityError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(
+        serializer_class(objetos, many=True).data,
+        status=status.HTTP_201_CREATED if request.method == 'POST' else status.HTTP_200_OK,
+    )
+
+
 @api_view(['GET','POST'])
 def usuario_list(request):
     if request.method == 'GET':
-        usuarios = Usuario.objects.all()
-        serializer = UsuarioSerializer(usuarios, many=True)
-        return Response(serializer.data)
+        return _listar_api(request, Usuario.objects.all(), UsuarioSerializer, CursorUsuarios)
 
     if request.method == 'POST':
         serializer = UsuarioSerializer(data = request.data)
@@ -452,21 +691,35 @@ def usuario_detail(request, pk):
         usuario.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
     
+@api_view(['POST', 'PUT', 'PATCH'])
+def usuario_lote(request):
+    def despues(usuarios, anteriores):
+        for usuario in usuarios:
+            if str(usuario.pk) in anteriores:
+                cuentas.invalidar(usuario.pk)
+
+    return _guardar_lote(request, UsuarioSerializer, despues)
+
 @api_view(['GET','POST'])
+@condicional_publicaciones
 def publicacion_list(request):
     if request.method == 'GET':
-        publicaciones = Publicacion.objects.all()
-        serializer = PublicacionSerializer(publicaciones, many=True)
-        return Response(serializer.data)
+        texto = request.query_params.get('q', '').strip()
+        if texto:
+            return _listar_api(
+                request, busqueda.buscar(Publicacion.objects.all(), texto), PublicacionSerializer, PaginasBusquedaAPI
+            )
+        return _listar_api(request, Publicacion.objects.all(), PublicacionSerializer, CursorPublicaciones)
 
     if request.method == 'POST':
         serializer = PublicacionSerializer(data = request.data)
         if serializer.is_valid():
-            serializer.save()
+            pregeneracion.encolar(serializer.save())
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 @api_view(['GET', 'PUT', 'DELETE'])
+@condicional_publicaciones
 def publicacion_detail(request, pk):
     try:
         publicacion = Publicacion.objects.get(pk=pk)
@@ -478,9 +731,12 @@ def publicacion_detail(request, pk):
         return Response(serializer.data)
     
     if request.method == 'PUT':
+        texto_anterior = tts.texto_publicacion(publicacion)
         serializer = PublicacionSerializer(publicacion, data=request.data)
         if serializer.is_valid():
             serializer.save()
+            tts.invalidar_si_cambio(texto_anterior, publicacion)
+            pregeneracion.encolar(publicacion)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -488,6 +744,18 @@ def publicacion_detail(request, pk):
         publicacion.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+@api_view(['POST', 'PUT', 'PATCH'])
+def publicacion_lote(request):
+    def despues(publicaciones, anteriores):
+        VersionTabla.incrementar(Publicacion._meta.db_table)
+        for publicacion in publicaciones:
+            anterior = anteriores.get(str(publicacion.pk))
+            if anterior is not None:
+                tts.invalidar_si_cambio(tts.texto_publicacion(anterior), publicacion)
+            pregeneracion.encolar(publicacion)
+
+    return _guardar_lote(request, PublicacionSerializer, despues)
+
 def login_usuario(request):
     usuario = authenticate(email='admin@gmail.com', password='admin')
     if usuario:
@@ -508,20 +776,20 @@ def campanas(request):
         messages.error(request, "Debes iniciar sesión para acceder a campañas.")
         return redirect('acceso')
     
-    usuario = Usuario.objects.get(id_usuario=request.session['id_usuario'])
+    usuario = cuentas.datos_sesion(request)
     
     # Verificar que el usuario sea municipalidad
-    if usuario.tipo_usuario != 'municipalidad':
+    if usuario is None or usuario['tipo_usuario'] != 'municipalidad':
         messages.error(request, "Solo las municipalidades pueden acceder a campañas.")
         return redirect('inicio')
     
     # Obtener todas las campañas de la municipalidad
-    campanas_list = Campana.objects.filter(id_usuario=usuario).order_by('-fecha_inicio')
+    campanas_list = Campana.objects.filter(id_usuario=usuario['id_usuario']).order_by('-fecha_inicio')
     
     form = CampanaForm(request.POST or None)
     if request.method == 'POST' and form.is_valid():
         campana = form.save(commit=False)
-        campana.id_usuario = usuario
+        campana.id_usuario_id = usuario['id_usuario']
         campana.save()
         messages.success(request, '¡Campaña creada exitosamente!')
         return redirect('campanas')
@@ -532,71 +800,339 @@ def campanas(request):
     })
 
 
+AUDIO_MAX_AGE_VERSIONADO = 365 * 24 * 3600
+
+
+def _etag_audio(texto, perfil=None):
+    """ETag fuerte del audio: depende solo del texto, el motor principal y el perfil."""
+    return quote_etag(tts.version_audio(texto, perfil))
+
+
+def _etag_vigente(request, texto, perfil):
+    """
+    ETag que el navegador ya tiene y sigue vigente, o None.
+
+    Se acepta también el del MP3 original: es lo que recibe el cliente cuando
+    no se pudo transcodificar al perfil negociado.
+    """
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    for etag in {_etag_audio(texto, perfil), _etag_audio(texto)}:
+        if '*' in etags or etag in etags:
+            return etag
+    return None
+
+
+def _rango_solicitado(request, etag, largo):
+    """
+    Interpreta la cabecera Range (un único rango de bytes).
+
+    Returns:
+        tuple | str | None: (inicio, fin) inclusivo; 'invalido' si el rango no
+        es satisfacible; None si se debe enviar el audio completo
+    """
+    rango = request.META.get('HTTP_RANGE', '')
+    if not rango.startswith('bytes=') or ',' in rango:
+        return None
+    # If-Range: solo se respeta el rango si el cliente tiene esta misma versión
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag:
+        return None
+    inicio, _, fin = rango[len('bytes='):].strip().partition('-')
+    try:
+        if not inicio:
+            sufijo = int(fin)
+            if sufijo <= 0:
+                return 'invalido'
+            return max(largo - sufijo, 0), largo - 1
+        inicio = int(inicio)
+        fin = min(int(fin), largo - 1) if fin else largo - 1
+    except ValueError:
+        return None
+    if inicio >= largo or fin < inicio:
+        return 'invalido'
+    return inicio, fin
+
+
+def _cabeceras_audio(response, request, texto, etag):
+    response['Accept-Ranges'] = 'bytes'
+    patch_vary_headers(response, ['Accept'])
+    if etag is None:
+        # Audio (o parte) de un motor de respaldo: no guardarlo, la próxima
+        # reproducción puede traer la versión del motor principal
+        response['Cache-Control'] = 'no-store'
+        return response
+    response['ETag'] = etag
+    # Con ?v= igual a la versión del texto (tts.version_audio, la que ponen
+    # los listados) la URL cambia si la publicación se edita, así que se puede
+    # guardar indefinidamente; con otra o sin ella, revalidar.
+    if request.GET.get('v') == tts.version_audio(texto):
+        response['Cache-Control'] = f'public, max-age={AUDIO_MAX_AGE_VERSIONADO}, immutable'
+    else:
+        response['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+def _respuesta_audio(request, texto, audio, etag, content_type="audio/mpeg"):
+    """Respuesta 200 o 206 (Range) con el audio y sus cabeceras de caché."""
+    rango = _rango_solicitado(request, etag, len(audio))
+    if rango == 'invalido':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{len(audio)}'
+        return _cabeceras_audio(response, request, texto, etag)
+    if rango is None:
+        return _cabeceras_audio(HttpResponse(audio, content_type=content_type), request, texto, etag)
+
+    inicio, fin = rango
+    response = HttpResponse(audio[inicio:fin + 1], content_type=content_type, status=206)
+    response['Content-Range'] = f'bytes {inicio}-{fin}/{len(audio)}'
+    return _cabeceras_audio(response, request, texto, etag)
+
+
+def _transmitir(request, fragmentos, completo):
+    """
+    Se transmite por partes solo un texto de varios fragmentos que aún no está
+    completo en caché; si ya está, o si se pide un rango, se envía entero con
+    su largo para que el navegador pueda adelantar.
+    """
+    return not completo and len(fragmentos) > 1 and 'HTTP_RANGE' not in request.META
+
+
+def _demasiadas_solicitudes(reintentar):
+    response = HttpResponse("Demasiadas solicitudes de audio, intente más tarde", status=429)
+    response['Retry-After'] = str(reintentar)
+    return response
+
+
+def _version_servida(texto, fragmentos, audio, perfil):
+    """
+    Elige qué versión del audio completo se envía.
+
+    Returns:
+        tuple: (audio, etag, content_type); sin ETag si hay fragmentos de un
+        motor de respaldo, y el MP3 original si no se pudo transcodificar
+    """
+    if not tts.fragmentos_en_cache(fragmentos):
+        return audio, None, 'audio/mpeg'
+    if perfil:
+        variante = audio_perfiles.obtener(texto, audio, perfil)
+        if variante is not None:
+            return variante, _etag_audio(texto, perfil), audio_perfiles.content_type(perfil)
+    return audio, _etag_audio(texto), 'audio/mpeg'
+
+
+def _flujo_audio(primero, partes):
+    yield primero
+    try:
+        yield from partes
+    except tts.ErrorSintesis as e:
+        # Ya se enviaron cabeceras 200: se relanza para que el servidor corte
+        # la conexión y el cliente vea una transferencia incompleta, no un
+        # archivo válido pero más corto
+        print(f"Error sintetizando un fragmento: {e}")
+        raise
+
+
+async def _aflujo_audio(primero, partes):
+    yield primero
+    try:
+        async for parte in partes:
+            yield parte
+    except tts.ErrorSintesis as e:
+        print(f"Error sintetizando un fragmento: {e}")
+        raise
+
+
+def _es_nueva_lectura(request):
+    """Los pedidos de rangos intermedios son la misma reproducción, no se registran."""
+    rango = request.META.get('HTTP_RANGE', '')
+    return not rango or rango.replace(' ', '').startswith('bytes=0-')
+
+
 def leer_publicacion(request, id_publicacion):
     try:
         publicacion = Publicacion.objects.get(id_publicacion=id_publicacion)
     except Publicacion.DoesNotExist:
         return HttpResponse("Publicación no encontrada", status=404)
-    # Validar que la API key de VoiceRSS esté configurada
-    voicerss_key = getattr(settings, 'VOICERSS_API_KEY', None)
-    if not voicerss_key:
-        return HttpResponse("VoiceRSS no está configurado", status=500)
-
-    # Texto a leer: título + descripción + dirección (si existe)
-    partes = []
-    if getattr(publicacion, 'titulo', None):
-        partes.append(str(publicacion.titulo).strip())
-    if getattr(publicacion, 'descripcion', None):
-        partes.append(str(publicacion.descripcion).strip())
-    # Agregar dirección con etiqueta para mejorar claridad en la lectura
-    if getattr(publicacion, 'direccion', None):
-        direccion = str(publicacion.direccion).strip()
-        if direccion:
-            partes.append(f"Dirección: {direccion}")
-    # Agregar comuna si está disponible
-    if getattr(publicacion, 'comuna', None):
-        comuna = str(publicacion.comuna).strip()
-        if comuna:
-            partes.append(f"Comuna: {comuna}")
-
-    texto = ". ".join(partes)
-
-    # Llamada a VoiceRSS
-    url = "https://api.voicerss.org/"
-    params = {
-        "key": voicerss_key,
-        "hl": "es-mx",      # voz en español (México soportado por VoiceRSS)
-        "src": texto,       # texto a hablar
-        "c": "MP3"          # Formato de audio
-    }
 
-    try:
-        response = requests.get(url, params=params, timeout=10)
-    except requests.exceptions.RequestException as e:
-        return HttpResponse(f"Error conectando con VoiceRSS: {str(e)}", status=500)
+    texto = tts.texto_publicacion(publicacion)
+    perfil = audio_perfiles.elegir_perfil(request.META.get('HTTP_ACCEPT'))
+    etag = _etag_audio(texto, perfil)
+    vigente = _etag_vigente(request, texto, perfil)
 
-    # VoiceRSS devuelve texto cuando hay error ("ERROR something...")
-    if response.content.startswith(b"ERROR"):
-        error_msg = response.content.decode('utf-8', errors='ignore')
-        return HttpResponse(f"Error en VoiceRSS: {error_msg}", status=500)
+    if vigente:
+        # El navegador ya tiene este audio: no se lee la caché ni se llama a los motores
+        response = _cabeceras_audio(HttpResponse(status=304), request, texto, vigente)
+    elif perfil and (variante := audio_perfiles.obtener_cache(texto, perfil)) is not None:
+        response = _respuesta_audio(request, texto, variante, etag, audio_perfiles.content_type(perfil))
+    else:
+        # Audio desde la caché en disco o, si no está, desde los motores de voz
+        fragmentos = tts.dividir_texto(texto)
+        completo = tts.fragmentos_en_cache(fragmentos)
+        if not completo:
+            # Solo lo que llega a los motores de voz pasa por el limitador
+            reintentar = limitador.pedir_turno(limitador.clave_cliente(request))
+            if reintentar is not None:
+                return _demasiadas_solicitudes(reintentar)
+        try:
+            if _transmitir(request, fragmentos, completo):
+                partes = tts.audio_por_fragmentos(fragmentos)
+                primero = next(partes)
+                # Aún no se sabe qué motor sintetizará cada fragmento: sin ETag
+                response = _cabeceras_audio(StreamingHttpResponse(
+                    _flujo_audio(primero, partes), content_type="audio/mpeg"
+                ), request, texto, None)
+            else:
+                audio = b''.join(tts.audio_por_fragmentos(fragmentos))
+                response = _respuesta_audio(request, texto, *_version_servida(texto, fragmentos, audio, perfil))
+        except tts.ErrorSintesis as e:
+            return HttpResponse(str(e), status=e.status)
 
     # Registrar la lectura en JSON (sin bloquear si hay error)
-    id_usuario = request.session.get('id_usuario')
-    registrar_lectura(
-        id_publicacion=id_publicacion,
-        titulo=publicacion.titulo,
-        texto=texto,
-        id_usuario=id_usuario
-    )
+    if _es_nueva_lectura(request):
+        id_usuario = request.session.get('id_usuario')
+        registrar_lectura(
+            id_publicacion=id_publicacion,
+            titulo=publicacion.titulo,
+            texto=texto,
+            id_usuario=id_usuario
+        )
+
+    return response
+
+
+async def leer_publicacion_async(request, id_publicacion):
+    """
+    Variante asíncrona de leer_publicacion para servir bajo ASGI (TTS_ASYNC=True):
+    mientras espera a VoiceRSS no ocupa un worker.
+    """
+    try:
+        publicacion = await Publicacion.objects.aget(id_publicacion=id_publicacion)
+    except Publicacion.DoesNotExist:
+        return HttpResponse("Publicación no encontrada", status=404)
+
+    texto = tts.texto_publicacion(publicacion)
+    perfil = audio_perfiles.elegir_perfil(request.META.get('HTTP_ACCEPT'))
+    etag = _etag_audio(texto, perfil)
+    vigente = _etag_vigente(request, texto, perfil)
+    variante = None
+    if perfil and not vigente:
+        variante = await sync_to_async(audio_perfiles.obtener_cache, thread_sensitive=False)(texto, perfil)
+
+    if vigente:
+        response = _cabeceras_audio(HttpResponse(status=304), request, texto, vigente)
+    elif variante is not None:
+        response = _respuesta_audio(request, texto, variante, etag, audio_perfiles.content_type(perfil))
+    else:
+        fragmentos = tts.dividir_texto(texto)
+        completo = await sync_to_async(tts.fragmentos_en_cache, thread_sensitive=False)(fragmentos)
+        if not completo:
+            reintentar = await limitador.apedir_turno(await limitador.aclave_cliente(request))
+            if reintentar is not None:
+                return _demasiadas_solicitudes(reintentar)
+        try:
+            if _transmitir(request, fragmentos, completo):
+                partes = tts_async.afragmentos(fragmentos)
+                primero = await partes.__anext__()
+                response = _cabeceras_audio(StreamingHttpResponse(
+                    _aflujo_audio(primero, partes), content_type="audio/mpeg"
+                ), request, texto, None)
+            else:
+                audio = b''.join([parte async for parte in tts_async.afragmentos(fragmentos)])
+                response = _respuesta_audio(request, texto, *await sync_to_async(
+                    _version_servida, thread_sensitive=False
+                )(texto, fragmentos, audio, perfil))
+        except tts.ErrorSintesis as e:
+            return HttpResponse(str(e), status=e.status)
+
+    if _es_nueva_lectura(request):
+        id_usuario = await request.session.aget('id_usuario')
+        await sync_to_async(registrar_lectura, thread_sensitive=False)(
+            id_publicacion=id_publicacion,
+            titulo=publicacion.titulo,
+            texto=texto,
+            id_usuario=id_usuario
+        )
+
+    return response
+
+AUDIO_PAGE_SIZE = 50
+AUDIO_MAX_PAGE_SIZE = 500
+
+
+def _entero_o_none(valor):
+    try:
+        return int(valor) if valor not in (None, '') else None
+    except ValueError:
+        return None
+
+
+def _ndjson_lecturas(consulta, antes=None):
+    """
+    Genera las lecturas de una ConsultaLecturas como JSON por línea, en el
+    mismo orden que las páginas (las más recientes primero), leyendo de a una
+    página por vez.
+    """
+    while True:
+        registros, antes = consulta.pagina(AUDIO_MAX_PAGE_SIZE, antes=antes)
+        for registro in registros:
+            yield json.dumps(AudioReadingSerializer(registro).data, ensure_ascii=False) + '\n'
+        if antes is None:
+            return
 
-    return HttpResponse(response.content, content_type="audio/mpeg")
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def audio_readings_api(request):
     """
-    Endpoint para ver todos los textos leídos guardados en audio_readings.json
+    Endpoint con las lecturas guardadas en el historial de audio.
+
+    Devuelve páginas acotadas, las más recientes primero; ``next`` trae el
+    cursor (timestamp:id) de la siguiente página. Con ``?formato=ndjson`` se
+    transmiten todas las lecturas que cumplen los filtros, en el mismo orden,
+    un registro JSON por línea.
+    Filtros opcionales: id_publicacion, id_usuario, desde, hasta (epoch).
     """
-    registros = obtener_todas_las_lecturas()
+    id_publicacion = _entero_o_none(request.GET.get('id_publicacion'))
+    id_usuario = _entero_o_none(request.GET.get('id_usuario'))
+
+    try:
+        desde = float(request.GET['desde']) if request.GET.get('desde') else None
+        hasta = float(request.GET['hasta']) if request.GET.get('hasta') else None
+        antes = None
+        if request.GET.get('cursor'):
+            timestamp, id_fila = request.GET['cursor'].split(':')
+            antes = (float(timestamp), int(id_fila))
+    except ValueError:
+        return Response({'error': 'Parámetros inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+
+    consulta = ConsultaLecturas(
+        id_publicacion=id_publicacion, id_usuario=id_usuario, desde=desde, hasta=hasta
+    )
+    if request.GET.get('formato') == 'ndjson':
+        return StreamingHttpResponse(
+            _ndjson_lecturas(consulta, antes),
+            content_type='application/x-ndjson'
+        )
+
+    limite = _entero_o_none(request.GET.get('page_size')) or AUDIO_PAGE_SIZE
+    limite = max(1, min(limite, AUDIO_MAX_PAGE_SIZE))
+    registros, siguiente = consulta.pagina(limite, antes=antes)
+
+    next_url = None
+    if siguiente:
+        parametros = request.GET.copy()
+        parametros['cursor'] = f"{siguiente[0]!r}:{siguiente[1]}"
+        next_url = request.build_absolute_uri(f"{request.path}?{parametros.urlencode()}")
+
     serializer = AudioReadingSerializer(registros, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response({'next': next_url, 'results': serializer.data})
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def audio_cache_api(request):
+    """
+    Endpoint con los contadores de hits/misses y la ocupación de la caché de audio,
+    y las síntesis admitidas y rechazadas por el limitador
+    """
+    return Response(dict(audio_cache.estadisticas(), limitador=limitador.estadisticas()))
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -53,6 +54,13 @@ PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
 ]
 
+# Hash de contraseñas en un pool de procesos (0 = en el hilo de la petición).
+# Cada worker de gunicorn crea su propio pool: con W workers y N núcleos,
+# conviene a lo sumo N // W (p. ej. 1 con 4 workers en 4 núcleos).
+# Al cambiar el primer hasher o sus iteraciones, cada contraseña se vuelve a
+# hashear en el siguiente acceso del usuario.
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 0))
+
 # Headers de Seguridad
 SECURE_HSTS_SECONDS = 0  # Cambiar a 31536000 (1 año) en producción
 SECURE_HSTS_INCLUDE_SUBDOMAINS = False  # Cambiar a True en producción
@@ -75,6 +83,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'proyectoapp.middleware.SesionDeslizanteMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -104,6 +113,54 @@ TEMPLATES = [
 # Configuración de VoiceRSS para síntesis de voz
 VOICERSS_API_KEY = os.getenv('VOICERSS_API_KEY')
 
+VOICERSS_URL = os.getenv('VOICERSS_URL', 'https://api.voicerss.org/')  # cambiar para apuntar a un servidor de prueba
+VOICERSS_TIMEOUT = float(os.getenv('VOICERSS_TIMEOUT', 10))
+# Llamadas simultáneas a VoiceRSS por proceso (tamaño del pool de conexiones)
+TTS_MAX_CONCURRENCIA = int(os.getenv('TTS_MAX_CONCURRENCIA', 10))
+# Cortacircuitos: fallos seguidos antes de abrir y segundos que permanece abierto
+TTS_CIRCUITO_FALLOS = int(os.getenv('TTS_CIRCUITO_FALLOS', 5))
+TTS_CIRCUITO_ESPERA = float(os.getenv('TTS_CIRCUITO_ESPERA', 30))
+# Motores de voz en orden de preferencia (ver proyectoapp/tts_backends.py)
+TTS_BACKENDS = os.getenv(
+    'TTS_BACKENDS', 'proyectoapp.tts_backends.VoiceRSS,proyectoapp.tts_backends.EspeakNG'
+).split(',')
+# Segundos que se espera al motor principal antes de usar el de respaldo
+TTS_PRESUPUESTO = float(os.getenv('TTS_PRESUPUESTO', 3))
+# Motor local: voz de espeak-ng y procesos simultáneos (0 = número de CPUs)
+TTS_ESPEAK_VOZ = os.getenv('TTS_ESPEAK_VOZ', 'es-419')
+TTS_ESPEAK_PROCESOS = int(os.getenv('TTS_ESPEAK_PROCESOS', 0))
+# ffmpeg codifica el audio de espeak-ng y los perfiles livianos (ver proyectoapp/audio_perfiles.py)
+TTS_FFMPEG = os.getenv('TTS_FFMPEG', 'ffmpeg')
+# Largo máximo (caracteres) de cada fragmento de texto enviado a VoiceRSS
+TTS_FRAGMENTO_MAX = int(os.getenv('TTS_FRAGMENTO_MAX', 400))
+# Servir /leer-publicacion/ con la vista asíncrona (solo bajo ASGI, ver proyectodb/asgi.py)
+TTS_ASYNC = os.getenv('TTS_ASYNC', 'False') == 'True'
+# Pre-generar el audio en segundo plano al publicar o editar
+TTS_PREGENERAR = os.getenv('TTS_PREGENERAR', 'True') == 'True'
+TTS_PREGENERAR_WORKERS = int(os.getenv('TTS_PREGENERAR_WORKERS', 2))
+# Reintentos ante fallos del motor principal, con espera de 2, 4, 8... segundos
+TTS_PREGENERAR_REINTENTOS = int(os.getenv('TTS_PREGENERAR_REINTENTOS', 4))
+TTS_PREGENERAR_ESPERA = float(os.getenv('TTS_PREGENERAR_ESPERA', 2))
+# Segundos por fragmento para el motor principal al pre-generar (sin respaldo)
+TTS_PREGENERAR_TIMEOUT = float(os.getenv('TTS_PREGENERAR_TIMEOUT', VOICERSS_TIMEOUT))
+
+# Límite de síntesis por cliente (usuario con sesión o IP) y global, en peticiones por minuto
+# y ráfaga máxima; solo cuentan las que no están en caché
+TTS_LIMITE_CLIENTE_POR_MINUTO = float(os.getenv('TTS_LIMITE_CLIENTE_POR_MINUTO', 10))
+TTS_LIMITE_CLIENTE_RAFAGA = float(os.getenv('TTS_LIMITE_CLIENTE_RAFAGA', 5))
+TTS_LIMITE_GLOBAL_POR_MINUTO = float(os.getenv('TTS_LIMITE_GLOBAL_POR_MINUTO', 120))
+TTS_LIMITE_GLOBAL_RAFAGA = float(os.getenv('TTS_LIMITE_GLOBAL_RAFAGA', 30))
+# IPs o redes (CIDR) de los proxies inversos propios, separadas por comas. Solo
+# desde ellos se cree X-Forwarded-For para saber la IP del cliente; vacío = se
+# usa la IP de la conexión
+PROXIES_CONFIABLES = [red.strip() for red in os.getenv('DJANGO_PROXIES_CONFIABLES', '').split(',') if red.strip()]
+
+# Caché en disco del audio sintetizado (se expulsa lo menos usado al superar el límite)
+AUDIO_CACHE_DIR = os.getenv('AUDIO_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'audio'))
+AUDIO_CACHE_MAX_BYTES = int(os.getenv('AUDIO_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+# Segundos entre recorridos completos del directorio para ver lo que escribieron otros workers
+AUDIO_CACHE_REVISION = float(os.getenv('AUDIO_CACHE_REVISION', 60))
+
 
 
 WSGI_APPLICATION = 'proyectodb.wsgi.application'
@@ -120,9 +177,27 @@ DATABASES = {
         'PASSWORD': os.environ.get('DATABASE_PASSWORD'),
         'HOST': os.environ.get('DATABASE_HOST', ''),
         'PORT': os.environ.get('DATABASE_PORT', '5432'),
+        # Conexiones persistentes: segundos que se reutiliza una conexión (0 = una por petición).
+        # Solo bajo WSGI: con las vistas asíncronas de ASGI cada petición abre la suya en otro
+        # hilo y no se reutilizan, así que quedan abiertas; ahí conviene DATABASE_POOL.
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 0)),
+        # Verifica que la conexión reutilizada siga viva antes de usarla
+        'CONN_HEALTH_CHECKS': os.environ.get('DATABASE_CONN_HEALTH_CHECKS', 'True') == 'True',
     }
 }
 
+# Pool de conexiones de psycopg 3 (psycopg y psycopg-pool en requirements.txt).
+# Reemplaza a CONN_MAX_AGE, que debe quedar en 0 cuando se usa el pool.
+if os.environ.get('DATABASE_POOL', 'False') == 'True':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.environ.get('DATABASE_POOL_TIMEOUT', 10)),
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -135,6 +210,19 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Tamaño de página por defecto y máximo (?tamano=) de los listados de la API
+API_PAGINA = int(os.getenv('API_PAGINA', 100))
+API_PAGINA_MAX = int(os.getenv('API_PAGINA_MAX', 1000))
+# Máximo de objetos por petición en /usuarios/lote/ y /publicaciones/lote/
+API_LOTE_MAX = int(os.getenv('API_LOTE_MAX', 1000))
+# Listados de la API armados desde .values() y JSON con orjson (si está instalado)
+API_JSON_RAPIDO = os.getenv('API_JSON_RAPIDO', 'False') == 'True'
+if API_JSON_RAPIDO:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'proyectoapp.renderers.JSONRapidoRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -172,10 +260,44 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 
+# Caché (fragmentos de listados de publicaciones y datos de corta duración).
+# Por defecto es local a cada proceso; con DJANGO_CACHE_URL (redis://... o
+# memcached://host:puerto) la comparten todos los workers de gunicorn.
+CACHE_URL = os.getenv('DJANGO_CACHE_URL', '')
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}}
+elif CACHE_URL.startswith('memcached://'):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': CACHE_URL.removeprefix('memcached://'),
+    }}
+elif CACHE_URL:
+    raise ImproperlyConfigured("DJANGO_CACHE_URL debe empezar con redis://, rediss:// o memcached://")
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+# Lo que se invalida desde un worker solo llega a los demás con una caché compartida
+CACHE_COMPARTIDA = bool(CACHE_URL)
+PUBLICACIONES_CACHE_TTL = int(os.getenv('PUBLICACIONES_CACHE_TTL', 300))  # segundos
+
 # Session Settings
-SESSION_COOKIE_AGE = 600  # 30 minutos en segundos
+# db guarda la sesión en la base de datos; signed_cookies la guarda firmada en
+# la cookie y no toca la base de datos (no permite invalidar sesiones en el
+# servidor). cached_db la lee desde la caché y solo es correcto con una caché
+# compartida: con LocMemCache cada worker conservaría su copia tras un login o
+# un cierre de sesión hecho en otro.
+SESSION_ENGINE = os.getenv('DJANGO_SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+if SESSION_ENGINE.endswith('.cached_db') and not CACHE_COMPARTIDA:
+    raise ImproperlyConfigured("DJANGO_SESSION_ENGINE=cached_db requiere DJANGO_CACHE_URL (Redis o Memcached)")
+SESSION_COOKIE_AGE = 600  # 10 minutos en segundos
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
-SESSION_SAVE_EVERY_REQUEST = True  # Actualiza la expiración de la sesión en cada petición
+# La expiración la renueva SesionDeslizanteMiddleware solo cuando quedan menos
+# de SESSION_RENOVAR_UMBRAL segundos, así la mayoría de las peticiones no escribe
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_RENOVAR_UMBRAL = int(os.getenv('SESSION_RENOVAR_UMBRAL', SESSION_COOKIE_AGE // 2))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
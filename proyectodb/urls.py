@@ -14,6 +14,7 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 from proyectoapp import views
@@ -31,16 +32,23 @@ urlpatterns = [
     path("historial-lecturas/", views.historial_lecturas, name="historial_lecturas"),
     path("editar_publicacion/<int:id_publicacion>/", views.editar_publicacion, name="editar_publicacion"),
     path("eliminar_publicacion/<int:id_publicacion>/", views.eliminar_publicacion, name="eliminar_publicacion"),
-    path("leer-publicacion/<int:id_publicacion>/", views.leer_publicacion, name="leer_publicacion"),
+    path(
+        "leer-publicacion/<int:id_publicacion>/",
+        views.leer_publicacion_async if settings.TTS_ASYNC else views.leer_publicacion,
+        name="leer_publicacion",
+    ),
     path('admin/', admin.site.urls),
     path('usuarios/', views.usuario_list),
     path('usuarios/<int:pk>', views.usuario_detail),
+    path('usuarios/lote/', views.usuario_lote),
     path('publicaciones/', views.publicacion_list),
     path('publicaciones/<int:pk>', views.publicacion_detail),
+    path('publicaciones/lote/', views.publicacion_lote),
     path('publicaciones/list/', views.publicaciones_view, name='publicaciones'),
     path('beneficiarios/', views.beneficiarios_view, name='beneficiarios'),
     path('donacion/', views.donacion, name='donacion'),
     path('campanas/', views.campanas, name='campanas'),
     path('ver/', views.ver_datos_admin),
      path('audio/', views.audio_readings_api, name='audio_readings_api'),
+    path('audio/cache/', views.audio_cache_api, name='audio_cache_api'),
 ]